@@ -232,6 +232,7 @@ const Resources = {
         'gulp build',
         'cd ../',
         'echo "------------------------------------------------------------"',
+        'sudo systemd-run --unit=tasking-manager-auto-unlock --property=Restart=always --property=RestartSec=10 -E POSTGRES_ENDPOINT="$POSTGRES_ENDPOINT" -E POSTGRES_DB="$POSTGRES_DB" -E POSTGRES_USER="$POSTGRES_USER" -E POSTGRES_PASSWORD="$POSTGRES_PASSWORD" -E TM_SECRET="$TM_SECRET" -E TM_LOG_DIR="$TM_LOG_DIR" /bin/sh -c "cd $(pwd) && exec ./venv/bin/python3.6 manage.py auto_unlock_tasks -i 60"',
         'gunicorn -b 0.0.0.0:8000 --worker-class gevent --workers 3 --threads 3 --timeout 179 manage:application &',
         cf.sub('cfn-signal --exit-code $? --region ${AWS::Region} --resource TaskingManagerASG --stack ${AWS::StackName}')
       ]),
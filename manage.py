@@ -9,6 +9,9 @@ from server.services.users.authentication_service import AuthenticationService
 from server.services.users.user_service import UserService
 from server.services.translation_service import TranslationService
 from server.services.stats_service import StatsService
+from server.services.project_service import ProjectService
+from server.services.project_archive_service import ProjectArchiveService
+from server.services.task_history_partition_service import TaskHistoryPartitionService
 
 import os
 import warnings
@@ -83,6 +86,49 @@ def refresh_project_stats():
     print("Project stats updated")
 
 
+@manager.command
+def rebuild_contribution_time():
+    print("Started rebuilding contribution time...")
+    StatsService.rebuild_contribution_time()
+    print("Contribution time rebuilt")
+
+
+@manager.option("-b", "--batch_size", help="Rows copied per transaction", default=10000)
+def partition_task_history(batch_size):
+    """ Moves task history into the partitioned table created by migrations, while the app keeps running """
+    print("Started partitioning task history...")
+    rows_copied = TaskHistoryPartitionService.partition_task_history(int(batch_size))
+    print(f"Task history partitioned, copied {rows_copied} rows. The old table is kept as task_history_unpartitioned")
+
+
+@manager.option("-p", "--project_id", help="Only archive this project, defaults to every archived project")
+def archive_project_history(project_id):
+    """ Moves the history of archived projects out of the hot tables, it's restored when the project is viewed """
+    print("Started archiving project history...")
+    if project_id:
+        archived = int(ProjectArchiveService.archive_project_history(int(project_id)))
+    else:
+        archived = ProjectArchiveService.archive_all_project_history()
+    print(f"Archived history for {archived} projects")
+
+
+@manager.option("-i", "--interval", help="Seconds between sweeps", default=60)
+def auto_unlock_tasks(interval):
+    """ Keeps unlocking tasks locked for longer than TM_TASK_AUTOUNLOCK_AFTER across all projects """
+    print(f"Started auto-unlocking expired task locks every {interval} seconds...")
+    ProjectService.run_auto_unlock_sweeps(int(interval))
+
+
+@manager.option("-f", "--fix", help="Rewrite mismatched summaries from task history", action="store_true")
+def check_task_history(fix):
+    """ Checks the last state and last action kept on each task match the task history """
+    print("Checking task history summaries...")
+    tasks = ProjectService.check_task_history_summaries(fix)
+    for project_id, task_id in tasks:
+        print(f"Task {task_id} on project {project_id} didn't match its history")
+    print(f"{'Fixed' if fix else 'Found'} {len(tasks)} mismatched tasks")
+
+
 @manager.command
 def refresh_translatables():
     print('Exporting translatable strings')
@@ -0,0 +1,56 @@
+"""empty message
+
+Revision ID: 0c4f8a2e9b71
+Revises: f3b9d7e2c164
+Create Date: 2026-10-18 17:11:38.640527
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c4f8a2e9b71'
+down_revision = 'f3b9d7e2c164'
+branch_labels = None
+depends_on = None
+
+# Must match PARTITIONED_TABLE in server/services/task_history_partition_service.py
+PARTITIONED_TABLE = 'task_history_partitioned'
+PARTITIONS = 16
+# Foreign keys referencing a partitioned table need Postgres 12
+MIN_SERVER_VERSION = 120000
+
+
+def upgrade():
+    # Creates an empty hash partitioned copy of task_history, manage.py partition_task_history fills it and swaps
+    # it in online.  Older servers keep the plain table.
+    server_version = int(op.get_bind().execute(sa.text('SHOW server_version_num')).scalar())
+    if server_version < MIN_SERVER_VERSION:
+        return
+
+    op.execute(f'''
+        CREATE TABLE {PARTITIONED_TABLE} (LIKE task_history INCLUDING DEFAULTS) PARTITION BY HASH (project_id);
+        ALTER TABLE {PARTITIONED_TABLE} ADD CONSTRAINT {PARTITIONED_TABLE}_pkey PRIMARY KEY (id, project_id);
+        ALTER TABLE {PARTITIONED_TABLE}
+            ADD CONSTRAINT fk_tasks FOREIGN KEY (task_id, project_id) REFERENCES tasks (id, project_id),
+            ADD CONSTRAINT fk_users FOREIGN KEY (user_id) REFERENCES users (id),
+            ADD CONSTRAINT {PARTITIONED_TABLE}_project_id_fkey FOREIGN KEY (project_id) REFERENCES projects (id);
+    ''')
+
+    for remainder in range(PARTITIONS):
+        op.execute(f'''
+            CREATE TABLE {PARTITIONED_TABLE}_{remainder:02d} PARTITION OF {PARTITIONED_TABLE}
+                FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})
+        ''')
+
+    op.create_index(f'idx_{PARTITIONED_TABLE}_composite', PARTITIONED_TABLE, ['task_id', 'project_id'],
+                    unique=False)
+    op.create_index(f'ix_{PARTITIONED_TABLE}_project_id', PARTITIONED_TABLE, ['project_id'], unique=False)
+    op.create_index(f'idx_{PARTITIONED_TABLE}_last_action', PARTITIONED_TABLE,
+                    ['project_id', 'task_id', 'action', sa.text('action_date DESC')], unique=False)
+
+
+def downgrade():
+    # Only undoes a partitioned table that hasn't been swapped in yet
+    op.execute(f'DROP TABLE IF EXISTS {PARTITIONED_TABLE} CASCADE')
@@ -0,0 +1,74 @@
+"""empty message
+
+Revision ID: 7f3a5c1e8b24
+Revises: 6e1b9c4d2a80
+Create Date: 2026-10-18 20:47:12.630194
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7f3a5c1e8b24'
+down_revision = '6e1b9c4d2a80'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Notify once per project per transaction rather than once per task, so bulk transitions and the auto-unlock
+    # sweep don't queue a notification for every row.  Listeners read the changes from the change feed, the payload
+    # only says which project changed and the transaction to read up to.  Tasks being added or removed tells
+    # listeners to resync.  Transition tables would allow a statement trigger, but need Postgres 10.
+    op.execute('''
+        CREATE OR REPLACE FUNCTION notify_task_event() RETURNS trigger AS $$
+        DECLARE
+            event_project_id integer;
+            resync boolean := TG_OP <> 'UPDATE';
+            notified_setting text;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                event_project_id := OLD.project_id;
+            ELSE
+                event_project_id := NEW.project_id;
+            END IF;
+
+            IF TG_OP = 'UPDATE' AND NEW.task_status IS NOT DISTINCT FROM OLD.task_status
+                                AND NEW.locked_by IS NOT DISTINCT FROM OLD.locked_by THEN
+                RETURN NULL;
+            END IF;
+
+            -- Remembers which projects this transaction has notified for, the setting is local to the transaction
+            notified_setting := 'task_events.' || CASE WHEN resync THEN 'resync_' ELSE 'changed_' END
+                                || event_project_id;
+            IF current_setting(notified_setting, true) IS DISTINCT FROM txid_current()::text THEN
+                PERFORM set_config(notified_setting, txid_current()::text, true);
+                PERFORM pg_notify('task_events', json_build_object(
+                    'projectId', event_project_id, 'changeId', txid_current(), 'resync', resync)::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    ''')
+
+
+def downgrade():
+    op.execute('''
+        CREATE OR REPLACE FUNCTION notify_task_event() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('task_events', json_build_object(
+                    'projectId', OLD.project_id, 'taskId', OLD.id, 'deleted', true)::text);
+                RETURN OLD;
+            END IF;
+
+            IF TG_OP = 'INSERT' OR NEW.task_status IS DISTINCT FROM OLD.task_status
+                                OR NEW.locked_by IS DISTINCT FROM OLD.locked_by THEN
+                PERFORM pg_notify('task_events', json_build_object(
+                    'projectId', NEW.project_id, 'taskId', NEW.id, 'taskStatus', NEW.task_status,
+                    'lockedBy', NEW.locked_by, 'changeId', NEW.change_id)::text);
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    ''')
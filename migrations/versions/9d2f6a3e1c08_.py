@@ -0,0 +1,48 @@
+"""empty message
+
+Revision ID: 9d2f6a3e1c08
+Revises: 8c4e1d2a6b57
+Create Date: 2026-10-18 11:58:23.104716
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9d2f6a3e1c08'
+down_revision = '8c4e1d2a6b57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Notify listeners on the task_events channel whenever a task's status or lock changes, or a task is added or
+    # removed.  Notifications are only delivered once the transaction commits.
+    op.execute('''
+        CREATE OR REPLACE FUNCTION notify_task_event() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('task_events', json_build_object(
+                    'projectId', OLD.project_id, 'taskId', OLD.id, 'deleted', true)::text);
+                RETURN OLD;
+            END IF;
+
+            IF TG_OP = 'INSERT' OR NEW.task_status IS DISTINCT FROM OLD.task_status
+                                OR NEW.locked_by IS DISTINCT FROM OLD.locked_by THEN
+                PERFORM pg_notify('task_events', json_build_object(
+                    'projectId', NEW.project_id, 'taskId', NEW.id, 'taskStatus', NEW.task_status,
+                    'lockedBy', NEW.locked_by, 'changeId', NEW.change_id)::text);
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    ''')
+    op.execute('''
+        CREATE TRIGGER task_events AFTER INSERT OR UPDATE OR DELETE ON tasks
+            FOR EACH ROW EXECUTE PROCEDURE notify_task_event();
+    ''')
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS task_events ON tasks;')
+    op.execute('DROP FUNCTION IF EXISTS notify_task_event();')
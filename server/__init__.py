@@ -97,7 +97,8 @@ def init_flask_restful_routes(app):
     from server.api.health_check_api import HealthCheckAPI
     from server.api.license_apis import LicenseAPI, LicenceListAPI
     from server.api.mapping_apis import MappingTaskAPI, LockTaskForMappingAPI, UnlockTaskForMappingAPI, StopMappingAPI,\
-        CommentOnTaskAPI, TasksAsJson, TasksAsGPX, TasksAsOSM, UndoMappingAPI, TasksAsProjectFile
+        CommentOnTaskAPI, TasksAsJson, TasksAsMVT, TaskStatusSnapshotAPI, TaskChangesAPI, TaskEventsAPI, TasksAsGPX,\
+        TasksAsOSM, UndoMappingAPI, TasksAsProjectFile, LockNextTaskForMappingAPI
     from server.api.messaging.message_apis import ProjectsMessageAll, HasNewMessages, GetAllMessages, MessagesAPI,\
         DeleteMultipleMessages, ResendEmailValidationAPI
     from server.api.messaging.project_chat_apis import ProjectChatAPI
@@ -113,7 +114,7 @@ def init_flask_restful_routes(app):
     from server.api.users.user_apis import UserAPI, UserIdAPI, UserOSMAPI, UserMappedProjects, UserSetRole, UserSetLevel,\
         UserSetExpertMode, UserAcceptLicense, UserSearchFilterAPI, UserSearchAllAPI, UserUpdateAPI
     from server.api.validator_apis import LockTasksForValidationAPI, UnlockTasksAfterValidationAPI, StopValidatingAPI,\
-        MappedTasksByUser, UserInvalidatedTasks
+        MappedTasksByUser, UserInvalidatedTasks, LockNextTaskForValidationAPI
     from server.api.grid.grid_apis import IntersectingTilesAPI
     from server.api.grid.split_task_apis import SplitTaskAPI
     from server.api.settings_apis import LanguagesAPI
@@ -157,6 +158,10 @@ def init_flask_restful_routes(app):
     api.add_resource(MappedTasksByUser,             '/api/v1/project/<int:project_id>/mapped-tasks-by-user')
     api.add_resource(ProjectSummaryAPI,             '/api/v1/project/<int:project_id>/summary')
     api.add_resource(TasksAsJson,                   '/api/v1/project/<int:project_id>/tasks')
+    api.add_resource(TasksAsMVT,                    '/api/v1/project/<int:project_id>/tasks/<int:zoom>/<int:x>/<int:y>.mvt')
+    api.add_resource(TaskStatusSnapshotAPI,         '/api/v1/project/<int:project_id>/tasks/status-snapshot')
+    api.add_resource(TaskChangesAPI,                '/api/v1/project/<int:project_id>/tasks/changes')
+    api.add_resource(TaskEventsAPI,                 '/api/v1/project/<int:project_id>/events')
     api.add_resource(TasksAsGPX,                    '/api/v1/project/<int:project_id>/tasks_as_gpx')
     api.add_resource(TasksAsOSM,                    '/api/v1/project/<int:project_id>/tasks-as-osm-xml')
     api.add_resource(LockTaskForMappingAPI,         '/api/v1/project/<int:project_id>/task/<int:task_id>/lock-for-mapping')
@@ -165,7 +170,9 @@ def init_flask_restful_routes(app):
     api.add_resource(UnlockTaskForMappingAPI,       '/api/v1/project/<int:project_id>/task/<int:task_id>/unlock-after-mapping')
     api.add_resource(StopMappingAPI,                '/api/v1/project/<int:project_id>/task/<int:task_id>/stop-mapping')
     api.add_resource(CommentOnTaskAPI,              '/api/v1/project/<int:project_id>/task/<int:task_id>/comment')
+    api.add_resource(LockNextTaskForMappingAPI,     '/api/v1/project/<int:project_id>/lock-next-for-mapping')
     api.add_resource(LockTasksForValidationAPI,     '/api/v1/project/<int:project_id>/lock-for-validation')
+    api.add_resource(LockNextTaskForValidationAPI,  '/api/v1/project/<int:project_id>/lock-next-for-validation')
     api.add_resource(UnlockTasksAfterValidationAPI, '/api/v1/project/<int:project_id>/unlock-after-validation')
     api.add_resource(StopValidatingAPI,             '/api/v1/project/<int:project_id>/stop-validating')
     api.add_resource(StatsContributionsAPI,         '/api/v1/stats/project/<int:project_id>/contributions')
@@ -1,13 +1,18 @@
 import io
 from distutils.util import strtobool
 
-from flask import send_file, Response
+from flask import send_file, Response, stream_with_context
 from flask_restful import Resource, current_app, request
 from schematics.exceptions import DataError
 
-from server.models.dtos.mapping_dto import MappedTaskDTO, LockTaskDTO, StopMappingTaskDTO, TaskCommentDTO
+from server.api.utils import not_modified_response, compressed_response, unit_of_work
+from server.models.dtos.mapping_dto import MappedTaskDTO, LockTaskDTO, StopMappingTaskDTO, TaskCommentDTO, \
+    LockNextTaskDTO
+from server.models.postgis.utils import InvalidData, run_after_commit
+from server.services.compression_service import CompressionService
 from server.services.mapping_service import MappingService, MappingServiceError, NotFound, UserLicenseError
 from server.services.project_service import ProjectService, ProjectServiceError
+from server.services.task_event_service import TaskEventService
 from server.services.users.authentication_service import token_auth, tm, verify_token
 from server.services.users.user_service import UserService
 
@@ -79,6 +84,7 @@ class LockTaskForMappingAPI(Resource):
 
     @tm.pm_only(False)
     @token_auth.login_required
+    @unit_of_work
     def post(self, project_id, task_id):
         """
         Locks the task for mapping
@@ -154,9 +160,96 @@ class LockTaskForMappingAPI(Resource):
             return {"Error": error_msg}, 500
 
 
+class LockNextTaskForMappingAPI(Resource):
+
+    @tm.pm_only(False)
+    @token_auth.login_required
+    @unit_of_work
+    def post(self, project_id):
+        """
+        Picks and locks the next available task on the project for mapping
+        ---
+        tags:
+            - mapping
+        produces:
+            - application/json
+        parameters:
+            - in: header
+              name: Authorization
+              description: Base64 encoded session token
+              required: true
+              type: string
+              default: Token sessionTokenHere==
+            - in: header
+              name: Accept-Language
+              description: Language user is requesting
+              type: string
+              required: true
+              default: en
+            - name: project_id
+              in: path
+              description: The ID of the project to lock a task on
+              required: true
+              type: integer
+              default: 1
+            - in: body
+              name: body
+              required: false
+              description: Optional point to pick the nearest task to, tasks in priority areas are still picked first
+              schema:
+                  id: LockNextTask
+                  properties:
+                      lon:
+                          type: number
+                          default: -1.2
+                      lat:
+                          type: number
+                          default: 52.1
+        responses:
+            200:
+                description: Task locked
+            400:
+                description: Client Error
+            401:
+                description: Unauthorized - Invalid credentials
+            403:
+                description: Forbidden
+            404:
+                description: No tasks available for mapping
+            409:
+                description: User has not accepted license terms of project
+            500:
+                description: Internal Server Error
+        """
+        try:
+            lock_next_dto = LockNextTaskDTO(request.get_json(silent=True) or {})
+            lock_next_dto.user_id = tm.authenticated_user_id
+            lock_next_dto.project_id = project_id
+            lock_next_dto.preferred_locale = request.environ.get('HTTP_ACCEPT_LANGUAGE')
+            lock_next_dto.validate()
+        except DataError as e:
+            current_app.logger.error(f'Error validating request: {str(e)}')
+            return str(e), 400
+
+        try:
+            task = MappingService.lock_next_task_for_mapping(lock_next_dto)
+            return task.to_primitive(), 200
+        except NotFound as e:
+            return {"Error": str(e)}, 404
+        except MappingServiceError as e:
+            return {"Error": str(e)}, 403
+        except UserLicenseError:
+            return {"Error": "User not accepted license terms"}, 409
+        except Exception as e:
+            error_msg = f'Lock Next Task API - unhandled error: {str(e)}'
+            current_app.logger.critical(error_msg)
+            return {"Error": error_msg}, 500
+
+
 class StopMappingAPI(Resource):
     @tm.pm_only(False)
     @token_auth.login_required
+    @unit_of_work
     def post(self, project_id, task_id):
         """
         Unlock task that is locked for mapping resetting it to it's last status
@@ -243,6 +336,7 @@ class UnlockTaskForMappingAPI(Resource):
 
     @tm.pm_only(False)
     @token_auth.login_required
+    @unit_of_work
     def post(self, project_id, task_id):
         """
         Unlocks the task after mapping completed
@@ -313,6 +407,8 @@ class UnlockTaskForMappingAPI(Resource):
 
         try:
             task = MappingService.unlock_task_after_mapping(mapped_task)
+            # Refresh mapper level after mapping, once the task is committed as it calls the OSM API
+            run_after_commit(UserService.check_and_update_mapper_level, tm.authenticated_user_id)
             return task.to_primitive(), 200
         except NotFound:
             return {"Error": "Task Not Found"}, 404
@@ -322,15 +418,13 @@ class UnlockTaskForMappingAPI(Resource):
             error_msg = f'Task Lock API - unhandled error: {str(e)}'
             current_app.logger.critical(error_msg)
             return {"Error": error_msg}, 500
-        finally:
-            # Refresh mapper level after mapping
-            UserService.check_and_update_mapper_level(tm.authenticated_user_id)
 
 
 class CommentOnTaskAPI(Resource):
 
     @tm.pm_only(False)
     @token_auth.login_required
+    @unit_of_work
     def post(self, project_id, task_id):
         """
         Adds a comment to the task outside of mapping/validation
@@ -429,9 +523,19 @@ class TasksAsJson(Resource):
               type: boolean
               description: Set to true if file download preferred
               default: True
+            - in: query
+              name: resolution
+              type: string
+              description: Task geometry resolution, one of full, medium or low
+            - in: query
+              name: zoom
+              type: integer
+              description: Map zoom level to pick a suitable task geometry resolution for, if resolution isn't set
         responses:
             200:
                 description: Project found
+            400:
+                description: Client Error
             403:
                 description: Forbidden
             404:
@@ -441,15 +545,30 @@ class TasksAsJson(Resource):
         """
         try:
             as_file = strtobool(request.args.get('as_file')) if request.args.get('as_file') else True
+            zoom = int(request.args.get('zoom')) if request.args.get('zoom') else None
+            resolution = ProjectService.get_task_geometry_resolution(request.args.get('resolution'), zoom)
 
-            tasks = ProjectService.get_project_tasks(int(project_id))
+            etag = ProjectService.get_project_etag(project_id, 'tasks', request.query_string)
+            not_modified = not_modified_response(etag)
+            if not_modified:
+                return not_modified
 
-            if as_file:
-                tasks = str(tasks).encode('utf-8')
-                return send_file(io.BytesIO(tasks), mimetype='application/json', as_attachment=True,
-                                 attachment_filename=f'{str(project_id)}-tasks.geoJSON')
+            filename = f'{str(project_id)}-tasks.geoJSON' if as_file else None
+            encoding = request.accept_encodings.best_match(CompressionService.supported_encodings())
+            if encoding:
+                tasks = ProjectService.get_project_tasks_compressed(project_id, encoding, resolution)
+                response = compressed_response(stream_with_context(tasks), encoding, 'application/json', filename)
+            else:
+                tasks = ProjectService.get_project_tasks_stream(int(project_id), resolution)
+                response = Response(stream_with_context(tasks), mimetype='application/json', status=200)
+                response.vary.add('Accept-Encoding')
+                if as_file:
+                    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
 
-            return tasks, 200
+            response.set_etag(etag, weak=True)
+            return response
+        except (InvalidData, ValueError) as e:
+            return {"Error": str(e)}, 400
         except NotFound:
             return {"Error": "Project or Task Not Found"}, 404
         except ProjectServiceError as e:
@@ -460,6 +579,221 @@ class TasksAsJson(Resource):
             return {"Error": error_msg}, 500
 
 
+class TasksAsMVT(Resource):
+
+    def get(self, project_id, zoom, x, y):
+        """
+        Get tasks as a Mapbox Vector Tile
+        ---
+        tags:
+            - mapping
+        produces:
+            - application/vnd.mapbox-vector-tile
+        parameters:
+            - name: project_id
+              in: path
+              description: The ID of the project the task is associated with
+              required: true
+              type: integer
+              default: 1
+            - name: zoom
+              in: path
+              description: Tile zoom level
+              required: true
+              type: integer
+              default: 0
+            - name: x
+              in: path
+              description: Tile column
+              required: true
+              type: integer
+              default: 0
+            - name: y
+              in: path
+              description: Tile row
+              required: true
+              type: integer
+              default: 0
+        responses:
+            200:
+                description: Vector tile of the project's tasks
+            400:
+                description: Tile outside the tile grid
+            404:
+                description: Project not found
+            500:
+                description: Internal Server Error
+        """
+        try:
+            tile = ProjectService.get_project_tasks_mvt(project_id, zoom, x, y)
+            return Response(tile, mimetype='application/vnd.mapbox-vector-tile', status=200)
+        except InvalidData as e:
+            return {"Error": str(e)}, 400
+        except NotFound:
+            return {"Error": "Project Not Found"}, 404
+        except Exception as e:
+            error_msg = f'Tasks MVT - unhandled error: {str(e)}'
+            current_app.logger.critical(error_msg)
+            return {"Error": error_msg}, 500
+
+
+class TaskStatusSnapshotAPI(Resource):
+
+    def get(self, project_id):
+        """
+        Get the status of every task as a compact binary snapshot
+        ---
+        tags:
+            - mapping
+        produces:
+            - application/octet-stream
+        description: |
+            All values are little-endian - uint32 task count N, then N uint32 task ids in ascending order, then
+            N uint8 task status values
+        parameters:
+            - name: project_id
+              in: path
+              description: The ID of the project the task is associated with
+              required: true
+              type: integer
+              default: 1
+        responses:
+            200:
+                description: Task status snapshot
+            304:
+                description: Not Modified
+            404:
+                description: Project not found
+            500:
+                description: Internal Server Error
+        """
+        try:
+            etag = ProjectService.get_project_etag(project_id, 'task-status-snapshot')
+            not_modified = not_modified_response(etag)
+            if not_modified:
+                return not_modified
+
+            snapshot = ProjectService.get_task_status_snapshot(project_id)
+            response = Response(snapshot, mimetype='application/octet-stream', status=200)
+            response.set_etag(etag, weak=True)
+            return response
+        except NotFound:
+            return {"Error": "Project Not Found"}, 404
+        except Exception as e:
+            error_msg = f'Task Status Snapshot GET - unhandled error: {str(e)}'
+            current_app.logger.critical(error_msg)
+            return {"Error": error_msg}, 500
+
+
+class TaskChangesAPI(Resource):
+
+    def get(self, project_id):
+        """
+        Get the tasks whose status or lock has changed since a cursor
+        ---
+        tags:
+            - mapping
+        produces:
+            - application/json
+        parameters:
+            - name: project_id
+              in: path
+              description: The ID of the project the task is associated with
+              required: true
+              type: integer
+              default: 1
+            - in: query
+              name: since
+              type: integer
+              description: Cursor returned by the previous request, omit to get every task
+            - in: query
+              name: limit
+              type: integer
+              description: Maximum number of changes to return, follow up with the returned cursor to get the rest
+              default: 1000
+        responses:
+            200:
+                description: Changed tasks and the cursor to request the next changes from
+            400:
+                description: Client Error
+            404:
+                description: Project not found
+            500:
+                description: Internal Server Error
+        """
+        try:
+            since = int(request.args.get('since')) if request.args.get('since') else None
+            limit = min(int(request.args.get('limit')), 5000) if request.args.get('limit') else 1000
+        except ValueError:
+            return {"Error": "since and limit must be integers"}, 400
+
+        if limit < 1:
+            return {"Error": "limit must be at least 1"}, 400
+
+        try:
+            changes = ProjectService.get_task_changes(project_id, since, limit)
+            return changes.to_primitive(), 200
+        except NotFound:
+            return {"Error": "Project Not Found"}, 404
+        except Exception as e:
+            error_msg = f'Task Changes GET - unhandled error: {str(e)}'
+            current_app.logger.critical(error_msg)
+            return {"Error": error_msg}, 500
+
+
+class TaskEventsAPI(Resource):
+
+    def get(self, project_id):
+        """
+        Stream changes to the status or lock of the project's tasks as Server-Sent Events
+        ---
+        tags:
+            - mapping
+        produces:
+            - text/event-stream
+        parameters:
+            - name: project_id
+              in: path
+              description: The ID of the project the task is associated with
+              required: true
+              type: integer
+              default: 1
+            - in: header
+              name: Last-Event-ID
+              description: ID of the last event received, changes since then are replayed on reconnect
+              type: integer
+        responses:
+            200:
+                description: Event stream of task-changed and resync events
+            400:
+                description: Client Error
+            404:
+                description: Project not found
+            500:
+                description: Internal Server Error
+        """
+        try:
+            last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return {"Error": "Last-Event-ID must be an integer"}, 400
+
+        try:
+            ProjectService.get_task_versions(project_id)
+            events = TaskEventService.stream_project_events(project_id, last_event_id)
+
+            response = Response(stream_with_context(events), mimetype='text/event-stream', status=200)
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['X-Accel-Buffering'] = 'no'
+            return response
+        except NotFound:
+            return {"Error": "Project Not Found"}, 404
+        except Exception as e:
+            error_msg = f'Task Events GET - unhandled error: {str(e)}'
+            current_app.logger.critical(error_msg)
+            return {"Error": error_msg}, 500
+
+
 class TasksAsGPX(Resource):
 
     def get(self, project_id):
@@ -502,6 +836,12 @@ class TasksAsGPX(Resource):
             tasks = request.args.get('tasks')
             as_file = strtobool(request.args.get('as_file')) if request.args.get('as_file') else False
 
+            encoding = request.accept_encodings.best_match(CompressionService.supported_encodings())
+            if encoding:
+                xml = MappingService.get_gpx_compressed(project_id, tasks, encoding)
+                filename = f'Kaart-project-{project_id}-task-{tasks}.gpx' if as_file else None
+                return compressed_response(xml, encoding, 'text/xml', filename)
+
             xml = MappingService.generate_gpx(project_id, tasks)
 
             if as_file:
@@ -558,6 +898,12 @@ class TasksAsOSM(Resource):
             tasks = request.args.get('tasks') if request.args.get('tasks') else None
             as_file = strtobool(request.args.get('as_file')) if request.args.get('as_file') else False
 
+            encoding = request.accept_encodings.best_match(CompressionService.supported_encodings())
+            if encoding:
+                xml = MappingService.get_osm_xml_compressed(project_id, tasks, encoding)
+                filename = f'HOT-project-{project_id}.osm' if as_file else None
+                return compressed_response(xml, encoding, 'text/xml', filename)
+
             xml = MappingService.generate_osm_xml(project_id, tasks)
 
             if as_file:
@@ -577,6 +923,7 @@ class UndoMappingAPI(Resource):
 
     @tm.pm_only(False)
     @token_auth.login_required
+    @unit_of_work
     def post(self, project_id, task_id):
         """
         Get task for mapping
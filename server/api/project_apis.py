@@ -1,12 +1,15 @@
 import geojson
 import io
-from flask import send_file
+from flask import send_file, Response, stream_with_context
 from flask_restful import Resource, current_app, request
 from schematics.exceptions import DataError
 from distutils.util import strtobool
+from werkzeug.http import quote_etag
+from server.api.utils import not_modified_response
 from server.models.dtos.project_dto import ProjectSearchDTO, ProjectSearchBBoxDTO
 from server.models.postgis.task import Task
 from server.models.postgis.task_annotation import TaskAnnotation
+from server.models.postgis.utils import InvalidData
 from server.services.project_search_service import ProjectSearchService, ProjectSearchServiceError, BBoxTooBigError
 from server.services.project_service import ProjectService, ProjectServiceError, NotFound
 from server.services.users.user_service import UserService
@@ -47,9 +50,24 @@ class ProjectAPI(Resource):
               type: boolean
               description: Set to true if only state information is desired
               default: False
+            - in: query
+              name: compact
+              type: boolean
+              description: With abbreviated, set to true to get the tasks as a base64 encoded binary status snapshot
+              default: False
+            - in: query
+              name: resolution
+              type: string
+              description: Task geometry resolution, one of full, medium or low
+            - in: query
+              name: zoom
+              type: integer
+              description: Map zoom level to pick a suitable task geometry resolution for, if resolution isn't set
         responses:
             200:
                 description: Project found
+            400:
+                description: Client Error
             403:
                 description: Forbidden
             404:
@@ -60,16 +78,39 @@ class ProjectAPI(Resource):
         try:
             as_file = strtobool(request.args.get('as_file')) if request.args.get('as_file') else False
             abbreviated = strtobool(request.args.get('abbreviated')) if request.args.get('abbreviated') else False
-
-            project_dto = ProjectService.get_project_dto_for_mapper(project_id,
-                                                                    request.environ.get('HTTP_ACCEPT_LANGUAGE'), abbreviated)
+            compact = strtobool(request.args.get('compact')) if request.args.get('compact') else False
+            locale = request.environ.get('HTTP_ACCEPT_LANGUAGE')
+            zoom = int(request.args.get('zoom')) if request.args.get('zoom') else None
+            resolution = ProjectService.get_task_geometry_resolution(request.args.get('resolution'), zoom)
+
+            etag = ProjectService.get_project_etag(project_id, 'project', locale, request.query_string)
+            not_modified = not_modified_response(etag)
+            if not_modified:
+                return not_modified
+
+            if not abbreviated:
+                # Full project includes every task geometry, so stream it rather than build it in memory
+                project_stream = ProjectService.get_project_stream_for_mapper(project_id, locale, resolution)
+                response = Response(stream_with_context(project_stream), mimetype='application/json', status=200)
+                response.set_etag(etag, weak=True)
+                if as_file:
+                    response.headers['Content-Disposition'] = f'attachment; filename=project_{str(project_id)}.json'
+
+                return response
+
+            project_dto = ProjectService.get_project_dto_for_mapper(project_id, locale, abbreviated, compact)
             project_dto = project_dto.to_primitive()
 
             if as_file:
-                return send_file(io.BytesIO(geojson.dumps(project_dto).encode('utf-8')), mimetype='application/json',
-                                 as_attachment=True, attachment_filename=f'project_{str(project_id)}.json')
-
-            return project_dto, 200
+                response = send_file(io.BytesIO(geojson.dumps(project_dto).encode('utf-8')),
+                                     mimetype='application/json', as_attachment=True,
+                                     attachment_filename=f'project_{str(project_id)}.json')
+                response.set_etag(etag, weak=True)
+                return response
+
+            return project_dto, 200, {'ETag': quote_etag(etag, weak=True)}
+        except (InvalidData, ValueError) as e:
+            return {"Error": str(e)}, 400
         except NotFound:
             return {"Error": "Project Not Found"}, 404
         except ProjectServiceError as e:
@@ -78,12 +119,6 @@ class ProjectAPI(Resource):
             error_msg = f'Project GET - unhandled error: {str(e)}'
             current_app.logger.critical(error_msg)
             return {"error": error_msg}, 500
-        finally:
-            # this will try to unlock tasks that have been locked too long
-            try:
-                ProjectService.auto_unlock_tasks(project_id)
-            except Exception as e:
-                current_app.logger.critical(str(e))
 
 
 class ProjectSummaryAPI(Resource):
@@ -119,8 +154,14 @@ class ProjectSummaryAPI(Resource):
         """
         try:
             preferred_locale = request.environ.get('HTTP_ACCEPT_LANGUAGE')
+
+            etag = ProjectService.get_project_etag(project_id, 'summary', preferred_locale)
+            not_modified = not_modified_response(etag)
+            if not_modified:
+                return not_modified
+
             summary = ProjectService.get_project_summary(project_id, preferred_locale)
-            return summary.to_primitive(), 200
+            return summary.to_primitive(), 200, {'ETag': quote_etag(etag, weak=True)}
         except NotFound:
             return {"Error": "Project not found"}, 404
         except Exception as e:
@@ -163,13 +204,22 @@ class ProjectAOIAPI(Resource):
         try:
             as_file = strtobool(request.args.get('as_file')) if request.args.get('as_file') else True
 
+            # The AOI doesn't depend on the tasks, so task changes shouldn't invalidate it
+            etag = ProjectService.get_project_etag(project_id, 'aoi', request.query_string, include_tasks=False)
+            not_modified = not_modified_response(etag)
+            if not_modified:
+                return not_modified
+
             project_aoi = ProjectService.get_project_aoi(project_id)
 
             if as_file:
-                return send_file(io.BytesIO(geojson.dumps(project_aoi).encode('utf-8')), mimetype='application/json',
-                                 as_attachment=True, attachment_filename=f'{str(project_id)}.geoJSON')
+                response = send_file(io.BytesIO(geojson.dumps(project_aoi).encode('utf-8')),
+                                     mimetype='application/json', as_attachment=True,
+                                     attachment_filename=f'{str(project_id)}.geoJSON')
+                response.set_etag(etag, weak=True)
+                return response
 
-            return project_aoi, 200
+            return project_aoi, 200, {'ETag': quote_etag(etag, weak=True)}
         except NotFound:
             return {"Error": "Project Not Found"}, 404
         except ProjectServiceError as e:
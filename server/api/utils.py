@@ -1,4 +1,9 @@
 from functools import wraps
+from typing import Iterable, Union
+from flask import Response, current_app, request
+from sqlalchemy.exc import SQLAlchemyError
+
+from server.models.postgis.utils import UnitOfWork
 
 
 class TMAPIDecorators:
@@ -18,3 +23,62 @@ class TMAPIDecorators:
                 return func(*args, **kwargs)
             return decorated_function
         return pm_only_decorator
+
+
+def unit_of_work(func):
+    """
+    Runs the resource method as a single unit of work, so every change it makes is committed once after the response
+    is built.  Nothing is committed if the resource returns an error status.
+    """
+    @wraps(func)
+    def decorated_function(*args, **kwargs):
+        try:
+            with UnitOfWork() as work:
+                response = func(*args, **kwargs)
+                if response_status(response) >= 400:
+                    work.rollback()
+            return response
+        except SQLAlchemyError as e:
+            error_msg = f'Unit of work - commit failed: {str(e)}'
+            current_app.logger.critical(error_msg)
+            return {"Error": error_msg}, 500
+    return decorated_function
+
+
+def response_status(response) -> int:
+    """ Gets the HTTP status of anything a resource method can return """
+    if isinstance(response, tuple):
+        return response[1] if len(response) > 1 else 200
+
+    return getattr(response, 'status_code', 200)
+
+
+def not_modified_response(etag: str):
+    """
+    Gets an empty 304 response if the client already holds the current version of the resource
+    :param etag: Weak ETag of the current version of the resource
+    :return: 304 Response if the client's If-None-Match matches the ETag, otherwise None
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def compressed_response(body: Union[bytes, Iterable[bytes]], encoding: str, mimetype: str,
+                        attachment_filename: str = None) -> Response:
+    """
+    Builds a response for a body that has already been compressed with the content encoding
+    :param body: The compressed body, or a stream of its chunks
+    :param attachment_filename: Set if the body should be downloaded as a file
+    """
+    response = Response(body, mimetype=mimetype, status=200)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+
+    if attachment_filename:
+        response.headers['Content-Disposition'] = f'attachment; filename={attachment_filename}'
+
+    return response
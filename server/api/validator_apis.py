@@ -1,6 +1,8 @@
 from flask_restful import Resource, current_app, request
 from schematics.exceptions import DataError
 
+from server.api.utils import unit_of_work
+from server.models.dtos.mapping_dto import LockNextTaskDTO
 from server.models.dtos.validator_dto import LockForValidationDTO, UnlockAfterValidationDTO, StopValidationDTO
 from server.services.users.authentication_service import token_auth, tm
 from server.services.validator_service import ValidatorService, NotFound, ValidatatorServiceError, UserLicenseError
@@ -10,6 +12,7 @@ class LockTasksForValidationAPI(Resource):
 
     @tm.pm_only(False)
     @token_auth.login_required
+    @unit_of_work
     def post(self, project_id):
         """
         Lock tasks for validation
@@ -90,10 +93,90 @@ class LockTasksForValidationAPI(Resource):
             return {"Error": error_msg}, 500
 
 
+class LockNextTaskForValidationAPI(Resource):
+
+    @tm.pm_only(False)
+    @token_auth.login_required
+    @unit_of_work
+    def post(self, project_id):
+        """
+        Picks and locks the next available mapped task on the project for validation
+        ---
+        tags:
+            - validation
+        produces:
+            - application/json
+        parameters:
+            - in: header
+              name: Authorization
+              description: Base64 encoded session token
+              required: true
+              type: string
+              default: Token sessionTokenHere==
+            - in: header
+              name: Accept-Language
+              description: Language user is requesting
+              type: string
+              required: true
+              default: en
+            - name: project_id
+              in: path
+              description: The ID of the project to lock a task on
+              required: true
+              type: integer
+              default: 1
+            - in: body
+              name: body
+              required: false
+              description: Optional point to pick the nearest task to, tasks in priority areas are still picked first
+              schema:
+                  $ref: "#/definitions/LockNextTask"
+        responses:
+            200:
+                description: Task locked
+            400:
+                description: Client Error
+            401:
+                description: Unauthorized - Invalid credentials
+            403:
+                description: Forbidden
+            404:
+                description: No tasks available for validation
+            409:
+                description: User has not accepted license terms of project
+            500:
+                description: Internal Server Error
+        """
+        try:
+            lock_next_dto = LockNextTaskDTO(request.get_json(silent=True) or {})
+            lock_next_dto.user_id = tm.authenticated_user_id
+            lock_next_dto.project_id = project_id
+            lock_next_dto.preferred_locale = request.environ.get('HTTP_ACCEPT_LANGUAGE')
+            lock_next_dto.validate()
+        except DataError as e:
+            current_app.logger.error(f'Error validating request: {str(e)}')
+            return str(e), 400
+
+        try:
+            task = ValidatorService.lock_next_task_for_validation(lock_next_dto)
+            return task.to_primitive(), 200
+        except ValidatatorServiceError as e:
+            return {"Error": str(e)}, 403
+        except NotFound as e:
+            return {"Error": str(e)}, 404
+        except UserLicenseError:
+            return {"Error": "User not accepted license terms"}, 409
+        except Exception as e:
+            error_msg = f'Validator Lock Next API - unhandled error: {str(e)}'
+            current_app.logger.critical(error_msg)
+            return {"Error": error_msg}, 500
+
+
 class StopValidatingAPI(Resource):
 
     @tm.pm_only(False)
     @token_auth.login_required
+    @unit_of_work
     def post(self, project_id):
         """
         Unlock tasks that are locked for validation resetting them to their last status
@@ -173,6 +256,7 @@ class UnlockTasksAfterValidationAPI(Resource):
 
     @tm.pm_only(False)
     @token_auth.login_required
+    @unit_of_work
     def post(self, project_id):
         """
         Unlocks tasks after validation completed
@@ -1,7 +1,7 @@
 from schematics import Model
 from schematics.exceptions import ValidationError
 from schematics.types import StringType, IntType, \
-    DateTimeType, BooleanType, DictType
+    DateTimeType, BooleanType, DictType, FloatType
 from schematics.types.compound import ListType, ModelType
 from server.models.postgis.statuses import TaskStatus
 from server.models.dtos.mapping_issues_dto import TaskMappingIssueDTO
@@ -28,6 +28,15 @@ class LockTaskDTO(Model):
     preferred_locale = StringType(default='en')
 
 
+class LockNextTaskDTO(Model):
+    """ DTO used to lock the next available task on a project for mapping or validation """
+    user_id = IntType(required=True)
+    project_id = IntType(required=True)
+    lon = FloatType(min_value=-180, max_value=180)
+    lat = FloatType(min_value=-90, max_value=90)
+    preferred_locale = StringType(default='en')
+
+
 class MappedTaskDTO(Model):
     """ Describes the model used to update the status of one task after mapping """
     user_id = IntType(required=True)
@@ -76,6 +85,20 @@ class TaskDTOs(Model):
     tasks = ListType(ModelType(TaskDTO))
 
 
+class TaskChangeDTO(Model):
+    """ Describes the current status and lock of a task that has changed """
+    task_id = IntType(serialized_name='taskId')
+    task_status = StringType(serialized_name='taskStatus')
+    locked_by = IntType(serialized_name='lockedBy')
+
+
+class TaskChangesDTO(Model):
+    """ Describes the tasks changed since a cursor, and the cursor to request the next changes from """
+    tasks = ListType(ModelType(TaskChangeDTO))
+    cursor = IntType()
+    task_geometry_version = IntType(serialized_name='taskGeometryVersion')
+
+
 class TaskCommentDTO(Model):
     """ Describes the model used to add a standalone comment to a task outside of mapping/validation """
     user_id = IntType(required=True)
@@ -0,0 +1,83 @@
+import datetime
+from typing import Tuple
+from sqlalchemy import func, text
+from server import db
+from server.models.postgis.statuses import ContributionActivity
+
+# Task history actions whose lock duration counts towards each activity
+ACTIVITY_ACTIONS = {
+    ContributionActivity.MAPPING: ('LOCKED_FOR_MAPPING', 'AUTO_UNLOCKED_FOR_MAPPING'),
+    ContributionActivity.VALIDATION: ('LOCKED_FOR_VALIDATION', 'AUTO_UNLOCKED_FOR_VALIDATION'),
+}
+
+
+class ContributionTime(db.Model):
+    """ Rolling total of the time each user has spent mapping and validating on each project """
+    __tablename__ = "contribution_time"
+
+    user_id = db.Column(db.BigInteger, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id', ondelete='CASCADE'), primary_key=True,
+                           index=True)
+    activity = db.Column(db.Integer, primary_key=True)
+    duration = db.Column(db.Interval, nullable=False, default=datetime.timedelta())
+
+    @staticmethod
+    def activity_for_action(action: str) -> ContributionActivity:
+        """ Gets the activity a lock action's duration counts towards """
+        mapping_actions = ACTIVITY_ACTIONS[ContributionActivity.MAPPING]
+        return ContributionActivity.MAPPING if action in mapping_actions else ContributionActivity.VALIDATION
+
+    @staticmethod
+    def activity_sql(column: str) -> str:
+        """ SQL CASE expression mapping a task history action column to its ContributionActivity value """
+        mapping_actions = ', '.join(f"'{action}'" for action in ACTIVITY_ACTIONS[ContributionActivity.MAPPING])
+        return f'CASE WHEN {column} IN ({mapping_actions}) THEN {ContributionActivity.MAPPING.value} ' \
+               f'ELSE {ContributionActivity.VALIDATION.value} END'
+
+    @staticmethod
+    def record(user_id: int, project_id: int, activity: ContributionActivity, duration: datetime.timedelta):
+        """ Adds a closed lock's duration to the user's total, within the current transaction """
+        sql = '''INSERT INTO contribution_time (user_id, project_id, activity, duration)
+                 VALUES (:user_id, :project_id, :activity, :duration)
+                 ON CONFLICT (user_id, project_id, activity)
+                 DO UPDATE SET duration = contribution_time.duration + EXCLUDED.duration'''
+
+        db.session.execute(text(sql), dict(user_id=user_id, project_id=project_id, activity=activity.value,
+                                           duration=duration))
+
+    @staticmethod
+    def get_time_spent(user_id: int = None, project_id: int = None) -> Tuple[float, float]:
+        """
+        Gets the total time spent mapping and validating, by a user, on a project or by a user on a project
+        :return: tuple of (mapping seconds, validation seconds)
+        """
+        query = db.session.query(ContributionTime.activity, func.sum(ContributionTime.duration))
+        if user_id is not None:
+            query = query.filter(ContributionTime.user_id == user_id)
+        if project_id is not None:
+            query = query.filter(ContributionTime.project_id == project_id)
+
+        time_spent = {activity: duration for activity, duration in query.group_by(ContributionTime.activity)}
+        mapping = time_spent.get(ContributionActivity.MAPPING.value)
+        validation = time_spent.get(ContributionActivity.VALIDATION.value)
+
+        return (mapping.total_seconds() if mapping else 0,
+                validation.total_seconds() if validation else 0)
+
+    @staticmethod
+    def rebuild():
+        """ Recomputes every total from the lock durations in task history, except projects with archived history """
+        actions = ', '.join(f"'{action}'" for actions in ACTIVITY_ACTIONS.values() for action in actions)
+        sql = f'''INSERT INTO contribution_time (user_id, project_id, activity, duration)
+                  SELECT user_id, project_id, {ContributionTime.activity_sql('action')} AS activity, sum(duration)
+                    FROM task_history
+                   WHERE action IN ({actions})
+                     AND duration IS NOT NULL
+                     AND project_id NOT IN (SELECT project_id FROM project_history_archive)
+                   GROUP BY 1, 2, 3'''
+
+        # Projects with archived history keep their totals, as their lock durations aren't in task_history
+        db.session.execute(text('DELETE FROM contribution_time '
+                                'WHERE project_id NOT IN (SELECT project_id FROM project_history_archive)'))
+        db.session.execute(text(sql))
+        db.session.commit()
@@ -7,7 +7,7 @@ from server.models.dtos.message_dto import MessageDTO, MessagesDTO
 from server.models.postgis.user import User
 from server.models.postgis.task import Task
 from server.models.postgis.project import Project
-from server.models.postgis.utils import timestamp
+from server.models.postgis.utils import timestamp, commit_or_flush
 from server.models.postgis.utils import NotFound
 
 class MessageType(Enum):
@@ -85,7 +85,7 @@ class Message(db.Model):
     def save(self):
         """ Save """
         db.session.add(self)
-        db.session.commit()
+        commit_or_flush()
 
     @staticmethod
     def get_all_contributors(project_id: int):
@@ -100,7 +100,7 @@ class Message(db.Model):
     def mark_as_read(self):
         """ Mark the message in scope as Read """
         self.read = True
-        db.session.commit()
+        commit_or_flush()
 
     @staticmethod
     def get_unread_message_count(user_id: int):
@@ -126,9 +126,9 @@ class Message(db.Model):
         """ Deletes the specified messages to the user """
         Message.query.filter(Message.to_user_id == user_id, Message.id.in_(message_ids)).\
                 delete(synchronize_session=False)
-        db.session.commit()
+        commit_or_flush()
 
     def delete(self):
         """ Deletes the current model from the DB """
         db.session.delete(self)
-        db.session.commit()
+        commit_or_flush()
@@ -21,6 +21,7 @@ import datetime
 from server import db
 from server.models.dtos.project_dto import ProjectDTO, DraftProjectDTO, ProjectSummary, PMDashboardDTO, ProjectStatsDTO, ProjectUserStatsDTO, CustomEditorDTO
 from server.models.dtos.tags_dto import TagsDTO
+from server.models.postgis.contribution_time import ContributionTime
 from server.models.postgis.custom_editors import CustomEditor
 from server.models.postgis.priority_area import PriorityArea, project_priority_areas
 from server.models.postgis.project_info import ProjectInfo
@@ -30,7 +31,8 @@ from server.models.postgis.tags import Tags
 from server.models.postgis.task import Task, TaskHistory
 from server.models.postgis.user import User
 
-from server.models.postgis.utils import ST_SetSRID, ST_GeomFromGeoJSON, timestamp, ST_Centroid, NotFound, ST_Area, ST_Transform
+from server.models.postgis.utils import ST_SetSRID, ST_GeomFromGeoJSON, timestamp, ST_Centroid, NotFound, ST_Area, ST_Transform, \
+    commit_or_flush
 from server.services.grid.grid_service import GridService
 
 # Secondary table defining many-to-many join for private projects that only defined users can map on
@@ -105,6 +107,10 @@ class Project(db.Model):
     tasks_validated = db.Column(db.Integer, default=0, nullable=False)
     tasks_bad_imagery = db.Column(db.Integer, default=0, nullable=False)
 
+    # Bumped whenever a task changes, so caches of rendered tasks can be keyed on them
+    task_status_version = db.Column(db.Integer, default=0, nullable=False)
+    task_geometry_version = db.Column(db.Integer, default=0, nullable=False)
+
     # Mapped Objects
     tasks = db.relationship(Task, backref='projects', cascade="all, delete, delete-orphan", lazy='dynamic')
     project_info = db.relationship(ProjectInfo, lazy='dynamic', cascade='all')
@@ -145,11 +151,11 @@ class Project(db.Model):
     def create(self):
         """ Creates and saves the current model to the DB """
         db.session.add(self)
-        db.session.commit()
+        commit_or_flush()
 
     def save(self):
         """ Save changes to db"""
-        db.session.commit()
+        commit_or_flush()
 
     @staticmethod
     def clone(project_id: int, author_id: int):
@@ -233,6 +239,24 @@ class Project(db.Model):
         """
         return Project.query.get(project_id)
 
+    @staticmethod
+    def get_change_markers(project_id: int):
+        """
+        Gets when the project was last updated along with its task versions, without loading the project
+        :return: tuple of (last_updated, task_status_version, task_geometry_version) if found otherwise None
+        """
+        return db.session.query(Project.last_updated, Project.task_status_version, Project.task_geometry_version)\
+            .filter(Project.id == project_id).one_or_none()
+
+    @staticmethod
+    def get_task_versions(project_id: int):
+        """
+        Gets the task status and geometry versions of the project, without loading the project
+        :return: tuple of (task_status_version, task_geometry_version) if found otherwise None
+        """
+        return db.session.query(Project.task_status_version, Project.task_geometry_version)\
+            .filter(Project.id == project_id).one_or_none()
+
     def update(self, project_dto: ProjectDTO):
         """ Updates project from DTO """
         self.status = ProjectStatus[project_dto.project_status].value
@@ -322,12 +346,12 @@ class Project(db.Model):
             if self.custom_editor:
                 self.custom_editor.delete()
 
-        db.session.commit()
+        commit_or_flush()
 
     def delete(self):
         """ Deletes the current model from the DB """
         db.session.delete(self)
-        db.session.commit()
+        commit_or_flush()
 
     def can_be_deleted(self) -> bool:
         """ Projects can be deleted if they have no mapped work """
@@ -339,7 +363,7 @@ class Project(db.Model):
 
     def get_locked_tasks_for_user(self, user_id: int):
         """ Gets tasks on project owned by specified user id"""
-        tasks = self.tasks.filter_by(locked_by=user_id)
+        tasks = self.tasks.filter(Task.locked_by == user_id, Task.is_locked())
 
         locked_tasks = []
         for task in tasks:
@@ -349,7 +373,7 @@ class Project(db.Model):
 
     def get_locked_tasks_details_for_user(self, user_id: int):
         """ Gets tasks on project owned by specified user id"""
-        tasks = self.tasks.filter_by(locked_by=user_id)
+        tasks = self.tasks.filter(Task.locked_by == user_id, Task.is_locked())
 
         locked_tasks = []
         for task in tasks:
@@ -384,29 +408,9 @@ class Project(db.Model):
     def get_project_user_stats(self, user_id: int) -> ProjectUserStatsDTO:
         """Compute project specific stats for a given user"""
         stats_dto = ProjectUserStatsDTO()
-        stats_dto.time_spent_mapping = 0
-        stats_dto.time_spent_validating = 0
-        stats_dto.total_time_spent = 0
-
-        query = """SELECT SUM(TO_TIMESTAMP(action_text, 'HH24:MI:SS')::TIME) FROM task_history
-                   WHERE (action='LOCKED_FOR_MAPPING' or action='AUTO_UNLOCKED_FOR_MAPPING')
-                   and user_id = :user_id and project_id = :project_id;"""
-        total_mapping_time = db.engine.execute(text(query), user_id=user_id, project_id=self.id)
-        for time in total_mapping_time:
-            total_mapping_time = time[0]
-            if total_mapping_time:
-                stats_dto.time_spent_mapping = total_mapping_time.total_seconds()
-                stats_dto.total_time_spent += stats_dto.time_spent_mapping
-
-        query = """SELECT SUM(TO_TIMESTAMP(action_text, 'HH24:MI:SS')::TIME) FROM task_history
-                   WHERE (action='LOCKED_FOR_VALIDATION' or action='AUTO_UNLOCKED_FOR_VALIDATION')
-                   and user_id = :user_id and project_id = :project_id;"""
-        total_validation_time = db.engine.execute(text(query), user_id=user_id, project_id=self.id)
-        for time in total_validation_time:
-            total_validation_time = time[0]
-            if total_validation_time:
-                stats_dto.time_spent_validating = total_validation_time.total_seconds()
-                stats_dto.total_time_spent += stats_dto.time_spent_validating
+        stats_dto.time_spent_mapping, stats_dto.time_spent_validating = \
+            ContributionTime.get_time_spent(user_id=user_id, project_id=self.id)
+        stats_dto.total_time_spent = stats_dto.time_spent_mapping + stats_dto.time_spent_validating
 
         return stats_dto
 
@@ -502,39 +506,15 @@ class Project(db.Model):
                 TaskHistory.action == 'LOCKED_FOR_VALIDATION',
                 TaskHistory.project_id == self.id
             ).distinct(TaskHistory.user_id).count()
-        project_stats.total_time_spent = 0
-        project_stats.total_mapping_time = 0
-        project_stats.total_validation_time = 0
+        project_stats.total_mapping_time, project_stats.total_validation_time = \
+            ContributionTime.get_time_spent(project_id=self.id)
+        project_stats.total_time_spent = project_stats.total_mapping_time + project_stats.total_validation_time
         project_stats.average_mapping_time = 0
         project_stats.average_validation_time = 0
-
-        query = """SELECT SUM(TO_TIMESTAMP(action_text, 'HH24:MI:SS')::TIME) FROM task_history
-                   WHERE (action='LOCKED_FOR_MAPPING' or action='AUTO_UNLOCKED_FOR_MAPPING')
-                   and project_id = :project_id;"""
-        total_mapping_time = db.engine.execute(text(query), project_id=self.id)
-        for row in total_mapping_time:
-            total_mapping_time = row[0]
-            if total_mapping_time:
-                total_mapping_seconds = total_mapping_time.total_seconds()
-                project_stats.total_mapping_time = total_mapping_seconds
-                project_stats.total_time_spent += project_stats.total_mapping_time
-                if unique_mappers:
-                    average_mapping_time = total_mapping_seconds/unique_mappers
-                    project_stats.average_mapping_time = average_mapping_time
-
-        query = """SELECT SUM(TO_TIMESTAMP(action_text, 'HH24:MI:SS')::TIME) FROM task_history
-                   WHERE (action='LOCKED_FOR_VALIDATION' or action='AUTO_UNLOCKED_FOR_VALIDATION')
-                   and project_id = :project_id;"""
-        total_validation_time = db.engine.execute(text(query), project_id=self.id)
-        for row in total_validation_time:
-            total_validation_time = row[0]
-            if total_validation_time:
-                total_validation_seconds = total_validation_time.total_seconds()
-                project_stats.total_validation_time = total_validation_seconds
-                project_stats.total_time_spent += project_stats.total_validation_time
-                if unique_validators:
-                    average_validation_time = total_validation_seconds/unique_validators
-                    project_stats.average_validation_time = average_validation_time
+        if unique_mappers:
+            project_stats.average_mapping_time = project_stats.total_mapping_time/unique_mappers
+        if unique_validators:
+            project_stats.average_validation_time = project_stats.total_validation_time/unique_validators
 
         # Calculate area_percent_complete to get completion percentage by state according to area
         project_stats.area_percent_mapped = int((Project.get_mapped_area(self.id) / (polygon.area - Project.get_bad_imagery_area(self.id))) * 100)
@@ -614,8 +594,7 @@ class Project(db.Model):
         """ Get count of Locked tasks as a proxy for users who are currently active on the project """
 
         return Task.query \
-            .filter(Task.task_status.in_((TaskStatus.LOCKED_FOR_MAPPING.value,
-                    TaskStatus.LOCKED_FOR_VALIDATION.value))) \
+            .filter(Task.is_locked()) \
             .filter(Task.project_id == project_id) \
             .distinct(Task.locked_by) \
             .count()
@@ -691,11 +670,16 @@ class Project(db.Model):
 
         return self, base_dto
 
-    def as_dto_for_mapping(self, locale: str, abbrev: bool) -> Optional[ProjectDTO]:
-        """ Creates a Project DTO suitable for transmitting to mapper users """
+    def as_dto_for_mapping(self, locale: str, abbrev: bool, tasks=None) -> Optional[ProjectDTO]:
+        """
+        Creates a Project DTO suitable for transmitting to mapper users
+        :param tasks: Optional pre-rendered tasks to use instead of a FeatureCollection
+        """
         project, project_dto = self._get_project_and_base_dto()
 
-        if abbrev == False:
+        if tasks is not None:
+            project_dto.tasks = tasks
+        elif abbrev == False:
             project_dto.tasks = Task.get_tasks_as_geojson_feature_collection(self.id)
         else:
             project_dto.tasks = Task.get_tasks_as_geojson_feature_collection_no_geom(self.id)
@@ -703,6 +687,29 @@ class Project(db.Model):
 
         return project_dto
 
+    def as_stream_for_mapping(self, locale: str, tasks_stream=None):
+        """
+        Creates the mapper Project DTO as a stream of JSON text, with the tasks FeatureCollection streamed straight
+        from the DB rather than built in memory
+        :param tasks_stream: Optional pre-rendered tasks FeatureCollection stream to splice in instead
+        """
+        project, project_dto = self._get_project_and_base_dto()
+        project_dto.project_info = ProjectInfo.get_dto_for_locale(self.id, locale, project.default_locale)
+
+        # Drop the closing brace of the DTO so the tasks can be spliced in as the last member
+        project_json = json.dumps(project_dto.to_primitive())[:-1]
+        if tasks_stream is None:
+            tasks_stream = Task.stream_tasks_as_geojson_feature_collection(self.id)
+
+        return Project._stream_with_tasks(project_json, tasks_stream)
+
+    @staticmethod
+    def _stream_with_tasks(project_json: str, tasks_stream):
+        """ Yields the opened project JSON, followed by the streamed tasks and the closing brace """
+        yield f'{project_json}, "tasks": '
+        yield from tasks_stream
+        yield '}'
+
     def all_tasks_as_geojson(self):
         """ Creates a geojson of all areas """
         project_tasks = Task.get_tasks_as_geojson_feature_collection(self.id)
@@ -0,0 +1,52 @@
+from typing import Tuple
+from sqlalchemy import func
+from server import db
+from server.models.postgis.utils import timestamp
+
+# Tables archived for each project, in the order their rows are restored, children are deleted in reverse
+ARCHIVED_TABLES = ['task_history', 'task_invalidation_history', 'task_mapping_issues', 'messages']
+
+
+class ProjectHistoryArchive(db.Model):
+    """ Compact copy of an archived project's history, moved out of the hot history tables """
+    __tablename__ = "project_history_archive"
+
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id', ondelete='CASCADE'), primary_key=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=timestamp)
+    # Each column holds every archived row of the table as a json array, compressed by Postgres as it's stored
+    task_history = db.Column(db.JSON)
+    task_invalidation_history = db.Column(db.JSON)
+    task_mapping_issues = db.Column(db.JSON)
+    messages = db.Column(db.JSON)
+
+    @staticmethod
+    def is_archived(project_id: int) -> bool:
+        """ Checks if the project's history is currently in the archive """
+        return db.session.query(ProjectHistoryArchive.project_id) \
+            .filter(ProjectHistoryArchive.project_id == project_id).first() is not None
+
+
+class ArchivedUserStats(db.Model):
+    """ Each user's task counts on a project whose history has been archived, so user stats stay whole """
+    __tablename__ = "archived_user_stats"
+
+    user_id = db.Column(db.BigInteger, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project_history_archive.project_id', ondelete='CASCADE'),
+                           primary_key=True, index=True)
+    tasks_mapped = db.Column(db.Integer, nullable=False, default=0)
+    tasks_validated = db.Column(db.Integer, nullable=False, default=0)
+    state_changes = db.Column(db.Integer, nullable=False, default=0)
+
+    @staticmethod
+    def get_user_totals(user_id: int) -> Tuple[int, int, int]:
+        """
+        Gets a user's counts across every archived project
+        :return: tuple of (tasks mapped, tasks validated, projects mapped)
+        """
+        tasks_mapped, tasks_validated, projects_mapped = db.session.query(
+            func.coalesce(func.sum(ArchivedUserStats.tasks_mapped), 0),
+            func.coalesce(func.sum(ArchivedUserStats.tasks_validated), 0),
+            func.count(ArchivedUserStats.project_id).filter(ArchivedUserStats.state_changes > 0)
+        ).filter(ArchivedUserStats.user_id == user_id).one()
+
+        return int(tasks_mapped), int(tasks_validated), projects_mapped
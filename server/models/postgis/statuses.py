@@ -50,6 +50,12 @@ class MappingTypes(Enum):
     OTHER = 5
 
 
+class ContributionActivity(Enum):
+    """ Enum describing the activities contributors' time is totalled for """
+    MAPPING = 0
+    VALIDATION = 1
+
+
 class MappingNotAllowed(Enum):
     """ Enum describing reasons a user cannot map """
     USER_ALREADY_HAS_TASK_LOCKED = 100
@@ -2,22 +2,26 @@ import bleach
 import datetime
 import geojson
 import json
+from collections import defaultdict
 from enum import Enum
 from flask import current_app
-from sqlalchemy import text
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 from sqlalchemy.orm.session import make_transient
 from geoalchemy2 import Geometry
 from server import db
-from typing import List
+from typing import List, Optional
 from server.models.dtos.mapping_dto import TaskDTO, TaskHistoryDTO
 from server.models.dtos.task_annotation_dto import TaskAnnotationDTO
 from server.models.dtos.validator_dto import MappedTasksByUser, MappedTasks, InvalidatedTask, InvalidatedTasks
 from server.models.dtos.project_dto import ProjectComment, ProjectCommentsDTO
 from server.models.dtos.mapping_issues_dto import TaskMappingIssueDTO
+from server.models.postgis.contribution_time import ContributionTime
 from server.models.postgis.statuses import TaskStatus, MappingLevel
 from server.models.postgis.user import User
-from server.models.postgis.utils import InvalidData, InvalidGeoJson, ST_GeomFromGeoJSON, ST_SetSRID, timestamp, parse_duration, NotFound
+from server.models.postgis.utils import InvalidData, InvalidGeoJson, ST_GeomFromGeoJSON, ST_SetSRID, timestamp, parse_duration, NotFound, \
+    tile_bounds, ST_SimplifyPreserveTopology, ST_Multi, commit_or_flush
 from server.models.postgis.task_annotation import TaskAnnotation
 
 
@@ -61,7 +65,7 @@ class TaskInvalidationHistory(db.Model):
     def delete(self):
         """ Deletes the current model from the DB """
         db.session.delete(self)
-        db.session.commit()
+        commit_or_flush()
 
     @staticmethod
     def get_open_for_task(project_id, task_id):
@@ -125,7 +129,7 @@ class TaskMappingIssue(db.Model):
     def delete(self):
         """ Deletes the current model from the DB """
         db.session.delete(self)
-        db.session.commit()
+        commit_or_flush()
 
     def as_dto(self):
         issue_dto = TaskMappingIssueDTO()
@@ -138,6 +142,21 @@ class TaskMappingIssue(db.Model):
         return "{0}: {1}".format(self.issue, self.count)
 
 
+# Takes the latest record of each action from idx_task_history_last_action then the latest of those, rather than
+# sorting every matching record of a task with a long history
+LAST_ACTION_SQL = '''SELECT th.*
+    FROM unnest(:actions) AS a(action)
+    CROSS JOIN LATERAL (SELECT *
+                          FROM task_history
+                         WHERE project_id = :project_id
+                           AND task_id = :task_id
+                           AND action = a.action
+                         ORDER BY action_date DESC
+                         LIMIT 1) th
+    ORDER BY th.action_date DESC
+    LIMIT 1'''
+
+
 class TaskHistory(db.Model):
     """ Describes the history associated with a task """
     __tablename__ = "task_history"
@@ -148,6 +167,8 @@ class TaskHistory(db.Model):
     action = db.Column(db.String, nullable=False)
     action_text = db.Column(db.String)
     action_date = db.Column(db.DateTime, nullable=False, default=timestamp)
+    # How long a lock was held, set on lock and auto-unlock actions once the lock is released
+    duration = db.Column(db.Interval)
     user_id = db.Column(db.BigInteger, db.ForeignKey('users.id', name='fk_users'), nullable=False)
     invalidation_history = db.relationship(TaskInvalidationHistory, lazy='dynamic', cascade='all')
 
@@ -155,7 +176,10 @@ class TaskHistory(db.Model):
     task_mapping_issues = db.relationship(TaskMappingIssue, cascade="all")
 
     __table_args__ = (db.ForeignKeyConstraint([task_id, project_id], ['tasks.id', 'tasks.project_id'], name='fk_tasks'),
-                      db.Index('idx_task_history_composite', 'task_id', 'project_id'), {})
+                      db.Index('idx_task_history_composite', 'task_id', 'project_id'),
+                      # Serves the latest action of a type on a task, see get_last_action_of_type
+                      db.Index('idx_task_history_last_action', 'project_id', 'task_id', 'action',
+                               action_date.desc()), {})
 
     def __init__(self, task_id, project_id, user_id):
         self.task_id = task_id
@@ -183,12 +207,12 @@ class TaskHistory(db.Model):
     def delete(self):
         """ Deletes the current model from the DB """
         db.session.delete(self)
-        db.session.commit()
+        commit_or_flush()
 
     @staticmethod
     def update_task_locked_with_duration(task_id: int, project_id: int, lock_action: TaskStatus, user_id: int):
         """
-        Calculates the duration a task was locked for and sets it on the history record
+        Calculates the duration a task was locked for and sets it on the history record, within the current transaction
         :param task_id: Task in scope
         :param project_id: Project ID in scope
         :param lock_action: The lock action, either Mapping or Validation
@@ -215,9 +239,11 @@ class TaskHistory(db.Model):
             return
 
         duration_task_locked = datetime.datetime.utcnow() - last_locked.action_date
+        last_locked.duration = duration_task_locked
         # Cast duration to isoformat for later transmission via api
         last_locked.action_text = (datetime.datetime.min + duration_task_locked).time().isoformat()
-        db.session.commit()
+        ContributionTime.record(user_id, project_id, ContributionTime.activity_for_action(lock_action.name),
+                                duration_task_locked)
 
     @staticmethod
     def remove_duplicate_task_history_rows(task_id: int, project_id: int, lock_action: TaskStatus, user_id: int):
@@ -230,34 +256,8 @@ class TaskHistory(db.Model):
                                         TaskHistory.action == lock_action.name,
                                         TaskHistory.user_id == user_id).order_by(TaskHistory.id.asc()).first()
 
-        dupe.delete()
-
-    @staticmethod
-    def update_expired_and_locked_actions(project_id: int, task_id: int, expiry_date: datetime, action_text: str):
-        """
-        Sets auto unlock state to all not finished actions, that are older then the expiry date.
-        Action is considered as a not finished, when it is in locked state and doesn't have action text
-        :param project_id: Project ID in scope
-        :param task_id: Task in scope
-        :param expiry_date: Action created before this date is treated as expired
-        :param action_text: Text which will be set for all changed actions
-        :return:
-        """
-        all_expired = TaskHistory.query.filter(
-            TaskHistory.task_id == task_id,
-            TaskHistory.project_id == project_id,
-            TaskHistory.action_text.is_(None),
-            TaskHistory.action.in_([TaskAction.LOCKED_FOR_VALIDATION.name, TaskAction.LOCKED_FOR_MAPPING.name]),
-            TaskHistory.action_date <= expiry_date).all()
-
-        for task_history in all_expired:
-            unlock_action = TaskAction.AUTO_UNLOCKED_FOR_MAPPING if task_history.action == 'LOCKED_FOR_MAPPING' \
-                else TaskAction.AUTO_UNLOCKED_FOR_VALIDATION
-
-            task_history.set_auto_unlock_action(unlock_action)
-            task_history.action_text = action_text
-
-        db.session.commit()
+        db.session.delete(dupe)
+        db.session.flush()
 
     @staticmethod
     def get_all_comments(project_id: int) -> ProjectCommentsDTO:
@@ -284,11 +284,12 @@ class TaskHistory(db.Model):
     @staticmethod
     def get_last_status(project_id: int, task_id: int, for_undo: bool = False):
         """ Get the status the task was set to the last time the task had a STATUS_CHANGE"""
+        # Only the last two status changes are ever needed
         result = db.session.query(TaskHistory.action_text) \
             .filter(TaskHistory.project_id == project_id,
                     TaskHistory.task_id == task_id,
                     TaskHistory.action == TaskAction.STATE_CHANGE.name) \
-            .order_by(TaskHistory.action_date.desc()).all()
+            .order_by(TaskHistory.action_date.desc()).limit(2).all()
 
         if not result:
             return TaskStatus.READY  # No result so default to ready status
@@ -310,17 +311,13 @@ class TaskHistory(db.Model):
     @staticmethod
     def get_last_action(project_id: int, task_id: int):
         """Gets the most recent task history record for the task"""
-        return TaskHistory.query.filter(TaskHistory.project_id == project_id,
-                                        TaskHistory.task_id == task_id) \
-            .order_by(TaskHistory.action_date.desc()).first()
+        return TaskHistory.get_last_action_of_type(project_id, task_id, [action.name for action in TaskAction])
 
     @staticmethod
     def get_last_action_of_type(project_id: int, task_id: int, allowed_task_actions: list):
         """Gets the most recent task history record having provided TaskAction"""
-        return TaskHistory.query.filter(TaskHistory.project_id == project_id,
-                                        TaskHistory.task_id == task_id,
-                                        TaskHistory.action.in_(allowed_task_actions)) \
-            .order_by(TaskHistory.action_date.desc()).first()
+        return TaskHistory.query.from_statement(text(LAST_ACTION_SQL)) \
+            .params(actions=list(allowed_task_actions), project_id=project_id, task_id=task_id).first()
 
     @staticmethod
     def get_last_locked_action(project_id: int, task_id: int):
@@ -337,6 +334,7 @@ class TaskHistory(db.Model):
             [TaskAction.LOCKED_FOR_MAPPING.name, TaskAction.LOCKED_FOR_VALIDATION.name,
              TaskAction.AUTO_UNLOCKED_FOR_MAPPING.name, TaskAction.AUTO_UNLOCKED_FOR_VALIDATION.name])
 
+    @staticmethod
     def get_last_mapped_action(project_id: int, task_id: int):
         """Gets the most recent mapped action, if any, in the task history"""
         return db.session.query(TaskHistory) \
@@ -347,13 +345,56 @@ class TaskHistory(db.Model):
             .order_by(TaskHistory.action_date.desc()).first()
 
 
+# Geometry column served at each resolution, with the simplification tolerance in degrees for the reduced ones
+TASK_GEOMETRY_RESOLUTIONS = {
+    'full': ('geometry', None),
+    'medium': ('geometry_medium', 0.0001),
+    'low': ('geometry_low', 0.001),
+}
+
+# Statuses a task must be in for lock_task_for_mapping and lock_next_task to lock it with each lock action
+LOCKABLE_STATUSES = {
+    TaskAction.LOCKED_FOR_MAPPING: [TaskStatus.READY, TaskStatus.INVALIDATED],
+    TaskAction.LOCKED_FOR_VALIDATION: [TaskStatus.MAPPED, TaskStatus.BADIMAGERY],
+}
+
+# Session info key of the projects whose task versions are bumped when the transaction commits, see bump_task_versions
+BUMPED_PROJECTS_KEY = 'bumped_task_versions'
+
+
+@event.listens_for(db.session, 'before_commit')
+def bump_committed_task_versions(session):
+    """ Bumps the task versions of every project whose tasks were changed in the transaction """
+    bumped_projects = session.info.pop(BUMPED_PROJECTS_KEY, {})
+
+    # In project order, so transactions bumping the same projects can't deadlock
+    for project_id, geometry in sorted(bumped_projects.items()):
+        sql = 'UPDATE projects SET task_status_version = task_status_version + 1'
+        if geometry:
+            sql += ', task_geometry_version = task_geometry_version + 1'
+
+        session.execute(text(f'{sql} WHERE id = :project_id'), {'project_id': project_id})
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_task_version_bumps(session):
+    """ Nothing the transaction changed was committed, so there's nothing to invalidate """
+    session.info.pop(BUMPED_PROJECTS_KEY, None)
+
+
 class Task(db.Model):
     """ Describes an individual mapping Task """
     __tablename__ = "tasks"
+    __table_args__ = (db.Index('idx_tasks_project_change', 'project_id', 'change_id'),
+                      # Reads a project's tasks in ID order without sorting, for lock_next_task's random pick
+                      db.Index('idx_tasks_project_task', 'project_id', 'id'),
+                      # Only locked tasks are indexed, keeping lock lookups and expiry sweeps off task history
+                      db.Index('idx_tasks_locked', 'project_id', 'locked_by', 'lock_expires_at',
+                               postgresql_where=text('task_status IN (1, 3)')), {})
 
     # Table has composite PK on (id and project_id)
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), index=True, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), primary_key=True)
     x = db.Column(db.Integer)
     y = db.Column(db.Integer)
     zoom = db.Column(db.Integer)
@@ -361,10 +402,23 @@ class Task(db.Model):
     # Tasks need to be split differently if created from an arbitrary grid or were clipped to the edge of the AOI
     is_square = db.Column(db.Boolean, default=True)
     geometry = db.Column(Geometry('MULTIPOLYGON', srid=4326))
+    # Simplified copies of the geometry for maps zoomed out too far to draw every vertex, see TASK_GEOMETRY_RESOLUTIONS
+    geometry_medium = db.Column(Geometry('MULTIPOLYGON', srid=4326))
+    geometry_low = db.Column(Geometry('MULTIPOLYGON', srid=4326))
     task_status = db.Column(db.Integer, default=TaskStatus.READY.value)
     locked_by = db.Column(db.BigInteger, db.ForeignKey('users.id', name='fk_users_locked'))
+    locked_at = db.Column(db.DateTime)
+    lock_expires_at = db.Column(db.DateTime)
     mapped_by = db.Column(db.BigInteger, db.ForeignKey('users.id', name='fk_users_mapper'))
     validated_by = db.Column(db.BigInteger, db.ForeignKey('users.id', name='fk_users_validator'))
+    # ID of the transaction that last changed the task's status or lock, the cursor of get_task_changes.  Unlike a
+    # sequence value drawn mid-transaction it can be compared against the transactions still in flight
+    change_id = db.Column(db.BigInteger, server_default=text('txid_current()'), onupdate=func.txid_current())
+    # Summary of the task history maintained by set_task_history, so unlock and undo needn't read the history
+    last_state = db.Column(db.Integer)
+    prev_state = db.Column(db.Integer)
+    last_action_id = db.Column(db.Integer)
+    last_action_user_id = db.Column(db.BigInteger)
 
     # Mapped objects
     task_history = db.relationship(TaskHistory, cascade="all")
@@ -375,16 +429,31 @@ class Task(db.Model):
     def create(self):
         """ Creates and saves the current model to the DB """
         db.session.add(self)
-        db.session.commit()
+        Task.bump_task_versions(self.project_id, geometry=True)
+        commit_or_flush()
 
     def update(self):
         """ Updates the DB with the current state of the Task """
-        db.session.commit()
+        Task.bump_task_versions(self.project_id)
+        commit_or_flush()
 
     def delete(self):
         """ Deletes the current model from the DB """
         db.session.delete(self)
-        db.session.commit()
+        Task.bump_task_versions(self.project_id, geometry=True)
+        commit_or_flush()
+
+    @staticmethod
+    def bump_task_versions(project_id: int, geometry: bool = False):
+        """
+        Bumps the project's task status version, and geometry version if requested, when the current transaction
+        commits so any cached rendering of the project's tasks is invalidated.  The project is only updated once,
+        just before the commit, so concurrent writers to its tasks don't queue behind its row lock for the whole of
+        their transactions
+        :param geometry: Set if tasks have been added, removed or reshaped
+        """
+        bumped_projects = db.session.info.setdefault(BUMPED_PROJECTS_KEY, {})
+        bumped_projects[project_id] = bumped_projects.get(project_id, False) or geometry
 
     @classmethod
     def from_geojson_feature(cls, task_id, task_feature):
@@ -422,9 +491,35 @@ class Task(db.Model):
         task.id = task_id
         task_geojson = geojson.dumps(task_geometry)
         task.geometry = ST_SetSRID(ST_GeomFromGeoJSON(task_geojson), 4326)
+        for column, tolerance in TASK_GEOMETRY_RESOLUTIONS.values():
+            if tolerance is not None:
+                setattr(task, column, ST_Multi(ST_SimplifyPreserveTopology(task.geometry, tolerance)))
 
         return task
 
+    @staticmethod
+    def get_geometry_resolution(resolution: str = None, zoom: int = None) -> str:
+        """
+        Gets the task geometry resolution to serve, either as requested or suited to the map zoom level
+        :raises InvalidData if the resolution is unknown
+        """
+        if resolution is None:
+            if zoom is None or zoom >= 13:
+                return 'full'
+            return 'medium' if zoom >= 10 else 'low'
+
+        if resolution not in TASK_GEOMETRY_RESOLUTIONS:
+            raise InvalidData(f'Unknown resolution {resolution}, valid values are '
+                              f'{", ".join(TASK_GEOMETRY_RESOLUTIONS.keys())}')
+
+        return resolution
+
+    @staticmethod
+    def _geometry_column_sql(resolution: str) -> str:
+        """ Geometry column for the resolution, falling back to full resolution for tasks not yet simplified """
+        column = TASK_GEOMETRY_RESOLUTIONS[resolution][0]
+        return column if column == 'geometry' else f'COALESCE({column}, geometry)'
+
     @staticmethod
     def get(task_id: int, project_id: int):
         """
@@ -437,11 +532,35 @@ class Task(db.Model):
 
         return Task.query.filter_by(id=task_id, project_id=project_id).one_or_none()
 
+    @staticmethod
+    def is_locked():
+        """
+        Filter matching locked tasks.  It's the predicate of the idx_tasks_locked partial index, so lookups of the
+        tasks a user holds locks on should include it for the index to be used
+        """
+        return Task.task_status.in_([TaskStatus.LOCKED_FOR_MAPPING.value, TaskStatus.LOCKED_FOR_VALIDATION.value])
+
     @staticmethod
     def get_tasks(project_id: int, task_ids: List[int]):
         """ Get all tasks that match supplied list """
         return Task.query.filter(Task.project_id == project_id, Task.id.in_(task_ids)).all()
 
+    @staticmethod
+    def get_tasks_for_update(project_id: int, task_ids: List[int]) -> list:
+        """
+        Gets all tasks that match supplied list, locking their rows until the transaction ends.  Rows are locked in id
+        order so concurrent batches can't deadlock
+        """
+        sql = '''SELECT *
+                   FROM tasks
+                  WHERE project_id = :project_id
+                    AND id = ANY(:task_ids)
+                  ORDER BY id
+                    FOR UPDATE'''
+
+        return Task.query.from_statement(text(sql)).params(project_id=project_id, task_ids=list(task_ids)) \
+            .populate_existing().all()
+
     @staticmethod
     def get_all_tasks(project_id: int):
         """ Get all tasks for a given project """
@@ -452,39 +571,77 @@ class Task(db.Model):
       return parse_duration(current_app.config['TASK_AUTOUNLOCK_AFTER'])
 
     @staticmethod
-    def auto_unlock_tasks(project_id: int):
-        """Unlock all tasks locked for longer than the auto-unlock delta"""
+    def auto_unlock_tasks(project_id: int) -> int:
+        """
+        Unlock all tasks whose lock has expired in a single statement.  Open lock actions on those tasks are rewritten
+        to auto-unlock actions recording the lock duration, and each task is reset to the status of its last state
+        change.
+        :return: Number of tasks unlocked
+        """
         expiry_delta = Task.auto_unlock_delta()
         lock_duration = (datetime.datetime.min + expiry_delta).time().isoformat()
-        expiry_date = datetime.datetime.utcnow() - expiry_delta
-        old_locks_query = '''SELECT t.id
-            FROM tasks t, task_history th
-            WHERE t.id = th.task_id
-            AND t.project_id = th.project_id
-            AND t.task_status IN (1,3)
-            AND th.action IN ( 'LOCKED_FOR_VALIDATION','LOCKED_FOR_MAPPING' )
-            AND th.action_text IS NULL
-            AND t.project_id = :project_id
-            AND th.action_date <= :expiry_date
-            '''
-
-        old_tasks = db.engine.execute(text(old_locks_query), project_id=project_id, expiry_date=str(expiry_date))
-
-        if old_tasks.rowcount == 0:
-            # no tasks older than the delta found, return without further processing
-            return
 
-        for old_task in old_tasks:
-            task = Task.get(old_task[0], project_id)
-            task.auto_unlock_expired_tasks(expiry_date, lock_duration)
+        # The task update re-checks the expiry, so a task relocked while the statement runs is left locked
+        auto_unlock_sql = f'''WITH expired_tasks AS (
+                SELECT id
+                  FROM tasks
+                 WHERE project_id = :project_id
+                   AND task_status IN (1,3)
+                   AND lock_expires_at <= :now
+            ), expired AS (
+                UPDATE task_history th
+                   SET action = CASE th.action WHEN 'LOCKED_FOR_MAPPING' THEN 'AUTO_UNLOCKED_FOR_MAPPING'
+                                               ELSE 'AUTO_UNLOCKED_FOR_VALIDATION' END,
+                       action_text = :lock_duration,
+                       duration = :expiry_delta
+                  FROM expired_tasks et
+                 WHERE th.task_id = et.id
+                   AND th.project_id = :project_id
+                   AND th.action IN ('LOCKED_FOR_VALIDATION','LOCKED_FOR_MAPPING')
+                   AND th.action_text IS NULL
+             RETURNING th.user_id, th.action, th.duration
+            ), contributions AS (
+                INSERT INTO contribution_time (user_id, project_id, activity, duration)
+                SELECT user_id, :project_id, {ContributionTime.activity_sql('action')}, sum(duration)
+                  FROM expired
+                 GROUP BY 1, 3
+                    ON CONFLICT (user_id, project_id, activity)
+                    DO UPDATE SET duration = contribution_time.duration + EXCLUDED.duration
+            ), unlocked AS (
+                UPDATE tasks t
+                   SET task_status = COALESCE(t.last_state, {TaskStatus.READY.value}),
+                       locked_by = NULL,
+                       locked_at = NULL,
+                       lock_expires_at = NULL,
+                       change_id = txid_current()
+                  FROM expired_tasks et
+                 WHERE t.id = et.id
+                   AND t.project_id = :project_id
+                   AND t.task_status IN (1,3)
+                   AND t.lock_expires_at <= :now
+             RETURNING t.id
+            )
+            SELECT count(*) FROM unlocked'''
+
+        params = dict(project_id=project_id, now=datetime.datetime.utcnow(), lock_duration=lock_duration,
+                      expiry_delta=expiry_delta)
+        tasks_unlocked = db.session.execute(text(auto_unlock_sql), params).scalar()
+        if tasks_unlocked:
+            Task.bump_task_versions(project_id)
+        commit_or_flush()
+        return tasks_unlocked
 
-    def auto_unlock_expired_tasks(self, expiry_date, lock_duration):
-        """Unlock all tasks locked before expiry date. Clears task lock if needed"""
-        TaskHistory.update_expired_and_locked_actions(self.project_id, self.id, expiry_date, lock_duration)
+    @staticmethod
+    def get_projects_with_expired_locks() -> List[int]:
+        """ Gets the IDs of all projects with tasks whose lock has expired """
+        expired_locks_query = '''SELECT DISTINCT project_id
+            FROM tasks
+            WHERE task_status IN (1,3)
+            AND lock_expires_at <= :now
+            '''
 
-        last_action = TaskHistory.get_last_locked_or_auto_unlocked_action(self.project_id, self.id)
-        if last_action.action in ['AUTO_UNLOCKED_FOR_MAPPING', 'AUTO_UNLOCKED_FOR_VALIDATION']:
-            self.clear_lock()
+        projects = db.engine.execute(text(expired_locks_query), now=datetime.datetime.utcnow())
+        return [project[0] for project in projects]
 
     def is_mappable(self):
         """ Determines if task in scope is in suitable state for mapping """
@@ -518,20 +675,232 @@ class Task(db.Model):
             history.task_mapping_issues = mapping_issues
 
         self.task_history.append(history)
+
+        if action == TaskAction.STATE_CHANGE:
+            self.prev_state = self.last_state
+            self.last_state = new_state.value
+
+        # Flush so the new history record has an ID
+        db.session.flush()
+        self.last_action_id = history.id
+        self.last_action_user_id = user_id
         return history
 
-    def lock_task_for_mapping(self, user_id: int):
-        self.set_task_history(TaskAction.LOCKED_FOR_MAPPING, user_id)
-        self.task_status = TaskStatus.LOCKED_FOR_MAPPING.value
-        self.locked_by = user_id
-        self.update()
+    def refresh_history_summary(self):
+        """ Recomputes the task history summary from the history, needed when history is removed or copied """
+        state_changes = db.session.query(TaskHistory.action_text) \
+            .filter(TaskHistory.project_id == self.project_id,
+                    TaskHistory.task_id == self.id,
+                    TaskHistory.action == TaskAction.STATE_CHANGE.name) \
+            .order_by(TaskHistory.action_date.desc()).limit(2).all()
+
+        self.last_state = TaskStatus[state_changes[0][0]].value if state_changes else None
+        self.prev_state = TaskStatus[state_changes[1][0]].value if len(state_changes) > 1 else None
+
+        last_action = TaskHistory.get_last_action(self.project_id, self.id)
+        self.last_action_id = last_action.id if last_action else None
+        self.last_action_user_id = last_action.user_id if last_action else None
+
+    def get_last_status(self, for_undo: bool = False) -> TaskStatus:
+        """ Get the status the task was set to the last time the task had a STATUS_CHANGE, see TaskHistory """
+        if self.last_state is None:
+            return TaskStatus.READY  # No state change so default to ready status
+
+        if for_undo and (self.prev_state is None or
+                         TaskStatus(self.last_state) in [TaskStatus.MAPPED, TaskStatus.BADIMAGERY]):
+            # There's no previous status to return to, or the task was mapped or marked bad imagery from ready
+            return TaskStatus.READY
+
+        return TaskStatus(self.prev_state) if for_undo else TaskStatus(self.last_state)
+
+    def lock_task_for_mapping(self, user_id: int) -> bool:
+        """
+        Locks the task for mapping with a single conditional update, so of several users locking the same task at once
+        only one succeeds.  The lock history row is only inserted if the task was locked.
+        :return: False if the task was no longer READY or INVALIDATED, so couldn't be locked
+        """
+        sql = Task._lock_task_sql(TaskAction.LOCKED_FOR_MAPPING, 'SELECT CAST(:task_id AS integer) AS id')
+        params = Task._lock_task_params(self.project_id, user_id)
+        params['task_id'] = self.id
+
+        if db.session.execute(text(sql), params).scalar() is None:
+            return False
+
+        Task.bump_task_versions(self.project_id)
+        commit_or_flush()
+
+        # The update bypassed the ORM, so reload the task when it's next used
+        db.session.expire(self)
+        return True
+
+    @staticmethod
+    def lock_next_task(project_id: int, user_id: int, lock_action: TaskAction, lon: float = None, lat: float = None,
+                       exclude_mapped_by: int = None) -> Optional[int]:
+        """
+        Picks and locks the next available task on the project.  Tasks in the project's priority areas are picked
+        first, then the task nearest the point if one is supplied, otherwise a random task.  Tasks being locked by
+        other users are skipped, so concurrent callers are each given a different task.
+        :param lock_action: LOCKED_FOR_MAPPING or LOCKED_FOR_VALIDATION
+        :param exclude_mapped_by: Skip tasks mapped by this user, as users can't validate their own tasks
+        :return: ID of the task locked, or None if no task is available
+        """
+        params = Task._lock_task_params(project_id, user_id)
+        if lon is not None and lat is not None:
+            order_by = 't.geometry <-> ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)'
+            params.update(lon=lon, lat=lat)
+        else:
+            order_by = None
+
+        mapped_by_filter = ''
+        if exclude_mapped_by is not None:
+            mapped_by_filter = 'AND t.mapped_by IS DISTINCT FROM :exclude_mapped_by'
+            params['exclude_mapped_by'] = exclude_mapped_by
+
+        statuses = ','.join(str(status.value) for status in LOCKABLE_STATUSES[lock_action])
+        candidate_filter = f'''t.project_id = :project_id
+                   AND t.task_status IN ({statuses})
+                   {mapped_by_filter}'''
+
+        for next_task_sql in Task._next_task_sqls(candidate_filter, order_by):
+            task_id = db.session.execute(text(Task._lock_task_sql(lock_action, next_task_sql)), params).scalar()
+            if task_id is not None:
+                break
+        else:
+            return None
+
+        Task.bump_task_versions(project_id)
+        commit_or_flush()
+        return task_id
+
+    @staticmethod
+    def _next_task_sqls(candidate_filter: str, order_by: str = None) -> list:
+        """
+        Statements selecting the next task to lock from the tasks matching candidate_filter, tried in turn until one
+        selects a task.  Each only reads the candidates it needs, rather than ranking every task on the project.
+        :param order_by: Order to pick candidates in, a random candidate is picked if None
+        """
+        # Driven from the priority areas through the task geometry index, so only tasks inside them are read
+        priority_sql = f'''SELECT t.id
+                  FROM project_priority_areas ppa
+                  JOIN priority_areas pa ON pa.id = ppa.priority_area_id
+                  JOIN tasks t ON ST_Intersects(pa.geometry, t.geometry)
+                 WHERE ppa.project_id = :project_id
+                   AND {candidate_filter}
+                 ORDER BY {order_by or 'random()'}
+                 LIMIT 1
+                   FOR UPDATE OF t SKIP LOCKED'''
+
+        if order_by is not None:
+            return [priority_sql, f'''SELECT t.id
+                  FROM tasks t
+                 WHERE {candidate_filter}
+                 ORDER BY {order_by}
+                 LIMIT 1
+                   FOR UPDATE OF t SKIP LOCKED''']
+
+        # A random candidate is picked by offset without locking, skipping to the next one along if it's being locked.
+        # Rows passed over by an offset in the locking query would be locked too, blocking other callers.  If all the
+        # candidates from there on are being locked, the first candidate free from the start is taken instead
+        random_start_sql = f'''SELECT t.id
+                  FROM tasks t
+                 WHERE {candidate_filter}
+                 ORDER BY t.id
+                OFFSET (SELECT CAST(floor(random() * count(*)) AS bigint) FROM tasks t WHERE {candidate_filter})
+                 LIMIT 1'''
+        next_candidate_sql = '''SELECT t.id
+                  FROM tasks t
+                 WHERE {candidate_filter}
+                   {start_filter}
+                 ORDER BY t.id
+                 LIMIT 1
+                   FOR UPDATE OF t SKIP LOCKED'''
+
+        return [priority_sql,
+                next_candidate_sql.format(candidate_filter=candidate_filter,
+                                          start_filter=f'AND t.id >= ({random_start_sql})'),
+                next_candidate_sql.format(candidate_filter=candidate_filter, start_filter='')]
+
+    @staticmethod
+    def _lock_task_sql(lock_action: TaskAction, candidate_sql: str) -> str:
+        """
+        Builds a statement that locks the task selected by candidate_sql and inserts its lock history, only if the task
+        is still in a status the lock action allows.  The statement returns the locked task's ID, or no row.
+        """
+        statuses = ','.join(str(status.value) for status in LOCKABLE_STATUSES[lock_action])
+
+        # Concurrent lockers wait on the row lock then recheck the status, so only the first matches.  The history ID
+        # is taken up front so the task's last action is set by the same update
+        return f'''WITH candidate AS (
+                {candidate_sql}
+            ), locked AS (
+                UPDATE tasks t
+                   SET task_status = {TaskStatus[lock_action.name].value},
+                       locked_by = :user_id,
+                       locked_at = :locked_at,
+                       lock_expires_at = :lock_expires_at,
+                       last_action_id = nextval('task_history_id_seq'),
+                       last_action_user_id = :user_id,
+                       change_id = txid_current()
+                  FROM candidate c
+                 WHERE t.id = c.id
+                   AND t.project_id = :project_id
+                   AND t.task_status IN ({statuses})
+             RETURNING t.id, t.last_action_id
+            )
+            INSERT INTO task_history (id, project_id, task_id, action, action_date, user_id)
+            SELECT last_action_id, :project_id, id, '{lock_action.name}', :locked_at, :user_id
+              FROM locked
+            RETURNING task_id'''
+
+    @staticmethod
+    def _lock_task_params(project_id: int, user_id: int) -> dict:
+        """ Parameters for _lock_task_sql """
+        locked_at = datetime.datetime.utcnow()
+        return dict(project_id=project_id, user_id=user_id, locked_at=locked_at,
+                    lock_expires_at=locked_at + Task.auto_unlock_delta())
 
     def lock_task_for_validating(self, user_id: int):
         self.set_task_history(TaskAction.LOCKED_FOR_VALIDATION, user_id)
         self.task_status = TaskStatus.LOCKED_FOR_VALIDATION.value
         self.locked_by = user_id
+        self.set_lock_times()
         self.update()
 
+    @staticmethod
+    def lock_tasks_for_validating(project_id: int, tasks: list, user_id: int):
+        """
+        Locks several tasks for validation with one history insert and one task update, the batch equivalent of
+        lock_task_for_validating.  Tasks should be fetched with get_tasks_for_update.
+        """
+        sql = f'''WITH locked AS (
+                INSERT INTO task_history (project_id, task_id, action, action_date, user_id)
+                SELECT :project_id, task_id, '{TaskAction.LOCKED_FOR_VALIDATION.name}', :locked_at, :user_id
+                  FROM unnest(CAST(:task_ids AS integer[])) AS task_id
+             RETURNING id, task_id
+            )
+            UPDATE tasks t
+               SET task_status = {TaskStatus.LOCKED_FOR_VALIDATION.value},
+                   locked_by = :user_id,
+                   locked_at = :locked_at,
+                   lock_expires_at = :lock_expires_at,
+                   last_action_id = l.id,
+                   last_action_user_id = :user_id,
+                   change_id = txid_current()
+              FROM locked l
+             WHERE t.project_id = :project_id
+               AND t.id = l.task_id'''
+
+        locked_at = datetime.datetime.utcnow()
+        params = dict(project_id=project_id, task_ids=[task.id for task in tasks], user_id=user_id,
+                      locked_at=locked_at, lock_expires_at=locked_at + Task.auto_unlock_delta())
+        db.session.execute(text(sql), params)
+        Task.bump_task_versions(project_id)
+        commit_or_flush()
+
+        # The update bypassed the ORM, so reload the tasks if they're used again within a unit of work
+        for task in tasks:
+            db.session.expire(task)
+
     def reset_task(self, user_id: int):
         if TaskStatus(self.task_status) in [TaskStatus.LOCKED_FOR_MAPPING, TaskStatus.LOCKED_FOR_VALIDATION]:
             self.record_auto_unlock()
@@ -540,6 +909,7 @@ class Task(db.Model):
         self.mapped_by = None
         self.validated_by = None
         self.locked_by = None
+        self.clear_lock_times()
         self.task_status = TaskStatus.READY.value
         self.update()
 
@@ -552,6 +922,7 @@ class Task(db.Model):
         # clear the lock action for the task in the task history
         last_action = TaskHistory.get_last_locked_action(self.project_id, self.id)
         last_action.delete()
+        self.refresh_history_summary()
 
         # Set locked_by to null and status to last status on task
         self.clear_lock()
@@ -567,10 +938,18 @@ class Task(db.Model):
         # Add AUTO_UNLOCKED action in the task history
         auto_unlocked = self.set_task_history(action=next_action, user_id=locked_user)
         auto_unlocked.action_text = lock_duration
+        auto_unlocked.duration = datetime.datetime.utcnow() - last_action.action_date
+        ContributionTime.record(locked_user, self.project_id, ContributionTime.activity_for_action(next_action.name),
+                                auto_unlocked.duration)
         self.update()
 
     def unlock_task(self, user_id, new_state=None, comment=None, undo=False, issues=None):
         """ Unlock task and ensure duration task locked is saved in History """
+        self.apply_unlock(user_id, new_state, comment, undo, issues)
+        self.update()
+
+    def apply_unlock(self, user_id, new_state=None, comment=None, undo=False, issues=None):
+        """ Unlocks the task within the current transaction without committing, see unlock_task """
         if comment:
             self.set_task_history(action=TaskAction.COMMENT, comment=comment, user_id=user_id, mapping_issues=issues)
 
@@ -594,7 +973,7 @@ class Task(db.Model):
 
         self.task_status = new_state.value
         self.locked_by = None
-        self.update()
+        self.clear_lock_times()
 
     def reset_lock(self, user_id, comment=None):
         """ Removes a current lock from a task, resets to last status and updates history with duration of lock """
@@ -607,10 +986,20 @@ class Task(db.Model):
 
     def clear_lock(self):
         """ Resets to last status and removes current lock from a task """
-        self.task_status = TaskHistory.get_last_status(self.project_id, self.id).value
+        self.task_status = self.get_last_status().value
         self.locked_by = None
+        self.clear_lock_times()
         self.update()
 
+    def set_lock_times(self):
+        """ Records when the task was locked and when the lock will be auto-unlocked """
+        self.locked_at = datetime.datetime.utcnow()
+        self.lock_expires_at = self.locked_at + Task.auto_unlock_delta()
+
+    def clear_lock_times(self):
+        self.locked_at = None
+        self.lock_expires_at = None
+
     @staticmethod
     def get_tasks_as_geojson_feature_collection(project_id, task_ids=[]):
         """
@@ -642,6 +1031,225 @@ class Task(db.Model):
 
         return geojson.FeatureCollection(tasks_features)
 
+    @staticmethod
+    def stream_tasks_as_geojson_feature_collection(project_id: int, task_ids: List[int] = None, chunk_size: int = 500,
+                                                   resolution: str = 'full'):
+        """
+        Generator that yields a geoJson FeatureCollection for all tasks related to the supplied project ID as text
+        chunks.  Rows are read through a server side cursor and the geometry returned by PostGIS is spliced into the
+        output as-is, so memory use stays flat however many tasks the project has
+        :param project_id: Owning project ID
+        :param task_ids: Optional list of task IDs to restrict the collection to
+        :param chunk_size: Number of rows fetched from the cursor per chunk
+        :param resolution: Task geometry resolution, see TASK_GEOMETRY_RESOLUTIONS
+        """
+        sql = f'''SELECT id, x, y, zoom, is_square, task_status,
+                         ST_AsGeoJSON({Task._geometry_column_sql(resolution)}) AS geojson
+                    FROM tasks
+                   WHERE project_id = :project_id'''
+        if task_ids:
+            sql += ' AND id = ANY(:task_ids)'
+
+        connection = db.engine.connect().execution_options(stream_results=True)
+        try:
+            project_tasks = connection.execute(text(sql), project_id=project_id, task_ids=list(task_ids or []))
+
+            yield '{"type": "FeatureCollection", "features": ['
+            separator = ''
+            while True:
+                rows = project_tasks.fetchmany(chunk_size)
+                if not rows:
+                    break
+
+                features = []
+                for task in rows:
+                    features.append(separator + Task._task_row_as_feature_json(task))
+                    separator = ', '
+
+                yield ''.join(features)
+            yield ']}'
+        finally:
+            connection.close()
+
+    @staticmethod
+    def get_change_horizon() -> int:
+        """
+        Gets the latest change cursor it's safe to hand out.  Changes are stamped with the ID of the transaction that
+        made them, and every transaction older than the oldest still in flight has finished, so no change at or below
+        the horizon can be committed after it is read
+        """
+        return db.session.execute(text('SELECT txid_snapshot_xmin(txid_current_snapshot()) - 1')).scalar()
+
+    @staticmethod
+    def get_task_changes(project_id: int, since: int = None, limit: int = 1000) -> tuple:
+        """
+        Gets the tasks whose status or lock changed after the since cursor, oldest change first, from an index scan
+        on (project_id, change_id).  Changes from transactions that may still be in flight are held back until they
+        are all done, so polling from the returned cursor never skips a change committed out of order
+        :param since: change_id cursor from a previous call, or None for every task in the project
+        :param limit: Maximum number of changes returned when since is supplied, all the changes made by the last
+                      transaction are returned even if that goes over
+        :return: The changed tasks and the cursor to get the next changes from
+        """
+        # Taken before the tasks are read so every change at or below it is visible to the read
+        horizon = Task.get_change_horizon()
+        query = db.session.query(Task.id, Task.task_status, Task.locked_by, Task.change_id)\
+            .filter(Task.project_id == project_id)
+
+        if since is None:
+            return query.all(), horizon
+
+        changes = query.filter(Task.change_id > since, Task.change_id <= horizon)\
+            .order_by(Task.change_id, Task.id).limit(limit).all()
+
+        if len(changes) < limit:
+            return changes, max(since, horizon)
+
+        # Don't split a transaction's changes across pages, the cursor can only resume after all of them
+        last_change = changes[-1]
+        changes += query.filter(Task.change_id == last_change.change_id, Task.id > last_change.id)\
+            .order_by(Task.id).all()
+        return changes, last_change.change_id
+
+    @staticmethod
+    def get_tasks_as_mvt(project_id: int, zoom: int, x: int, y: int) -> bytes:
+        """
+        Builds a Mapbox Vector Tile of the project's tasks in PostGIS, each feature carrying taskId and taskStatus
+        :raises InvalidData if the tile is outside the tile grid
+        """
+        xmin, ymin, xmax, ymax = tile_bounds(zoom, x, y)
+        # Tiles covering a wide area don't need every vertex
+        geometry_column = Task._geometry_column_sql(Task.get_geometry_resolution(zoom=zoom))
+
+        sql = f'''WITH bounds AS (SELECT ST_MakeEnvelope(:xmin, :ymin, :xmax, :ymax, 3857) AS envelope),
+                       tile AS (SELECT t.id AS "taskId", {Task.task_status_name_sql('t.task_status')} AS "taskStatus",
+                                       ST_AsMVTGeom(ST_Transform({geometry_column}, 3857), b.envelope, 4096, 256,
+                                                    true) AS geom
+                                  FROM tasks t, bounds b
+                                 WHERE t.project_id = :project_id
+                                   AND t.geometry && ST_Transform(b.envelope, 4326))
+                  SELECT ST_AsMVT(tile, 'tasks', 4096, 'geom') FROM tile WHERE geom IS NOT NULL'''
+
+        tile = db.engine.execute(text(sql), project_id=project_id, xmin=xmin, ymin=ymin, xmax=xmax,
+                                 ymax=ymax).scalar()
+        return bytes(tile) if tile else b''
+
+    @staticmethod
+    def task_status_name_sql(column: str) -> str:
+        """ SQL CASE expression mapping a task_status column to its TaskStatus name """
+        cases = ' '.join(f"WHEN {status.value} THEN '{status.name}'" for status in TaskStatus)
+        return f'CASE {column} {cases} END'
+
+    @staticmethod
+    def task_status_value_sql(column: str) -> str:
+        """ SQL CASE expression mapping a column holding a TaskStatus name, as task history does, to its value """
+        cases = ' '.join(f"WHEN '{status.name}' THEN {status.value}" for status in TaskStatus)
+        return f'CASE {column} {cases} END'
+
+    @staticmethod
+    def get_inconsistent_history_summaries(fix: bool = False) -> list:
+        """
+        Finds tasks whose history summary columns don't match their task history
+        :param fix: Set to rewrite the summary of the inconsistent tasks from their history
+        :return: List of (project_id, task_id) of the inconsistent tasks
+        """
+        expected_sql = f'''WITH state_changes AS (
+                SELECT project_id, task_id, {Task.task_status_value_sql('action_text')} AS state,
+                       row_number() OVER (PARTITION BY project_id, task_id ORDER BY action_date DESC, id DESC) AS n
+                  FROM task_history
+                 WHERE action = 'STATE_CHANGE'
+            ), last_actions AS (
+                SELECT DISTINCT ON (project_id, task_id) project_id, task_id, id, user_id
+                  FROM task_history
+                 ORDER BY project_id, task_id, action_date DESC, id DESC
+            ), expected AS (
+                SELECT t.project_id, t.id AS task_id, ls.state AS last_state, ps.state AS prev_state,
+                       la.id AS last_action_id, la.user_id AS last_action_user_id
+                  FROM tasks t
+                  LEFT JOIN state_changes ls ON ls.project_id = t.project_id AND ls.task_id = t.id AND ls.n = 1
+                  LEFT JOIN state_changes ps ON ps.project_id = t.project_id AND ps.task_id = t.id AND ps.n = 2
+                  LEFT JOIN last_actions la ON la.project_id = t.project_id AND la.task_id = t.id
+                 -- Archived history isn't in task_history, so those summaries can't be checked
+                 WHERE t.project_id NOT IN (SELECT project_id FROM project_history_archive)
+            ), inconsistent AS (
+                SELECT e.*
+                  FROM tasks t
+                  JOIN expected e ON e.project_id = t.project_id AND e.task_id = t.id
+                 WHERE (t.last_state, t.prev_state, t.last_action_id, t.last_action_user_id)
+                       IS DISTINCT FROM (e.last_state, e.prev_state, e.last_action_id, e.last_action_user_id)
+            )'''
+
+        if fix:
+            sql = f'''{expected_sql}
+                UPDATE tasks t
+                   SET last_state = i.last_state,
+                       prev_state = i.prev_state,
+                       last_action_id = i.last_action_id,
+                       last_action_user_id = i.last_action_user_id
+                  FROM inconsistent i
+                 WHERE t.project_id = i.project_id
+                   AND t.id = i.task_id
+             RETURNING t.project_id, t.id'''
+        else:
+            sql = f'{expected_sql} SELECT project_id, task_id FROM inconsistent ORDER BY project_id, task_id'
+
+        tasks = db.session.execute(text(sql)).fetchall()
+        db.session.commit()
+        return [(task[0], task[1]) for task in tasks]
+
+    @staticmethod
+    def get_task_feature_prefixes(project_id: int, resolution: str = 'full') -> list:
+        """
+        Renders the status independent part of every task Feature in the project, see _task_row_as_feature_prefix
+        :param resolution: Task geometry resolution, see TASK_GEOMETRY_RESOLUTIONS
+        :return: list of (task_id, feature_prefix) tuples
+        """
+        sql = f'''SELECT id, x, y, zoom, is_square, ST_AsGeoJSON({Task._geometry_column_sql(resolution)}) AS geojson
+                    FROM tasks
+                   WHERE project_id = :project_id'''
+
+        project_tasks = db.engine.execute(text(sql), project_id=project_id)
+        return [(task.id, Task._task_row_as_feature_prefix(task)) for task in project_tasks]
+
+    @staticmethod
+    def get_task_count(project_id: int) -> int:
+        """ Gets the number of tasks in the project """
+        return db.session.query(Task.id).filter(Task.project_id == project_id).count()
+
+    @staticmethod
+    def get_task_statuses(project_id: int) -> dict:
+        """ Gets the status name of every task in the project, keyed by task id """
+        project_tasks = db.session.query(Task.id, Task.task_status).filter(Task.project_id == project_id)
+        return {task.id: TaskStatus(task.task_status).name for task in project_tasks}
+
+    @staticmethod
+    def get_task_status_values(project_id: int) -> list:
+        """ Gets the id and TaskStatus value of every task in the project, ordered by task id """
+        return db.session.query(Task.id, Task.task_status).filter(Task.project_id == project_id)\
+            .order_by(Task.id).all()
+
+    @staticmethod
+    def _task_row_as_feature_json(task) -> str:
+        """ Renders a task row as a geoJson Feature string, without parsing the row's PostGIS geoJson geometry """
+        return Task.complete_feature_json(Task._task_row_as_feature_prefix(task), TaskStatus(task.task_status).name)
+
+    @staticmethod
+    def _task_row_as_feature_prefix(task) -> str:
+        """
+        Renders a task row as a geoJson Feature string, left open at the taskStatus property so the status can be
+        appended with complete_feature_json
+        """
+        task_properties = dict(taskId=task.id, taskX=task.x, taskY=task.y, taskZoom=task.zoom,
+                               taskIsSquare=task.is_square)
+
+        return f'{{"type": "Feature", "geometry": {task.geojson or "null"}, ' \
+               f'"properties": {json.dumps(task_properties)[:-1]}, "taskStatus": '
+
+    @staticmethod
+    def complete_feature_json(feature_prefix: str, task_status: str) -> str:
+        """ Closes a Feature string rendered by _task_row_as_feature_prefix with the task status """
+        return f'{feature_prefix}{json.dumps(task_status)}}}}}'
+
     @staticmethod
     def get_tasks_as_geojson_feature_collection_no_geom(project_id):
         """
@@ -712,8 +1320,68 @@ class Task(db.Model):
 
     def as_dto_with_instructions(self, preferred_locale: str = 'en') -> TaskDTO:
         """ Get dto with any task instructions """
+        task_dto = self._as_dto_with_history(self.task_history)
+
+        per_task_instructions = self.get_per_task_instructions(preferred_locale)
+
+        # If we don't have instructions in preferred locale try again for default locale
+        task_dto.per_task_instructions = per_task_instructions if per_task_instructions else self.get_per_task_instructions(
+            self.projects.default_locale)
+
+        annotations = self.get_per_task_annotations()
+        task_dto.task_annotations = annotations if annotations else  []
+
+        return task_dto
+
+    @staticmethod
+    def as_dtos_with_instructions(project_id: int, tasks: list, preferred_locale: str = 'en') -> List[TaskDTO]:
+        """
+        Gets dtos with task instructions for several tasks on a project.  History, annotations and the project's
+        instructions are read once for the whole batch rather than once per task.
+        """
+        if not tasks:
+            return []
+
+        task_ids = [task.id for task in tasks]
+        history = TaskHistory.query \
+            .options(joinedload(TaskHistory.actioned_by), selectinload(TaskHistory.task_mapping_issues)) \
+            .filter(TaskHistory.project_id == project_id, TaskHistory.task_id.in_(task_ids)) \
+            .order_by(TaskHistory.id).all()
+        history_by_task = defaultdict(list)
+        for action in history:
+            history_by_task[action.task_id].append(action)
+
+        annotations = TaskAnnotation.query \
+            .filter(TaskAnnotation.project_id == project_id, TaskAnnotation.task_id.in_(task_ids)).all()
+        annotations_by_task = defaultdict(list)
+        for annotation in annotations:
+            annotations_by_task[annotation.task_id].append(annotation.get_dto())
+
+        project = tasks[0].projects
+        instructions = {info.locale: info.per_task_instructions for info in project.project_info.all()}
+
+        dtos = []
+        for task in tasks:
+            task_dto = task._as_dto_with_history(history_by_task[task.id])
+
+            # If we don't have instructions in preferred locale try again for default locale
+            per_task_instructions = None
+            for locale in [preferred_locale, project.default_locale]:
+                if locale in instructions:
+                    per_task_instructions = task.format_per_task_instructions(instructions[locale])
+                if per_task_instructions:
+                    break
+
+            task_dto.per_task_instructions = per_task_instructions
+            task_dto.task_annotations = annotations_by_task[task.id]
+            dtos.append(task_dto)
+
+        return dtos
+
+    def _as_dto_with_history(self, actions: list) -> TaskDTO:
+        """ Get dto with the supplied task history, without instructions or annotations """
         task_history = []
-        for action in self.task_history:
+        for action in actions:
             history = TaskHistoryDTO()
             history.history_id = action.id
             history.action = action.action
@@ -733,15 +1401,6 @@ class Task(db.Model):
         task_dto.task_history = task_history
         task_dto.auto_unlock_seconds = Task.auto_unlock_delta().total_seconds()
 
-        per_task_instructions = self.get_per_task_instructions(preferred_locale)
-
-        # If we don't have instructions in preferred locale try again for default locale
-        task_dto.per_task_instructions = per_task_instructions if per_task_instructions else self.get_per_task_instructions(
-            self.projects.default_locale)
-
-        annotations = self.get_per_task_annotations()
-        task_dto.task_annotations = annotations if annotations else  []
-
         return task_dto
 
     def get_per_task_annotations(self):
@@ -5,10 +5,11 @@ from server import db
 from sqlalchemy import desc, text
 from server.models.dtos.user_dto import UserDTO, UserMappedProjectsDTO, MappedProject, UserFilterDTO, Pagination, \
     UserSearchQuery, UserSearchDTO, ProjectParticipantUser, ListedUser
+from server.models.postgis.contribution_time import ContributionTime
 from server.models.postgis.licenses import License, users_licenses_table
 from server.models.postgis.project_info import ProjectInfo
 from server.models.postgis.statuses import MappingLevel, ProjectStatus, UserRole
-from server.models.postgis.utils import NotFound, timestamp
+from server.models.postgis.utils import NotFound, timestamp, commit_or_flush
 
 class User(db.Model):
     """ Describes the history associated with a task """
@@ -40,10 +41,10 @@ class User(db.Model):
     def create(self):
         """ Creates and saves the current model to the DB """
         db.session.add(self)
-        db.session.commit()
+        commit_or_flush()
 
     def save(self):
-        db.session.commit()
+        commit_or_flush()
 
     def get_by_id(self, user_id: int):
         """ Return the user for the specified id, or None if not found """
@@ -56,7 +57,7 @@ class User(db.Model):
     def update_username(self, username: str):
         """ Update the username """
         self.username = username
-        db.session.commit()
+        commit_or_flush()
 
     def update(self, user_dto: UserDTO):
         """ Update the user details """
@@ -65,17 +66,17 @@ class User(db.Model):
         self.facebook_id = user_dto.facebook_id.lower() if user_dto.facebook_id else None
         self.linkedin_id = user_dto.linkedin_id.lower() if user_dto.linkedin_id else None
         self.validation_message = user_dto.validation_message
-        db.session.commit()
+        commit_or_flush()
 
     def set_email_verified_status(self, is_verified: bool):
         """ Updates email verfied flag on successfully verified emails"""
         self.is_email_verified = is_verified
-        db.session.commit()
+        commit_or_flush()
 
     def set_is_expert(self, is_expert: bool):
         """ Enables or disables expert mode on the user"""
         self.is_expert = is_expert
-        db.session.commit()
+        commit_or_flush()
 
     @staticmethod
     def get_all_users(query: UserSearchQuery) -> UserSearchDTO:
@@ -149,9 +150,9 @@ class User(db.Model):
 
     @staticmethod
     def upsert_mapped_projects(user_id: int, project_id: int):
-        """ Adds projects to mapped_projects if it doesn't exist """
+        """ Adds projects to mapped_projects if it doesn't exist, in the current transaction """
         sql = "select * from users where id = :user_id and projects_mapped @> '{{:project_id}}'"
-        result = db.engine.execute(text(sql), user_id=user_id, project_id=project_id)
+        result = db.session.execute(text(sql), dict(user_id=user_id, project_id=project_id))
 
         if result.rowcount > 0:
             return  # User has previously mapped this project so return
@@ -160,7 +161,7 @@ class User(db.Model):
                     set projects_mapped = array_append(projects_mapped, :project_id)
                   where id = :user_id'''
 
-        db.engine.execute(text(sql), project_id=project_id, user_id=user_id)
+        db.session.execute(text(sql), dict(project_id=project_id, user_id=user_id))
 
     @staticmethod
     def get_mapped_projects(user_id: int, preferred_locale: str) -> UserMappedProjectsDTO:
@@ -219,18 +220,18 @@ class User(db.Model):
     def set_user_role(self, role: UserRole):
         """ Sets the supplied role on the user """
         self.role = role.value
-        db.session.commit()
+        commit_or_flush()
 
     def set_mapping_level(self, level: MappingLevel):
         """ Sets the supplied level on the user """
         self.mapping_level = level.value
-        db.session.commit()
+        commit_or_flush()
 
     def accept_license_terms(self, license_id: int):
         """ Associate the user in scope with the supplied license """
         image_license = License.get_by_id(license_id)
         self.accepted_licenses.append(image_license)
-        db.session.commit()
+        commit_or_flush()
 
     def has_user_accepted_licence(self, license_id: int):
         """ Test to see if the user has accepted the terms of the specified license"""
@@ -244,7 +245,7 @@ class User(db.Model):
     def delete(self):
         """ Delete the user in scope from DB """
         db.session.delete(self)
-        db.session.commit()
+        commit_or_flush()
 
     def as_dto(self, logged_in_username: str) -> UserDTO:
         """ Create DTO object from user in scope """
@@ -267,31 +268,8 @@ class User(db.Model):
         user_dto.linkedin_id = self.linkedin_id
         user_dto.facebook_id = self.facebook_id
         user_dto.validation_message = self.validation_message
-        user_dto.total_time_spent = 0
-        user_dto.time_spent_mapping = 0
-        user_dto.time_spent_validating = 0
-
-        sql = """SELECT SUM(TO_TIMESTAMP(action_text, 'HH24:MI:SS')::TIME) FROM task_history
-                WHERE (action='LOCKED_FOR_VALIDATION' or action='AUTO_UNLOCKED_FOR_VALIDATION')
-                and user_id = :user_id;"""
-        total_validation_time = db.engine.execute(text(sql), user_id=self.id)
-        for row in total_validation_time:
-            total_validation_time = row[0]
-            if total_validation_time:
-                total_validation_seconds = total_validation_time.total_seconds()
-                user_dto.time_spent_validating = total_validation_seconds
-                user_dto.total_time_spent += user_dto.time_spent_validating
-
-        sql = """SELECT SUM(TO_TIMESTAMP(action_text, 'HH24:MI:SS')::TIME) FROM task_history
-                WHERE (action='LOCKED_FOR_MAPPING' or action='AUTO_UNLOCKED_FOR_MAPPING')
-                and user_id = :user_id;"""
-        total_mapping_time = db.engine.execute(text(sql), user_id=self.id)
-        for row in total_mapping_time:
-            total_mapping_time = row[0]
-            if total_mapping_time:
-                total_mapping_seconds = total_mapping_time.total_seconds()
-                user_dto.time_spent_mapping = total_mapping_seconds
-                user_dto.total_time_spent += user_dto.time_spent_mapping
+        user_dto.time_spent_mapping, user_dto.time_spent_validating = ContributionTime.get_time_spent(user_id=self.id)
+        user_dto.total_time_spent = user_dto.time_spent_mapping + user_dto.time_spent_validating
 
         if self.username == logged_in_username:
             # Only return email address when logged in user is looking at their own profile
@@ -1,9 +1,10 @@
 import datetime
 import json
 import re
-from flask import current_app
+from flask import current_app, g
 from geoalchemy2 import Geometry
 from geoalchemy2.functions import GenericFunction
+from server import db
 
 
 class NotFound(Exception):
@@ -78,12 +79,109 @@ class ST_Intersects(GenericFunction):
     type = Geometry
 
 
+class ST_SimplifyPreserveTopology(GenericFunction):
+    """ Exposes PostGIS ST_SimplifyPreserveTopology function """
+    name = 'ST_SimplifyPreserveTopology'
+    type = Geometry
+
+
+class ST_Multi(GenericFunction):
+    """ Exposes PostGIS ST_Multi function """
+    name = 'ST_Multi'
+    type = Geometry
+
+
 class ST_MakeEnvelope(GenericFunction):
     """ Exposes PostGIS ST_MakeEnvelope function """
     name = 'ST_MakeEnvelope'
     type = Geometry
 
 
+# Half the width of the Web Mercator (EPSG:3857) world in metres
+WEB_MERCATOR_EXTENT = 20037508.342789244
+
+# Deepest zoom level tiles are served for
+MAX_TILE_ZOOM = 24
+
+
+def tile_bounds(zoom: int, x: int, y: int):
+    """
+    Calculates the Web Mercator bounds of a slippy map tile
+    :return: tuple of (xmin, ymin, xmax, ymax) in EPSG:3857 metres
+    :raises InvalidData if the zoom isn't served or the tile is outside the tile grid for the zoom level
+    """
+    # Check the zoom first, so a huge zoom can't make us build a huge integer
+    if zoom < 0 or zoom > MAX_TILE_ZOOM:
+        raise InvalidData(f'Tile zoom {zoom} must be between 0 and {MAX_TILE_ZOOM}')
+
+    tiles_per_side = 2 ** zoom
+    if x < 0 or y < 0 or x >= tiles_per_side or y >= tiles_per_side:
+        raise InvalidData(f'Tile {zoom}/{x}/{y} is outside the tile grid')
+
+    tile_size = 2 * WEB_MERCATOR_EXTENT / tiles_per_side
+    xmin = -WEB_MERCATOR_EXTENT + x * tile_size
+    ymax = WEB_MERCATOR_EXTENT - y * tile_size
+    return xmin, ymax - tile_size, xmin + tile_size, ymax
+
+
+class UnitOfWork:
+    """
+    Groups all the changes made while handling a request into a single transaction.  While a unit of work is open
+    model save methods only flush, then everything is committed once when it closes, or rolled back if it raises or
+    is marked as failed.  Nested units of work join the outermost one.
+    """
+    def __init__(self):
+        self.failed = False
+        self.after_commit = []
+
+    def __enter__(self):
+        self.outer = g.get('unit_of_work')
+        if self.outer is None:
+            g.unit_of_work = self
+        return self.outer or self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.outer is not None:
+            return  # Outermost unit of work commits
+
+        g.unit_of_work = None
+        if exc_type is not None or self.failed:
+            db.session.rollback()
+            return
+
+        db.session.commit()
+        for callback, args in self.after_commit:
+            try:
+                callback(*args)
+            except Exception as e:
+                # The work is already committed, so don't fail the request
+                current_app.logger.error(f'Unit of work - after commit callback failed: {str(e)}')
+
+    def rollback(self):
+        """ Marks the unit of work as failed, so nothing done in it is committed """
+        self.failed = True
+
+
+def commit_or_flush():
+    """ Commits the session, or only flushes it if a unit of work is open so the unit of work commits it """
+    if g.get('unit_of_work') is not None:
+        db.session.flush()
+    else:
+        db.session.commit()
+
+
+def run_after_commit(callback, *args):
+    """
+    Runs the callback once the open unit of work has been committed, it won't run if the unit of work rolls back.
+    If no unit of work is open it runs immediately, so call it after commit_or_flush.
+    """
+    unit_of_work = g.get('unit_of_work')
+    if unit_of_work is not None:
+        unit_of_work.after_commit.append((callback, args))
+    else:
+        callback(*args)
+
+
 def timestamp():
     """ Used in SQL Alchemy models to ensure we refresh timestamp when new models initialised"""
     return datetime.datetime.utcnow()
@@ -0,0 +1,269 @@
+import datetime
+
+from flask import current_app
+from sqlalchemy import text
+
+from server import db
+from server.models.postgis.contribution_time import ContributionTime
+from server.models.postgis.project import Project
+from server.models.postgis.statuses import TaskStatus
+from server.models.postgis.task import Task, TaskAction
+from server.models.postgis.utils import NotFound
+
+# Tasks are transitioned this many at a time within the one transaction, with progress logged after each chunk
+CHUNK_SIZE = 1000
+
+LOCKED_STATUSES = f'{TaskStatus.LOCKED_FOR_MAPPING.value}, {TaskStatus.LOCKED_FOR_VALIDATION.value}'
+# Most recent mapped or bad imagery state change of each task in the chunk, see TaskHistory.get_last_mapped_action
+LAST_MAPPED_SQL = f'''SELECT DISTINCT ON (task_id) task_id, user_id, action_date
+                        FROM task_history
+                       WHERE project_id = :project_id
+                         AND task_id = ANY(:task_ids)
+                         AND action = '{TaskAction.STATE_CHANGE.name}'
+                         AND action_text IN ('{TaskStatus.BADIMAGERY.name}', '{TaskStatus.MAPPED.name}')
+                       ORDER BY task_id, action_date DESC'''
+
+# How each bulk transition is applied:
+#   new_state - state every task ends up in
+#   task_filter - tasks on the project that are transitioned
+#   close_locks - whether the filter covers locked tasks, whose open lock is closed first
+#   lock_action - lock recorded in history first on tasks not already locked, as the per task lock and unlock did
+#   comment - comment recorded in history first
+#   auto_unlock - existing locks are recorded as auto-unlocked rather than unlocked by their holder
+#   mapped_by, validated_by - new values, in terms of the task before the transition
+TRANSITIONS = {
+    'map_all': dict(
+        new_state=TaskStatus.MAPPED,
+        task_filter=f'task_status NOT IN ({TaskStatus.MAPPED.value}, {TaskStatus.VALIDATED.value}, '
+                    f'{TaskStatus.BADIMAGERY.value})',
+        close_locks=True, lock_action=TaskAction.LOCKED_FOR_MAPPING, comment=None, auto_unlock=False,
+        # Tasks being validated keep their mapper
+        mapped_by=f'CASE WHEN t.task_status = {TaskStatus.LOCKED_FOR_VALIDATION.value} THEN t.mapped_by '
+                  f'ELSE :user_id END',
+        validated_by='t.validated_by'),
+    'validate_all': dict(
+        new_state=TaskStatus.VALIDATED,
+        task_filter=f'task_status != {TaskStatus.BADIMAGERY.value}',
+        close_locks=True, lock_action=TaskAction.LOCKED_FOR_VALIDATION, comment=None, auto_unlock=False,
+        mapped_by='COALESCE(t.mapped_by, :user_id)',
+        validated_by=':user_id'),
+    'invalidate_all': dict(
+        new_state=TaskStatus.INVALIDATED,
+        task_filter=f'task_status NOT IN ({TaskStatus.READY.value}, {TaskStatus.BADIMAGERY.value})',
+        close_locks=True, lock_action=TaskAction.LOCKED_FOR_VALIDATION, comment=None, auto_unlock=False,
+        mapped_by='NULL',
+        validated_by='NULL'),
+    'reset_all': dict(
+        new_state=TaskStatus.READY,
+        task_filter='TRUE',
+        close_locks=True, lock_action=None, comment='Task reset', auto_unlock=True,
+        mapped_by='NULL',
+        validated_by='NULL'),
+    # Bad imagery tasks are never locked, so this is a single history insert and task update per chunk
+    'reset_bad_imagery': dict(
+        new_state=TaskStatus.READY,
+        task_filter=f'task_status = {TaskStatus.BADIMAGERY.value}',
+        close_locks=False, lock_action=None, comment=None, auto_unlock=False,
+        mapped_by='t.mapped_by',
+        validated_by='t.validated_by'),
+}
+
+
+class BulkTransitionService:
+
+    @staticmethod
+    def map_all_tasks(project_id: int, user_id: int):
+        """ Marks all tasks on a project as mapped """
+        project = BulkTransitionService._transition_all_tasks(project_id, user_id, 'map_all')
+        project.tasks_mapped = (project.total_tasks - project.tasks_bad_imagery)
+        BulkTransitionService._commit(project)
+
+    @staticmethod
+    def validate_all_tasks(project_id: int, user_id: int):
+        """ Validates all tasks on a project, apart from those marked bad imagery """
+        project = BulkTransitionService._transition_all_tasks(project_id, user_id, 'validate_all')
+        project.tasks_mapped = (project.total_tasks - project.tasks_bad_imagery)
+        project.tasks_validated = project.total_tasks
+        BulkTransitionService._commit(project)
+
+    @staticmethod
+    def invalidate_all_tasks(project_id: int, user_id: int):
+        """ Invalidates all mapped tasks on a project """
+        project = BulkTransitionService._transition_all_tasks(project_id, user_id, 'invalidate_all')
+        project.tasks_mapped = 0
+        project.tasks_validated = 0
+        BulkTransitionService._commit(project)
+
+    @staticmethod
+    def reset_all_tasks(project_id: int, user_id: int):
+        """ Resets all tasks on a project to ready, preserving history """
+        project = BulkTransitionService._transition_all_tasks(project_id, user_id, 'reset_all')
+        project.tasks_mapped = 0
+        project.tasks_validated = 0
+        project.tasks_bad_imagery = 0
+        BulkTransitionService._commit(project)
+
+    @staticmethod
+    def reset_all_bad_imagery(project_id: int, user_id: int):
+        """ Marks all bad imagery tasks on a project ready for mapping """
+        project = BulkTransitionService._transition_all_tasks(project_id, user_id, 'reset_bad_imagery')
+        project.tasks_bad_imagery = 0
+        BulkTransitionService._commit(project)
+
+    @staticmethod
+    def _commit(project: Project):
+        """ Commits the transition and the project's recomputed counters together """
+        Task.bump_task_versions(project.id)
+        db.session.commit()
+
+    @staticmethod
+    def _transition_all_tasks(project_id: int, user_id: int, transition_name: str) -> Project:
+        """
+        Applies a bulk transition to every task on the project that it covers, within the current transaction.  The
+        tasks are row locked up front, then updated a chunk at a time with a few set based statements per chunk.
+        :raises NotFound
+        :return: The project, for its counters to be set before committing
+        """
+        project = Project.get(project_id)
+        if project is None:
+            raise NotFound()
+
+        transition = TRANSITIONS[transition_name]
+        new_state = transition['new_state']
+        select_sql = f'''SELECT id
+                           FROM tasks
+                          WHERE project_id = :project_id
+                            AND {transition['task_filter']}
+                          ORDER BY id
+                            FOR UPDATE'''
+        task_ids = [row[0] for row in db.session.execute(text(select_sql), dict(project_id=project_id))]
+
+        now = datetime.datetime.utcnow()
+        for start in range(0, len(task_ids), CHUNK_SIZE):
+            params = dict(project_id=project_id, user_id=user_id, now=now,
+                          task_ids=task_ids[start:start + CHUNK_SIZE])
+            for sql in BulkTransitionService._transition_sql(transition):
+                db.session.execute(text(sql), params)
+
+            current_app.logger.info(f'Set {min(start + CHUNK_SIZE, len(task_ids))} of {len(task_ids)} tasks on '
+                                    f'project {project_id} to {new_state.name}')
+
+        return project
+
+    @staticmethod
+    def _transition_sql(transition: dict) -> list:
+        """ Statements that transition one chunk of tasks, run in order """
+        new_state = transition['new_state']
+        statements = []
+
+        if transition['comment']:
+            statements.append(f'''INSERT INTO task_history (project_id, task_id, action, action_text, action_date,
+                                                            user_id)
+                                  SELECT :project_id, id, '{TaskAction.COMMENT.name}', '{transition['comment']}',
+                                         :now, :user_id
+                                    FROM tasks
+                                   WHERE project_id = :project_id
+                                     AND id = ANY(:task_ids)
+                                   ORDER BY id''')
+
+        if transition['close_locks']:
+            # Close the open lock on any locked task, crediting the lock holder with the time it was held
+            statements.append(BulkTransitionService._close_locks_sql(transition['auto_unlock']))
+
+        if transition['lock_action']:
+            # Tasks that weren't locked are locked and unlocked straight away, so they show a lock of no duration
+            statements.append(f'''INSERT INTO task_history (project_id, task_id, action, action_text, action_date,
+                                                            duration, user_id)
+                                  SELECT :project_id, id, '{transition['lock_action'].name}', '00:00:00', :now,
+                                         interval '0', :user_id
+                                    FROM tasks
+                                   WHERE project_id = :project_id
+                                     AND id = ANY(:task_ids)
+                                     AND task_status NOT IN ({LOCKED_STATUSES})
+                                   ORDER BY id''')
+
+        statements.append(f'''WITH changed AS (
+                INSERT INTO task_history (project_id, task_id, action, action_text, action_date, user_id)
+                SELECT :project_id, id, '{TaskAction.STATE_CHANGE.name}', '{new_state.name}', :now, :user_id
+                  FROM tasks
+                 WHERE project_id = :project_id
+                   AND id = ANY(:task_ids)
+                 ORDER BY id
+             RETURNING id, task_id
+            )
+            UPDATE tasks t
+               SET task_status = {new_state.value},
+                   mapped_by = {transition['mapped_by']},
+                   validated_by = {transition['validated_by']},
+                   locked_by = NULL,
+                   locked_at = NULL,
+                   lock_expires_at = NULL,
+                   prev_state = t.last_state,
+                   last_state = {new_state.value},
+                   last_action_id = c.id,
+                   last_action_user_id = :user_id,
+                   change_id = txid_current()
+              FROM changed c
+             WHERE t.project_id = :project_id
+               AND t.id = c.task_id''')
+
+        if new_state == TaskStatus.VALIDATED:
+            # Closes any open invalidation, see TaskInvalidationHistory.record_validation
+            statements.append(f'''UPDATE task_invalidation_history ih
+                   SET mapper_id = lm.user_id,
+                       mapped_date = lm.action_date,
+                       validator_id = :user_id,
+                       validated_date = :now,
+                       is_closed = TRUE,
+                       updated_date = :now
+                  FROM ({LAST_MAPPED_SQL}) lm
+                 WHERE ih.project_id = :project_id
+                   AND ih.task_id = lm.task_id
+                   AND NOT ih.is_closed''')
+        elif new_state == TaskStatus.INVALIDATED:
+            # Starts a new invalidation for each mapped task, see TaskInvalidationHistory.record_invalidation
+            statements.append('''UPDATE task_invalidation_history
+                   SET is_closed = TRUE
+                 WHERE project_id = :project_id
+                   AND task_id = ANY(:task_ids)
+                   AND NOT is_closed''')
+            statements.append(f'''INSERT INTO task_invalidation_history (project_id, task_id, is_closed, mapper_id,
+                                                                         mapped_date, invalidator_id,
+                                                                         invalidated_date, invalidation_history_id,
+                                                                         updated_date)
+                SELECT :project_id, t.id, FALSE, lm.user_id, lm.action_date, :user_id, :now, t.last_action_id, :now
+                  FROM tasks t
+                  JOIN ({LAST_MAPPED_SQL}) lm ON lm.task_id = t.id
+                 WHERE t.project_id = :project_id''')
+
+        return statements
+
+    @staticmethod
+    def _close_locks_sql(auto_unlock: bool) -> str:
+        """ Statement closing the open lock of each locked task in the chunk, see TRANSITIONS """
+        close_action = ''
+        if auto_unlock:
+            close_action = f'''action = CASE th.action WHEN '{TaskAction.LOCKED_FOR_MAPPING.name}'
+                                                   THEN '{TaskAction.AUTO_UNLOCKED_FOR_MAPPING.name}'
+                                                   ELSE '{TaskAction.AUTO_UNLOCKED_FOR_VALIDATION.name}' END,'''
+        return f'''WITH closed AS (
+                UPDATE task_history th
+                   SET {close_action}
+                       action_text = to_char(:now - th.action_date, 'HH24:MI:SS.US'),
+                       duration = :now - th.action_date
+                  FROM tasks t
+                 WHERE t.project_id = :project_id
+                   AND t.id = ANY(:task_ids)
+                   AND t.task_status IN ({LOCKED_STATUSES})
+                   AND th.project_id = :project_id
+                   AND th.task_id = t.id
+                   AND th.action IN ('{TaskAction.LOCKED_FOR_MAPPING.name}', '{TaskAction.LOCKED_FOR_VALIDATION.name}')
+                   AND th.action_text IS NULL
+             RETURNING th.user_id, th.action, th.duration
+            )
+            INSERT INTO contribution_time (user_id, project_id, activity, duration)
+            SELECT user_id, :project_id, {ContributionTime.activity_sql('action')}, sum(duration)
+              FROM closed
+             GROUP BY 1, 3
+                ON CONFLICT (user_id, project_id, activity)
+                DO UPDATE SET duration = contribution_time.duration + EXCLUDED.duration'''
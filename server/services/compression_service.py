@@ -0,0 +1,107 @@
+import gzip
+import zlib
+from typing import Iterator
+
+from cachetools import TTLCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Compressed bodies are keyed on the versions their content depends on, so each version is compressed once.  Bounded
+# by the bytes held rather than the number of bodies, as one body can be a whole project's tasks
+compressed_body_cache = TTLCache(maxsize=64 * 1024 * 1024, ttl=3600, getsizeof=len)
+
+# Favour speed over ratio, bodies are recompressed every time the task versions change
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# zlib window bits that write a gzip header and trailer around the deflate stream
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+class CompressionService:
+
+    @staticmethod
+    def supported_encodings() -> list:
+        """ Content encodings we can serve, in order of preference """
+        return ['br', 'gzip'] if brotli else ['gzip']
+
+    @staticmethod
+    def get_compressed_body(cache_key: tuple, encoding: str, build_body) -> bytes:
+        """
+        Gets the compressed body for the cache key, building and compressing it only on a cache miss
+        :param cache_key: Identifies the body, must include the version of everything the body depends on
+        :param encoding: One of supported_encodings
+        :param build_body: Callable returning the uncompressed body as bytes
+        """
+        key = cache_key + (encoding,)
+        body = compressed_body_cache.get(key)
+
+        if body is None:
+            body = CompressionService.compress(build_body(), encoding)
+            try:
+                compressed_body_cache[key] = body
+            except ValueError:
+                pass  # Too large to cache on its own, it's compressed again on the next request
+
+        return body
+
+    @staticmethod
+    def stream_compressed_body(cache_key: tuple, encoding: str, build_chunks) -> Iterator[bytes]:
+        """
+        Generator that yields the compressed body for the cache key.  On a cache miss the body is compressed chunk by
+        chunk as it is built, and only cached once it has all been sent and it fits in the cache
+        :param cache_key: Identifies the body, must include the version of everything the body depends on
+        :param encoding: One of supported_encodings
+        :param build_chunks: Callable returning the uncompressed body as an iterable of bytes
+        """
+        key = cache_key + (encoding,)
+        body = compressed_body_cache.get(key)
+
+        if body is not None:
+            yield body
+            return
+
+        cached_chunks, cached_size = [], 0
+        for compressed_chunk in CompressionService._compress_chunks(build_chunks(), encoding):
+            yield compressed_chunk
+
+            if cached_chunks is not None:
+                cached_size += len(compressed_chunk)
+                # Let go of the body once it can't fit in the cache, so memory stays flat however large it is
+                if cached_size > compressed_body_cache.maxsize:
+                    cached_chunks = None
+                else:
+                    cached_chunks.append(compressed_chunk)
+
+        if cached_chunks is not None:
+            try:
+                compressed_body_cache[key] = b''.join(cached_chunks)
+            except ValueError:
+                pass  # Too large to cache, it's compressed again on the next request
+
+    @staticmethod
+    def _compress_chunks(chunks, encoding: str) -> Iterator[bytes]:
+        """ Compresses the chunks with an incremental compressor, yielding output whenever the compressor has some """
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            compress, finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, GZIP_WBITS)
+            compress, finish = compressor.compress, compressor.flush
+
+        for chunk in chunks:
+            compressed_chunk = compress(chunk)
+            if compressed_chunk:
+                yield compressed_chunk
+
+        yield finish()
+
+    @staticmethod
+    def compress(body: bytes, encoding: str) -> bytes:
+        if encoding == 'br':
+            return brotli.compress(body, quality=BROTLI_QUALITY)
+
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
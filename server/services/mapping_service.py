@@ -9,14 +9,19 @@ import tempfile
 from flask import current_app
 from geoalchemy2 import shape
 
-from server.models.dtos.mapping_dto import TaskDTO, MappedTaskDTO, LockTaskDTO, StopMappingTaskDTO, TaskCommentDTO
+from server.models.dtos.mapping_dto import TaskDTO, MappedTaskDTO, LockTaskDTO, StopMappingTaskDTO, TaskCommentDTO, \
+    LockNextTaskDTO
 from server.models.postgis.statuses import MappingNotAllowed
-from server.models.postgis.task import Task, TaskStatus, TaskHistory, TaskAction
+from server.models.postgis.task import Task, TaskStatus, TaskAction
 from server.models.postgis.utils import NotFound, UserLicenseError
 from server.models.postgis.project_files import ProjectFiles
+from server.services.bulk_transition_service import BulkTransitionService
+from server.services.compression_service import CompressionService
 from server.services.messaging.message_service import MessageService
+from server.services.project_archive_service import ProjectArchiveService
 from server.services.project_service import ProjectService
 from server.services.stats_service import StatsService
+from server.services.task_cache_service import TaskCacheService
 
 
 class MappingServiceError(Exception):
@@ -45,6 +50,7 @@ class MappingService:
     def get_task_as_dto(task_id: int, project_id: int, preferred_local: str = 'en', logged_in_user_id: int = None) -> TaskDTO:
         """ Get task as DTO for transmission over API """
         task = MappingService.get_task(task_id, project_id)
+        ProjectArchiveService.ensure_history_available(project_id)
         task_dto = task.as_dto_with_instructions(preferred_local)
         task_dto.is_undoable = MappingService._is_task_undoable(logged_in_user_id, task)
         return task_dto
@@ -57,10 +63,8 @@ class MappingService:
                                                                       TaskStatus.LOCKED_FOR_VALIDATION,
                                                                       TaskStatus.READY]:
 
-            last_action = TaskHistory.get_last_action(task.project_id, task.id)
-
             # User requesting task made the last change, so they are allowed to undo it.
-            if last_action.user_id == int(logged_in_user_id):
+            if task.last_action_user_id == int(logged_in_user_id):
                 return True
 
         return False
@@ -78,17 +82,43 @@ class MappingService:
         if not task.is_mappable():
             raise MappingServiceError('Task in invalid state for mapping')
 
-        user_can_map, error_reason = ProjectService.is_user_permitted_to_map(lock_task_dto.project_id,
-                                                                             lock_task_dto.user_id)
+        MappingService._check_user_can_map(lock_task_dto.project_id, lock_task_dto.user_id)
+
+        if not task.lock_task_for_mapping(lock_task_dto.user_id):
+            # Another user locked or changed the task since it was read
+            raise MappingServiceError('Task in invalid state for mapping')
+
+        return task.as_dto_with_instructions(lock_task_dto.preferred_locale)
+
+    @staticmethod
+    def lock_next_task_for_mapping(lock_next_dto: LockNextTaskDTO) -> TaskDTO:
+        """
+        Picks and locks the next available task on the project for mapping, see Task.lock_next_task
+        :raises NotFound if there are no tasks available to map
+        """
+        MappingService._check_user_can_map(lock_next_dto.project_id, lock_next_dto.user_id)
+
+        task_id = Task.lock_next_task(lock_next_dto.project_id, lock_next_dto.user_id, TaskAction.LOCKED_FOR_MAPPING,
+                                      lock_next_dto.lon, lock_next_dto.lat)
+        if task_id is None:
+            raise NotFound('No tasks available for mapping')
+
+        task = MappingService.get_task(task_id, lock_next_dto.project_id)
+        return task.as_dto_with_instructions(lock_next_dto.preferred_locale)
+
+    @staticmethod
+    def _check_user_can_map(project_id: int, user_id: int):
+        """
+        Checks the user is permitted to lock tasks for mapping on the project
+        :raises UserLicenseError, MappingServiceError
+        """
+        user_can_map, error_reason = ProjectService.is_user_permitted_to_map(project_id, user_id)
         if not user_can_map:
             if error_reason == MappingNotAllowed.USER_NOT_ACCEPTED_LICENSE:
                 raise UserLicenseError('User must accept license to map this task')
             else:
                 raise MappingServiceError(f'Mapping not allowed because: {error_reason.name}')
 
-        task.lock_task_for_mapping(lock_task_dto.user_id)
-        return task.as_dto_with_instructions(lock_task_dto.preferred_locale)
-
     @staticmethod
     def unlock_task_after_mapping(mapped_task: MappedTaskDTO) -> TaskDTO:
         """ Unlocks the task and sets the task history appropriately """
@@ -100,7 +130,7 @@ class MappingService:
             raise MappingServiceError('Can only set status to MAPPED, BADIMAGERY, READY after mapping')
 
         # Update stats around the change of state
-        last_state = TaskHistory.get_last_status(mapped_task.project_id, mapped_task.task_id, True)
+        last_state = task.get_last_status(True)
         StatsService.update_stats_after_task_state_change(mapped_task.project_id, mapped_task.user_id,
                                                           last_state, new_state)
 
@@ -158,10 +188,11 @@ class MappingService:
         return task.as_dto_with_instructions(task_comment.preferred_locale)
 
     @staticmethod
-    def generate_gpx(project_id: int, task_ids_str: str, timestamp=None):
+    def generate_gpx(project_id: int, task_ids_str: str, timestamp=None, include_time=True):
         """
         Creates a GPX file for supplied tasks.  Timestamp is for unit testing only.  You can use the following URL to test locally:
         http://www.openstreetmap.org/edit?editor=id&#map=11/31.50362930069913/34.628906243797054&comment=CHANGSET_COMMENT&gpx=http://localhost:5000/api/v1/project/111/tasks_as_gpx%3Ftasks=2
+        :param include_time: Set False to leave out the creation time, for GPX that's cached and served again later
         """
         if timestamp is None:
             timestamp = datetime.datetime.utcnow()
@@ -173,7 +204,8 @@ class MappingService:
         metadata = ET.Element('metadata')
         link = ET.SubElement(metadata, 'link', attrib=dict(href='https://github.com/kaartgroup/tasking-manager'))
         ET.SubElement(link, 'text').text = 'Kaart Tasking Manager'
-        ET.SubElement(metadata, 'time').text = timestamp.isoformat()
+        if include_time:
+            ET.SubElement(metadata, 'time').text = timestamp.isoformat()
         root.append(metadata)
 
         # Create trk element
@@ -237,6 +269,37 @@ class MappingService:
         xml_gpx = ET.tostring(root, encoding='utf8')
         return xml_gpx
 
+    @staticmethod
+    def get_gpx_compressed(project_id: int, task_ids_str: str, encoding: str) -> bytes:
+        """
+        Get the GPX for the supplied tasks compressed with the content encoding, compressed once per version.  The
+        creation time is left out, as the cached GPX is served until the version changes
+        """
+        _, geometry_version = TaskCacheService.get_task_versions(project_id)
+        task_ids_str = MappingService._normalise_task_ids(task_ids_str)
+        cache_key = ('gpx', project_id, geometry_version, task_ids_str)
+
+        return CompressionService.get_compressed_body(
+            cache_key, encoding, lambda: MappingService.generate_gpx(project_id, task_ids_str, include_time=False))
+
+    @staticmethod
+    def get_osm_xml_compressed(project_id: int, task_ids_str: str, encoding: str) -> bytes:
+        """ Get the OSM XML for the supplied tasks compressed with the content encoding, compressed once per version """
+        _, geometry_version = TaskCacheService.get_task_versions(project_id)
+        task_ids_str = MappingService._normalise_task_ids(task_ids_str)
+        cache_key = ('osm-xml', project_id, geometry_version, task_ids_str)
+
+        return CompressionService.get_compressed_body(
+            cache_key, encoding, lambda: MappingService.generate_osm_xml(project_id, task_ids_str))
+
+    @staticmethod
+    def _normalise_task_ids(task_ids_str: str) -> str:
+        """ Sorts and de-duplicates a comma separated list of task IDs, so each set of tasks is cached once """
+        if not task_ids_str:
+            return task_ids_str
+
+        return ','.join(str(task_id) for task_id in sorted(set(map(int, task_ids_str.split(',')))))
+
     @staticmethod
     def undo_mapping(project_id: int, task_id: int, user_id: int, preferred_locale: str = 'en') -> TaskDTO:
         """ Allows a user to Undo the task state they updated """
@@ -246,12 +309,10 @@ class MappingService:
             raise MappingServiceError('Undo not allowed for this user')
 
         current_state = TaskStatus(task.task_status)
-        undo_state = TaskHistory.get_last_status(project_id, task_id, True)
+        undo_state = task.get_last_status(True)
 
         # Refer to last action for user of it.
-        last_action = TaskHistory.get_last_action(project_id, task_id)
-
-        StatsService.update_stats_after_task_state_change(project_id, last_action.user_id,
+        StatsService.update_stats_after_task_state_change(project_id, task.last_action_user_id,
                                                           current_state, undo_state, 'undo')
 
         task.unlock_task(user_id, undo_state,
@@ -262,22 +323,7 @@ class MappingService:
     @staticmethod
     def map_all_tasks(project_id: int, user_id: int):
         """ Marks all tasks on a project as mapped """
-        tasks_to_map = Task.query.filter(Task.project_id == project_id,
-                                         Task.task_status.notin_([TaskStatus.BADIMAGERY.value,
-                                                                  TaskStatus.MAPPED.value,
-                                                                  TaskStatus.VALIDATED.value])).all()
-
-        for task in tasks_to_map:
-            if TaskStatus(task.task_status) not in [TaskStatus.LOCKED_FOR_MAPPING, TaskStatus.LOCKED_FOR_VALIDATION]:
-                # Only lock tasks that are not already locked to avoid double lock issue
-                task.lock_task_for_mapping(user_id)
-
-            task.unlock_task(user_id, new_state=TaskStatus.MAPPED)
-
-        # Set counters to fully mapped
-        project = ProjectService.get_project_by_id(project_id)
-        project.tasks_mapped = (project.total_tasks - project.tasks_bad_imagery)
-        project.save()
+        BulkTransitionService.map_all_tasks(project_id, user_id)
 
     @staticmethod
     def generate_project_file_osm_xml(project_id: int, file_id: int, task_ids_str: str) -> str:
@@ -347,15 +393,7 @@ class MappingService:
 
         return xml
 
+    @staticmethod
     def reset_all_badimagery(project_id: int, user_id: int):
         """ Marks all bad imagery tasks ready for mapping """
-        badimagery_tasks = Task.query.filter(Task.task_status == TaskStatus.BADIMAGERY.value).all()
-
-        for task in badimagery_tasks:
-            task.lock_task_for_mapping(user_id)
-            task.unlock_task(user_id, new_state=TaskStatus.READY)
-
-        # Reset bad imagery counter
-        project = ProjectService.get_project_by_id(project_id)
-        project.tasks_bad_imagery = 0
-        project.save()
+        BulkTransitionService.reset_all_bad_imagery(project_id, user_id)
@@ -1,4 +1,5 @@
 import re
+import threading
 import time
 
 from cachetools import TTLCache, cached
@@ -151,6 +152,36 @@ class MessageService:
                     time.sleep(0.5)  # Sleep for 0.5 seconds to avoid hitting AWS rate limits every 10 messages
                     msg_count = 0
 
+    @staticmethod
+    def queue_messages_after_validation(mentions: list, validations: list):
+        """
+        Sends the notifications for a batch of tasks unlocked after validation on a background thread, so the
+        validator isn't kept waiting on SMTP.  Should only be called once the tasks have been committed.
+        :param mentions: List of send_message_after_comment argument tuples
+        :param validations: List of send_message_after_validation argument tuples
+        """
+        if not mentions and not validations:
+            return
+
+        app = current_app._get_current_object()  # Background thread needs the app to push its own context
+        threading.Thread(target=MessageService.send_messages_after_validation,
+                         args=(app, mentions, validations)).start()
+
+    @staticmethod
+    def send_messages_after_validation(app, mentions: list, validations: list):
+        """ Sends queued notifications, see queue_messages_after_validation.  One failure doesn't stop the rest """
+        with app.app_context():
+            notifications = [(MessageService.send_message_after_comment, args) for args in mentions] + \
+                [(MessageService.send_message_after_validation, args) for args in validations]
+
+            for send_message, args in notifications:
+                try:
+                    send_message(*args)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    current_app.logger.error(f'Sending notification after validation failed: {str(e)}')
+
     @staticmethod
     def send_message_after_comment(comment_from: int, comment: str, task_id: int, project_id: int):
         """ Will send a canned message to anyone @'d in a comment """
@@ -9,9 +9,11 @@ from server.models.dtos.project_dto import DraftProjectDTO, ProjectDTO, ProjectC
 from server.models.postgis.project import Project, Task, ProjectStatus
 from server.models.postgis.project_files import ProjectFiles
 from server.models.postgis.statuses import TaskCreationMode, UserRole, UploadPolicy
-from server.models.postgis.task import TaskHistory, TaskStatus, TaskAction
+from server.models.postgis.task import TaskHistory
 from server.models.postgis.utils import NotFound, InvalidData, InvalidGeoJson
+from server.services.bulk_transition_service import BulkTransitionService
 from server.services.grid.grid_service import GridService
+from server.services.project_archive_service import ProjectArchiveService
 from server.services.license_service import LicenseService
 from server.services.users.user_service import UserService
 
@@ -145,22 +147,12 @@ class ProjectAdminService:
     @staticmethod
     def reset_all_tasks(project_id: int, user_id: int):
         """ Resets all tasks on project, preserving history"""
-        tasks_to_reset = Task.query.filter(Task.project_id == project_id).all()
-
-        for task in tasks_to_reset:
-            task.set_task_history(TaskAction.COMMENT, user_id, "Task reset", TaskStatus.READY)
-            task.reset_task(user_id)
-
-        # Reset project counters
-        project = ProjectAdminService._get_project_by_id(project_id)
-        project.tasks_mapped = 0
-        project.tasks_validated = 0
-        project.tasks_bad_imagery = 0
-        project.save()
+        BulkTransitionService.reset_all_tasks(project_id, user_id)
 
     @staticmethod
     def get_all_comments(project_id: int) -> ProjectCommentsDTO:
         """ Gets all comments mappers, validators have added to tasks associated with project """
+        ProjectArchiveService.ensure_history_available(project_id)
         comments = TaskHistory.get_all_comments(project_id)
 
         if len(comments.comments) == 0:
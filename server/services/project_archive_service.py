@@ -0,0 +1,146 @@
+from flask import current_app
+from sqlalchemy import text
+
+from server import db
+from server.models.postgis.project import Project, ProjectStatus
+from server.models.postgis.project_history_archive import ProjectHistoryArchive, ARCHIVED_TABLES
+from server.models.postgis.utils import NotFound
+
+# Deletes each table's rows belonging to the project being archived, returning them to be archived.  Only read messages
+# are archived so inboxes are intact
+ARCHIVED_ROWS = {
+    'task_history': 'DELETE FROM task_history WHERE project_id = :project_id RETURNING *',
+    'task_invalidation_history': 'DELETE FROM task_invalidation_history WHERE project_id = :project_id RETURNING *',
+    'task_mapping_issues': '''DELETE FROM task_mapping_issues i
+                                 USING task_history h
+                                WHERE h.id = i.task_history_id
+                                  AND h.project_id = :project_id
+                            RETURNING i.*''',
+    'messages': 'DELETE FROM messages WHERE project_id = :project_id AND read RETURNING *',
+}
+
+
+class ProjectArchiveServiceError(Exception):
+    """ Custom Exception to notify callers an error occurred when archiving project history """
+
+    def __init__(self, message):
+        if current_app:
+            current_app.logger.error(message)
+
+
+class ProjectArchiveService:
+
+    @staticmethod
+    def archive_project_history(project_id: int) -> bool:
+        """
+        Moves an archived project's history out of the hot tables into project_history_archive
+        :raises ProjectArchiveServiceError, NotFound
+        :return: True if the history was archived, False if there was nothing to archive
+        """
+        project = Project.get(project_id)
+        if project is None:
+            raise NotFound()
+
+        if ProjectStatus(project.status) != ProjectStatus.ARCHIVED:
+            raise ProjectArchiveServiceError(f'Project {project_id} must be archived before its history is')
+
+        if ProjectHistoryArchive.is_archived(project_id):
+            return False
+
+        # The rows are deleted and archived by one statement, so they're read from a single snapshot.  A row updated
+        # between separate copy and delete statements, like a message marked read, could be deleted without being copied
+        moved_rows = ',\n'.join(f'moved_{table} AS ({ARCHIVED_ROWS[table]})' for table in ARCHIVED_TABLES)
+        columns = ', '.join(f'(SELECT json_agg(r) FROM moved_{table} r) AS {table}' for table in ARCHIVED_TABLES)
+        archive_sql = f'''WITH {moved_rows}
+                          INSERT INTO project_history_archive (project_id, archived_at, {', '.join(ARCHIVED_TABLES)})
+                          SELECT :project_id, now() AT TIME ZONE 'UTC', {columns}'''
+
+        user_stats_sql = '''INSERT INTO archived_user_stats (user_id, project_id, tasks_mapped, tasks_validated,
+                                                             state_changes)
+                            SELECT h.user_id, h.project_id,
+                                   count(*) FILTER (WHERE h.action_text = 'MAPPED'),
+                                   count(*) FILTER (WHERE h.action_text = 'VALIDATED'),
+                                   count(*) FILTER (WHERE h.action = 'STATE_CHANGE')
+                              FROM project_history_archive a,
+                                   json_populate_recordset(NULL::task_history, a.task_history) h
+                             WHERE a.project_id = :project_id
+                             GROUP BY h.user_id, h.project_id'''
+
+        try:
+            # Stops history being written to the project while it's moved, so no row is deleted without being copied
+            db.session.execute(text('SELECT id FROM projects WHERE id = :project_id FOR UPDATE'),
+                               dict(project_id=project_id))
+            db.session.execute(text(archive_sql), dict(project_id=project_id))
+            db.session.execute(text(user_stats_sql), dict(project_id=project_id))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise ProjectArchiveServiceError(f'Archiving history for project {project_id} failed: {str(e)}')
+
+        return True
+
+    @staticmethod
+    def archive_all_project_history() -> int:
+        """
+        Archives the history of every archived project that still has history in the hot tables
+        :return: Number of projects archived
+        """
+        sql = '''SELECT p.id
+                   FROM projects p
+                  WHERE p.status = :status
+                    AND NOT EXISTS (SELECT 1 FROM project_history_archive a WHERE a.project_id = p.id)
+                    AND EXISTS (SELECT 1 FROM task_history h WHERE h.project_id = p.id)
+                  ORDER BY p.id'''
+
+        project_ids = [row[0] for row in db.engine.execute(text(sql), status=ProjectStatus.ARCHIVED.value)]
+
+        archived = 0
+        for project_id in project_ids:
+            try:
+                if ProjectArchiveService.archive_project_history(project_id):
+                    archived += 1
+            except ProjectArchiveServiceError:
+                # Already logged, carry on with the other projects
+                continue
+
+        return archived
+
+    @staticmethod
+    def restore_project_history(project_id: int) -> bool:
+        """
+        Moves a project's archived history back into the hot tables
+        :raises ProjectArchiveServiceError
+        :return: True if history was restored, False if the project had no archived history
+        """
+        restore_sql = [f'''INSERT INTO {table}
+                           SELECT r.*
+                             FROM project_history_archive a,
+                                  json_populate_recordset(NULL::{table}, a.{table}) r
+                            WHERE a.project_id = :project_id''' for table in ARCHIVED_TABLES]
+
+        try:
+            # Locks the archive so concurrent viewers wait for the first restore rather than restoring twice
+            archive = db.session.execute(
+                text('SELECT project_id FROM project_history_archive WHERE project_id = :project_id FOR UPDATE'),
+                dict(project_id=project_id)).first()
+            if archive is None:
+                db.session.rollback()
+                return False
+
+            for sql in restore_sql:
+                db.session.execute(text(sql), dict(project_id=project_id))
+            # Archived user stats are removed by the cascade
+            db.session.execute(text('DELETE FROM project_history_archive WHERE project_id = :project_id'),
+                               dict(project_id=project_id))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise ProjectArchiveServiceError(f'Restoring history for project {project_id} failed: {str(e)}')
+
+        return True
+
+    @staticmethod
+    def ensure_history_available(project_id: int):
+        """ Restores the project's history if it's been archived, so it can be viewed as normal """
+        if ProjectHistoryArchive.is_archived(project_id):
+            ProjectArchiveService.restore_project_history(project_id)
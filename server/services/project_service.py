@@ -1,17 +1,31 @@
+import base64
+import hashlib
+import time
+from typing import Iterator
+
 from cachetools import TTLCache, cached
 from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 
-from server.models.dtos.mapping_dto import TaskDTOs
+from server import db
+from server.models.dtos.mapping_dto import TaskDTOs, TaskChangeDTO, TaskChangesDTO
 from server.models.dtos.project_dto import ProjectDTO, LockedTasksForUser, ProjectSummary, ProjectStatsDTO, ProjectUserStatsDTO
 from server.models.postgis.project import Project, ProjectStatus, MappingLevel
-from server.models.postgis.statuses import MappingNotAllowed, ValidatingNotAllowed
+from server.models.postgis.statuses import MappingNotAllowed, ValidatingNotAllowed, TaskStatus
 from server.models.postgis.task import Task
 from server.models.postgis.task_annotation import TaskAnnotation
 from server.models.postgis.utils import NotFound
+from server.services.compression_service import CompressionService
+from server.services.project_archive_service import ProjectArchiveService
+from server.services.task_cache_service import TaskCacheService
 from server.services.users.user_service import UserService
 
 summary_cache = TTLCache(maxsize=1024, ttl=600)
 
+# Postgres advisory lock key held by whichever auto-unlock worker is currently sweeping
+AUTO_UNLOCK_ADVISORY_LOCK_ID = 5310
+
 
 class ProjectServiceError(Exception):
     """ Custom Exception to notify callers an error occurred when handling projects """
@@ -36,21 +50,219 @@ class ProjectService:
         Task.auto_unlock_tasks(project_id)
 
     @staticmethod
-    def get_project_dto_for_mapper(project_id, locale='en', abbrev=False) -> ProjectDTO:
+    def auto_unlock_all_tasks() -> int:
+        """
+        Unlock tasks locked for longer than the auto-unlock delta on every project
+        :return: Number of projects that had expired locks
+        """
+        project_ids = Task.get_projects_with_expired_locks()
+
+        for project_id in project_ids:
+            try:
+                Task.auto_unlock_tasks(project_id)
+            except Exception as e:
+                # Don't let one project's failure hold up the rest of the sweep
+                db.session.rollback()
+                current_app.logger.critical(f'Auto-unlock failed for project {project_id}: {str(e)}')
+
+        return len(project_ids)
+
+    @staticmethod
+    def check_task_history_summaries(fix: bool = False) -> list:
+        """
+        Checks the history summary kept on every task matches its task history
+        :param fix: Set to rewrite the summary of any task that doesn't match
+        :return: List of (project_id, task_id) of the tasks that didn't match
+        """
+        return Task.get_inconsistent_history_summaries(fix)
+
+    @staticmethod
+    def run_auto_unlock_sweeps(interval_seconds: int):
+        """
+        Sweeps expired task locks every interval, forever.  Any number of workers can be started, a Postgres advisory
+        lock ensures only one sweeps at a time and another takes over if it stops.
+        """
+        while True:
+            connection = None
+            try:
+                # Fresh connection for each attempt at the lock, one that dropped can't be trusted to still hold it.
+                # Connected within the try so a database that is still down is retried rather than ending the worker
+                connection = db.engine.connect()
+                while not ProjectService._try_auto_unlock_lock(connection):
+                    time.sleep(interval_seconds)
+
+                current_app.logger.info('Acquired auto-unlock lock, sweeping expired task locks')
+                # Check the lock before every sweep so two workers never sweep at once if this one's session was lost
+                while ProjectService._holds_auto_unlock_lock(connection):
+                    projects_unlocked = ProjectService.auto_unlock_all_tasks()
+                    if projects_unlocked:
+                        current_app.logger.info(f'Auto-unlocked expired tasks on {projects_unlocked} projects')
+
+                    # End the transaction so the next sweep sees tasks locked since
+                    db.session.remove()
+                    time.sleep(interval_seconds)
+
+                current_app.logger.warning('Lost auto-unlock lock, waiting to reacquire it')
+            except SQLAlchemyError as e:
+                db.session.remove()
+                current_app.logger.critical(f'Auto-unlock sweep failed, reconnecting: {str(e)}')
+                time.sleep(interval_seconds)
+            finally:
+                # Discard rather than pool the connection, closing its session releases the lock if it's still held
+                if connection is not None:
+                    connection.invalidate()
+                    connection.close()
+
+    @staticmethod
+    def _try_auto_unlock_lock(connection) -> bool:
+        """ Tries to take the auto-unlock advisory lock on the connection's session """
+        # Autocommit so the lock connection doesn't sit idle in a transaction while it is held
+        try_lock = text('SELECT pg_try_advisory_lock(:lock_id)').execution_options(autocommit=True)
+        return connection.execute(try_lock, lock_id=AUTO_UNLOCK_ADVISORY_LOCK_ID).scalar()
+
+    @staticmethod
+    def _holds_auto_unlock_lock(connection) -> bool:
+        """ Checks the connection's session still holds the auto-unlock advisory lock """
+        holds_lock = text('''SELECT EXISTS (
+                                 SELECT 1 FROM pg_locks
+                                  WHERE locktype = 'advisory'
+                                    AND pid = pg_backend_pid()
+                                    AND classid = 0 AND objid = :lock_id AND objsubid = 1
+                                    AND granted)''').execution_options(autocommit=True)
+        return connection.execute(holds_lock, lock_id=AUTO_UNLOCK_ADVISORY_LOCK_ID).scalar()
+
+    @staticmethod
+    def get_project_dto_for_mapper(project_id, locale='en', abbrev=False, compact=False) -> ProjectDTO:
         """
         Get the project DTO for mappers
         :param project_id: ID of the Project mapper has requested
         :param locale: Locale the mapper has requested
+        :param compact: Set to send the tasks as a base64 encoded task status snapshot, see get_task_status_snapshot
         :raises ProjectServiceError, NotFound
         """
         project = ProjectService.get_project_by_id(project_id)
-        return project.as_dto_for_mapping(locale, abbrev)
+
+        tasks = None
+        if compact:
+            tasks = base64.b64encode(TaskCacheService.get_task_status_snapshot(project_id)).decode('ascii')
+
+        return project.as_dto_for_mapping(locale, abbrev, tasks)
+
+    @staticmethod
+    def get_project_stream_for_mapper(project_id, locale='en', resolution='full'):
+        """
+        Get the project DTO for mappers as a stream of JSON text, tasks included
+        :param resolution: Task geometry resolution, see TASK_GEOMETRY_RESOLUTIONS
+        :raises NotFound
+        """
+        project = ProjectService.get_project_by_id(project_id)
+        return project.as_stream_for_mapping(locale, TaskCacheService.get_tasks_geojson_stream(project_id, resolution))
+
+    @staticmethod
+    def get_task_status_snapshot(project_id: int) -> bytes:
+        """
+        Get the compact binary snapshot of the status of every task in the project
+        :raises NotFound
+        """
+        return TaskCacheService.get_task_status_snapshot(project_id)
+
+    @staticmethod
+    def get_task_geometry_resolution(resolution: str = None, zoom: int = None) -> str:
+        """
+        Get the task geometry resolution requested, or the one suited to the map zoom level
+        :raises InvalidData
+        """
+        return Task.get_geometry_resolution(resolution, zoom)
 
     @staticmethod
     def get_project_tasks(project_id):
         project = ProjectService.get_project_by_id(project_id)
         return project.all_tasks_as_geojson()
 
+    @staticmethod
+    def get_project_tasks_stream(project_id, resolution='full'):
+        """
+        Get the project's tasks as a stream of geoJSON text
+        :param resolution: Task geometry resolution, see TASK_GEOMETRY_RESOLUTIONS
+        :raises NotFound
+        """
+        return TaskCacheService.get_tasks_geojson_stream(project_id, resolution)
+
+    @staticmethod
+    def get_project_tasks_compressed(project_id: int, encoding: str, resolution: str = 'full') -> Iterator[bytes]:
+        """
+        Get the project's tasks as a stream of geoJSON compressed with the content encoding, compressed as it is
+        streamed and cached once per task version if it fits
+        :raises NotFound
+        """
+        status_version, geometry_version = TaskCacheService.get_task_versions(project_id)
+        cache_key = ('tasks-geojson', project_id, status_version, geometry_version, resolution)
+
+        def build_chunks():
+            for chunk in TaskCacheService.get_tasks_geojson_stream(project_id, resolution):
+                yield chunk.encode('utf-8')
+
+        return CompressionService.stream_compressed_body(cache_key, encoding, build_chunks)
+
+    @staticmethod
+    def get_project_tasks_mvt(project_id: int, zoom: int, x: int, y: int) -> bytes:
+        """
+        Get the project's tasks as a Mapbox Vector Tile
+        :raises NotFound, InvalidData
+        """
+        return TaskCacheService.get_tasks_mvt(project_id, zoom, x, y)
+
+    @staticmethod
+    def get_task_versions(project_id: int):
+        """
+        Get the project's task status and geometry versions
+        :raises NotFound
+        """
+        return TaskCacheService.get_task_versions(project_id)
+
+    @staticmethod
+    def get_project_etag(project_id: int, *variant, include_tasks: bool = True) -> str:
+        """
+        Get an ETag for a representation of the project from a single lookup of the project's change markers
+        :param variant: Anything else the representation depends on, eg locale and query string
+        :param include_tasks: Set if the representation depends on the project's tasks
+        :raises NotFound
+        """
+        markers = Project.get_change_markers(project_id)
+
+        if markers is None:
+            raise NotFound()
+
+        last_updated, status_version, geometry_version = markers
+        etag_parts = (project_id, last_updated, status_version, geometry_version) if include_tasks \
+            else (project_id, last_updated)
+
+        return hashlib.md5(repr(etag_parts + variant).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def get_task_changes(project_id: int, since: int = None, limit: int = 1000) -> TaskChangesDTO:
+        """
+        Get the tasks whose status or lock changed after the since cursor, along with the cursor for the next request
+        :param since: Cursor returned by a previous request, or None to get every task
+        :raises NotFound
+        """
+        status_version, geometry_version = TaskCacheService.get_task_versions(project_id)
+
+        changes, cursor = Task.get_task_changes(project_id, since, limit)
+
+        changes_dto = TaskChangesDTO()
+        changes_dto.task_geometry_version = geometry_version
+        changes_dto.cursor = cursor
+        changes_dto.tasks = []
+        for task in changes:
+            change_dto = TaskChangeDTO()
+            change_dto.task_id = task.id
+            change_dto.task_status = TaskStatus(task.task_status).name
+            change_dto.locked_by = task.locked_by
+            changes_dto.tasks.append(change_dto)
+
+        return changes_dto
+
     @staticmethod
     def get_project_aoi(project_id):
         project = ProjectService.get_project_by_id(project_id)
@@ -182,6 +394,7 @@ class ProjectService:
     def get_project_stats(project_id: int) -> ProjectStatsDTO:
         """ Gets the project stats DTO """
         project = ProjectService.get_project_by_id(project_id)
+        ProjectArchiveService.ensure_history_available(project_id)
         return project.get_project_stats()
 
     @staticmethod
@@ -12,10 +12,12 @@ from server.models.dtos.stats_dto import (
     OrganizationStatsDTO,
     CampaignStatsDTO,
 )
+from server.models.postgis.contribution_time import ContributionTime
 from server.models.postgis.project import Project
 from server.models.postgis.statuses import TaskStatus
 from server.models.postgis.task import TaskHistory, User, Task
 from server.models.postgis.utils import timestamp, NotFound
+from server.services.project_archive_service import ProjectArchiveService
 from server.services.project_service import ProjectService
 from server.services.users.user_service import UserService
 
@@ -34,20 +36,39 @@ class StatsService:
         action="change",
     ):
         """ Update stats when a task has had a state change """
+        return StatsService.update_stats_after_task_state_changes(
+            project_id, user_id, [(last_state, new_state)], action
+        )
 
-        if new_state in [
-            TaskStatus.READY,
-            TaskStatus.LOCKED_FOR_VALIDATION,
-            TaskStatus.LOCKED_FOR_MAPPING,
-        ]:
+    @staticmethod
+    def update_stats_after_task_state_changes(
+        project_id: int, user_id: int, state_changes: list, action="change"
+    ):
+        """
+        Update stats for a batch of state changes by one user on a project, applying every counter delta to the
+        project and user loaded once
+        :param state_changes: List of (last_state, new_state) tuples
+        """
+        state_changes = [
+            (last_state, new_state)
+            for last_state, new_state in state_changes
+            if new_state
+            not in [
+                TaskStatus.READY,
+                TaskStatus.LOCKED_FOR_VALIDATION,
+                TaskStatus.LOCKED_FOR_MAPPING,
+            ]
+        ]
+        if not state_changes:
             return  # No stats to record for these states
 
         project = ProjectService.get_project_by_id(project_id)
         user = UserService.get_user_by_id(user_id)
 
-        project, user = StatsService._update_tasks_stats(
-            project, user, last_state, new_state, action
-        )
+        for last_state, new_state in state_changes:
+            project, user = StatsService._update_tasks_stats(
+                project, user, last_state, new_state, action
+            )
         UserService.upsert_mapped_projects(user_id, project_id)
         project.last_updated = timestamp()
 
@@ -106,6 +127,7 @@ class StatsService:
     @staticmethod
     def get_latest_activity(project_id: int, page: int) -> ProjectActivityDTO:
         """ Gets all the activity on a project """
+        ProjectArchiveService.ensure_history_available(project_id)
 
         results = (
             db.session.query(
@@ -189,7 +211,7 @@ class StatsService:
 
         dto.total_projects = Project.query.count()
         dto.mappers_online = (
-            Task.query.filter(Task.locked_by is not None)
+            Task.query.filter(Task.is_locked())
             .distinct(Task.locked_by)
             .count()
         )
@@ -291,6 +313,11 @@ class StatsService:
 
         return dto
 
+    @staticmethod
+    def rebuild_contribution_time():
+        """ Rebuilds every user's time spent mapping and validating on each project from the task history """
+        ContributionTime.rebuild()
+
     @staticmethod
     def update_all_project_stats():
         projects = db.session.query(Project.id)
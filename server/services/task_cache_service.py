@@ -0,0 +1,133 @@
+import struct
+import sys
+from typing import Optional
+
+from cachetools import TTLCache, cached
+
+from server.models.postgis.project import Project
+from server.models.postgis.task import Task
+from server.models.postgis.utils import NotFound
+
+# Projects with more tasks than this aren't held in memory, their geoJSON is streamed straight from the DB instead
+MAX_CACHED_PROJECT_TASKS = 20000
+
+
+def rendered_size(value) -> int:
+    """ Bytes held by a cached rendering, the text or binary dominates so containers are counted shallowly """
+    if value is None:
+        return 1
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value)
+
+    # Geometry layer of (task_id, feature_prefix) tuples
+    return sys.getsizeof(value) + sum(len(feature_prefix) for _, feature_prefix in value)
+
+
+# Task geometries rarely change, so the rendered geometry layer is held for longer than the status layer.  Entries
+# are keyed on the project's task versions, so a bumped version simply misses the cache and stale entries age out.
+# The caches are bounded by bytes rather than entries, so a few large projects can't use up the worker's memory
+task_geometry_cache = TTLCache(maxsize=64 * 1024 * 1024, ttl=3600, getsizeof=rendered_size)
+task_status_cache = TTLCache(maxsize=16 * 1024 * 1024, ttl=600, getsizeof=rendered_size)
+task_tile_cache = TTLCache(maxsize=32 * 1024 * 1024, ttl=600, getsizeof=rendered_size)
+task_snapshot_cache = TTLCache(maxsize=16 * 1024 * 1024, ttl=600, getsizeof=rendered_size)
+
+
+class TaskCacheService:
+
+    @staticmethod
+    def get_task_versions(project_id: int):
+        """
+        Gets the current task versions of the project
+        :return: tuple of (task_status_version, task_geometry_version)
+        :raises NotFound
+        """
+        versions = Project.get_task_versions(project_id)
+
+        if versions is None:
+            raise NotFound()
+
+        return versions
+
+    @staticmethod
+    def get_tasks_geojson_stream(project_id: int, resolution: str = 'full', chunk_size: int = 500):
+        """
+        Get the project's tasks as a stream of geoJSON text, rendered from the cached geometry and status layers
+        :param resolution: Task geometry resolution, see TASK_GEOMETRY_RESOLUTIONS
+        :raises NotFound
+        """
+        status_version, geometry_version = TaskCacheService.get_task_versions(project_id)
+        feature_prefixes = TaskCacheService._get_feature_prefixes(project_id, geometry_version, resolution)
+        if feature_prefixes is None:
+            return Task.stream_tasks_as_geojson_feature_collection(project_id, chunk_size=chunk_size,
+                                                                   resolution=resolution)
+
+        task_statuses = TaskCacheService._get_task_statuses(project_id, status_version)
+
+        return TaskCacheService._stream_feature_collection(feature_prefixes, task_statuses, chunk_size)
+
+    @staticmethod
+    def get_tasks_mvt(project_id: int, zoom: int, x: int, y: int) -> bytes:
+        """
+        Get a Mapbox Vector Tile of the project's tasks
+        :raises NotFound, InvalidData
+        """
+        status_version, geometry_version = TaskCacheService.get_task_versions(project_id)
+        return TaskCacheService._get_tasks_mvt(project_id, zoom, x, y, status_version, geometry_version)
+
+    @staticmethod
+    def get_task_status_snapshot(project_id: int) -> bytes:
+        """
+        Get a compact binary snapshot of the status of every task in the project.  All values are little-endian:
+            uint32 task count N, N x uint32 task ids in ascending order, N x uint8 TaskStatus values
+        :raises NotFound
+        """
+        status_version, _ = TaskCacheService.get_task_versions(project_id)
+        return TaskCacheService._get_task_status_snapshot(project_id, status_version)
+
+    @staticmethod
+    @cached(task_geometry_cache)
+    def _get_feature_prefixes(project_id: int, geometry_version: int, resolution: str) -> Optional[list]:
+        """ Gets the rendered geometry layer, or None if the project has too many tasks to hold it in memory """
+        if Task.get_task_count(project_id) > MAX_CACHED_PROJECT_TASKS:
+            return None
+
+        return Task.get_task_feature_prefixes(project_id, resolution)
+
+    @staticmethod
+    @cached(task_status_cache)
+    def _get_task_statuses(project_id: int, status_version: int) -> dict:
+        return Task.get_task_statuses(project_id)
+
+    @staticmethod
+    @cached(task_snapshot_cache)
+    def _get_task_status_snapshot(project_id: int, status_version: int) -> bytes:
+        tasks = Task.get_task_status_values(project_id)
+        task_count = len(tasks)
+
+        # Explicit sizes and byte order, so the format doesn't depend on the platform's C types
+        return struct.pack(f'<I{task_count}I{task_count}B', task_count, *(task.id for task in tasks),
+                           *(task.task_status for task in tasks))
+
+    @staticmethod
+    @cached(task_tile_cache)
+    def _get_tasks_mvt(project_id: int, zoom: int, x: int, y: int, status_version: int, geometry_version: int):
+        return Task.get_tasks_as_mvt(project_id, zoom, x, y)
+
+    @staticmethod
+    def _stream_feature_collection(feature_prefixes: list, task_statuses: dict, chunk_size: int):
+        """ Yields a geoJson FeatureCollection as text chunks, completing each cached Feature with its task status """
+        yield '{"type": "FeatureCollection", "features": ['
+        separator = ''
+        for start in range(0, len(feature_prefixes), chunk_size):
+            features = []
+            for task_id, feature_prefix in feature_prefixes[start:start + chunk_size]:
+                # A task created after the status layer was read is picked up on the next version
+                task_status = task_statuses.get(task_id)
+                if task_status is not None:
+                    features.append(separator + Task.complete_feature_json(feature_prefix, task_status))
+                    separator = ', '
+
+            yield ''.join(features)
+        yield ']}'
@@ -0,0 +1,192 @@
+import json
+import select
+import threading
+
+import psycopg2
+from flask import current_app
+
+from server import db
+from server.models.postgis.statuses import TaskStatus
+from server.models.postgis.task import Task
+
+# Postgres channel the tasks table trigger notifies on, see migration 7f3a5c1e8b24
+TASK_EVENTS_CHANNEL = 'task_events'
+# Seconds between comments sent to idle clients, keeps proxies from closing the connection
+HEARTBEAT_SECONDS = 15
+# Seconds between checks for notified changes held back behind a transaction that's still in flight
+HELD_BACK_RETRY_SECONDS = 1
+# Most changes sent to a client at once before it is told to resync instead
+MAX_REPLAY_CHANGES = 1000
+
+
+class TaskEventSubscriber:
+    """ Wakes one connected client's stream when the tasks of its project change """
+
+    def __init__(self, project_id: int):
+        self.project_id = project_id
+        self.woken = threading.Event()
+        # ID of the latest transaction notified as changing the project's tasks, the stream reads up to it
+        self.latest_change_id = 0
+        self.resync = False
+
+    def notify(self, change_id: int = 0, resync: bool = False):
+        """ Records a change and wakes the stream, changes notified while it's busy are all read together """
+        self.latest_change_id = max(self.latest_change_id, change_id)
+        self.resync = self.resync or resync
+        self.woken.set()
+
+
+class TaskEventListener(threading.Thread):
+    """
+    Listens for task change notifications on a dedicated Postgres connection and wakes the subscribers in this
+    process.  Every gunicorn worker runs its own listener, so events reach clients on any worker.
+    """
+
+    def __init__(self, database_uri: str, logger):
+        super().__init__(name='task-event-listener', daemon=True)
+        self.database_uri = database_uri
+        self.logger = logger
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, project_id: int) -> TaskEventSubscriber:
+        subscriber = TaskEventSubscriber(project_id)
+        with self.lock:
+            self.subscribers.setdefault(project_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: TaskEventSubscriber):
+        with self.lock:
+            project_subscribers = self.subscribers.get(subscriber.project_id, set())
+            project_subscribers.discard(subscriber)
+            if not project_subscribers:
+                self.subscribers.pop(subscriber.project_id, None)
+
+    def run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                self.logger.error(f'Task event listener error, reconnecting: {str(e)}')
+                self._flag_resync()
+                threading.Event().wait(HEARTBEAT_SECONDS)
+
+    def _listen(self):
+        connection = psycopg2.connect(self.database_uri)
+        try:
+            connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            connection.cursor().execute(f'LISTEN {TASK_EVENTS_CHANNEL};')
+
+            while True:
+                if select.select([connection], [], [], HEARTBEAT_SECONDS) == ([], [], []):
+                    continue
+
+                connection.poll()
+                while connection.notifies:
+                    self._dispatch(json.loads(connection.notifies.pop(0).payload))
+        finally:
+            connection.close()
+
+    def _dispatch(self, event: dict):
+        with self.lock:
+            project_subscribers = list(self.subscribers.get(event['projectId'], ()))
+
+        for subscriber in project_subscribers:
+            subscriber.notify(event['changeId'], event['resync'])
+
+    def _flag_resync(self):
+        """ Notifications sent while disconnected are lost, so every client has to resync """
+        with self.lock:
+            all_subscribers = [subscriber for subscribers in self.subscribers.values() for subscriber in subscribers]
+
+        for subscriber in all_subscribers:
+            subscriber.notify(resync=True)
+
+
+class TaskEventService:
+
+    listener = None
+    listener_lock = threading.Lock()
+
+    @staticmethod
+    def get_listener() -> TaskEventListener:
+        """ Starts this process's listener on first use """
+        with TaskEventService.listener_lock:
+            if TaskEventService.listener is None:
+                listener = TaskEventListener(current_app.config['SQLALCHEMY_DATABASE_URI'], current_app.logger)
+                listener.start()
+                TaskEventService.listener = listener
+
+        return TaskEventService.listener
+
+    @staticmethod
+    def stream_project_events(project_id: int, last_event_id: int = None):
+        """
+        Generator of Server-Sent Events for changes to the status or lock of the project's tasks.  Notifications only
+        wake the stream, the changes are read from the task change feed so they're sent in commit order, and the event
+        ids are change feed cursors so a reconnecting client's Last-Event-ID replays the changes it missed.
+        :param last_event_id: Cursor of the last event the client received
+        """
+        listener = TaskEventService.get_listener()
+        # Subscribe before reading the cursor so nothing committed in between is missed
+        subscriber = listener.subscribe(project_id)
+        try:
+            if last_event_id is None:
+                cursor = Task.get_change_horizon()
+            else:
+                cursor = last_event_id
+                subscriber.notify(last_event_id + 1)
+
+            while True:
+                subscriber.woken.clear()
+                if subscriber.resync:
+                    subscriber.resync = False
+                    cursor = Task.get_change_horizon()
+                    yield TaskEventService._format_resync()
+                elif cursor < subscriber.latest_change_id:
+                    changes, cursor = Task.get_task_changes(project_id, cursor, MAX_REPLAY_CHANGES + 1)
+                    if len(changes) > MAX_REPLAY_CHANGES:
+                        cursor = Task.get_change_horizon()
+                        yield TaskEventService._format_resync()
+                    else:
+                        yield from TaskEventService._format_changes(changes, cursor)
+
+                # Don't hold a pooled DB connection open while waiting for changes
+                db.session.remove()
+
+                if cursor < subscriber.latest_change_id:
+                    # The transaction holding the changes back may not touch this project, so won't notify when done
+                    subscriber.woken.wait(HELD_BACK_RETRY_SECONDS)
+                elif not subscriber.woken.wait(HEARTBEAT_SECONDS):
+                    yield ': heartbeat\n\n'
+        finally:
+            listener.unsubscribe(subscriber)
+
+    @staticmethod
+    def _format_changes(changes: list, cursor: int) -> list:
+        """
+        Formats changed tasks as SSE messages.  Only the last message carries the cursor as its id, a client that
+        reconnects part way through gets all of the changes again rather than skipping the rest.
+        """
+        messages = []
+        for task in changes:
+            event = dict(taskId=task.id, taskStatus=task.task_status, lockedBy=task.locked_by)
+            if task is changes[-1]:
+                event['changeId'] = cursor
+            messages.append(TaskEventService._format_event(event))
+
+        return messages
+
+    @staticmethod
+    def _format_event(event: dict) -> str:
+        """ Formats a task change as an SSE message """
+        data = dict(taskId=event['taskId'], taskStatus=TaskStatus(event['taskStatus']).name,
+                    lockedBy=event.get('lockedBy'))
+
+        event_id = f'id: {event["changeId"]}\n' if event.get('changeId') is not None else ''
+        return f'{event_id}event: task-changed\ndata: {json.dumps(data)}\n\n'
+
+    @staticmethod
+    def _format_resync() -> str:
+        """ Tells the client it has missed events and should reload task state from the changes feed """
+        return 'event: resync\ndata: {}\n\n'
@@ -0,0 +1,150 @@
+from flask import current_app
+from sqlalchemy import text
+
+from server import db
+from server.models.postgis.task import TaskHistory
+
+# Hash partitioned copy of task_history created by migration 0c4f8a2e9b71 on Postgres 12 and later
+PARTITIONED_TABLE = 'task_history_partitioned'
+UNPARTITIONED_TABLE = 'task_history_unpartitioned'
+MIN_SERVER_VERSION = 120000
+MIRROR_TRIGGER = 'task_history_partition_mirror'
+
+# Indexes and constraints renamed when the tables are swapped, by their name on task_history
+SWAPPED_INDEXES = ['task_history_pkey', 'idx_task_history_composite', 'ix_task_history_project_id',
+                   'idx_task_history_last_action']
+# Foreign keys to task_history.id, which a partitioned table can't be referenced by as id alone isn't unique to it
+REFERENCING_FOREIGN_KEYS = [('task_mapping_issues', 'task_mapping_issues_task_history_id_fkey'),
+                            ('task_invalidation_history', 'fk_invalidation_history')]
+
+
+class TaskHistoryPartitionServiceError(Exception):
+    """ Custom Exception to notify callers an error occurred when partitioning task history """
+
+    def __init__(self, message):
+        if current_app:
+            current_app.logger.error(message)
+
+
+class TaskHistoryPartitionService:
+
+    @staticmethod
+    def partition_task_history(batch_size: int = 10000) -> int:
+        """
+        Moves task history into the hash partitioned table online.  Writes to task_history are mirrored into the
+        partitioned table while existing rows are copied across in batches, then the tables are swapped in one short
+        transaction.  The old table is kept as task_history_unpartitioned until it's dropped by hand.
+        :param batch_size: Rows copied per transaction
+        :raises TaskHistoryPartitionServiceError
+        :return: Number of rows copied
+        """
+        TaskHistoryPartitionService._check_can_partition()
+        TaskHistoryPartitionService._install_mirror_trigger()
+
+        rows_copied = 0
+        last_id = 0
+        while True:
+            batch_count, batch_last_id = TaskHistoryPartitionService._copy_batch(last_id, batch_size)
+            if batch_last_id is None:
+                break
+
+            rows_copied += batch_count
+            last_id = batch_last_id
+            current_app.logger.info(f'Copied task history to id {last_id}, {rows_copied} rows so far')
+
+        TaskHistoryPartitionService._swap_tables()
+        return rows_copied
+
+    @staticmethod
+    def _check_can_partition():
+        """ Ensures the server supports partitioning and the partitioned table is still waiting to be swapped in """
+        server_version = int(db.session.execute(text('SHOW server_version_num')).scalar())
+        if server_version < MIN_SERVER_VERSION:
+            raise TaskHistoryPartitionServiceError('Partitioning task history requires Postgres 12 or later')
+
+        partitioned_table = db.session.execute(text('SELECT to_regclass(:table)'), {'table': PARTITIONED_TABLE}) \
+            .scalar()
+        if partitioned_table is None:
+            raise TaskHistoryPartitionServiceError(f'{PARTITIONED_TABLE} not found, either migrations have not been '
+                                                   f'run or task history is already partitioned')
+
+    @staticmethod
+    def _install_mirror_trigger():
+        """ Mirrors every write to task_history into the partitioned table, so nothing is missed during the copy """
+        columns = [column.name for column in TaskHistory.__table__.columns if column.name not in ('id', 'project_id')]
+        updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns)
+
+        db.session.execute(text(f'''
+            CREATE OR REPLACE FUNCTION {MIRROR_TRIGGER}() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    DELETE FROM {PARTITIONED_TABLE} WHERE id = OLD.id AND project_id = OLD.project_id;
+                    RETURN OLD;
+                END IF;
+
+                INSERT INTO {PARTITIONED_TABLE} SELECT NEW.*
+                    ON CONFLICT (id, project_id) DO UPDATE SET {updates};
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            DROP TRIGGER IF EXISTS {MIRROR_TRIGGER} ON task_history;
+            CREATE TRIGGER {MIRROR_TRIGGER}
+                AFTER INSERT OR UPDATE OR DELETE ON task_history
+                FOR EACH ROW EXECUTE PROCEDURE {MIRROR_TRIGGER}();
+        '''))
+        db.session.commit()
+
+    @staticmethod
+    def _copy_batch(after_id: int, batch_size: int):
+        """
+        Copies the next batch of rows.  Rows are locked while they're copied, so a concurrent update or delete either
+        lands before the copy and is mirrored, or waits for it and is mirrored over the copied row.
+        :return: tuple of (rows copied, last id in batch), the id is None once every row has been copied
+        """
+        sql = f'''WITH batch AS (
+                SELECT *
+                  FROM task_history
+                 WHERE id > :after_id
+                 ORDER BY id
+                 LIMIT :batch_size
+                   FOR SHARE
+            ), copied AS (
+                INSERT INTO {PARTITIONED_TABLE}
+                SELECT * FROM batch
+                    ON CONFLICT (id, project_id) DO NOTHING
+            )
+            SELECT count(*), max(id) FROM batch'''
+
+        batch_count, last_id = db.session.execute(text(sql), dict(after_id=after_id, batch_size=batch_size)).first()
+        db.session.commit()
+        return batch_count, last_id
+
+    @staticmethod
+    def _swap_tables():
+        """ Swaps the partitioned table in for task_history, briefly blocking all access to task history """
+        statements = [
+            'LOCK TABLE task_history IN ACCESS EXCLUSIVE MODE',
+            f'DROP TRIGGER {MIRROR_TRIGGER} ON task_history',
+            f'DROP FUNCTION {MIRROR_TRIGGER}()',
+        ]
+        statements += [f'ALTER TABLE {table} DROP CONSTRAINT {constraint}'
+                       for table, constraint in REFERENCING_FOREIGN_KEYS]
+        statements.append(f'ALTER TABLE task_history RENAME TO {UNPARTITIONED_TABLE}')
+        for index in SWAPPED_INDEXES:
+            statements.append(f"ALTER INDEX {index} RENAME TO {index.replace('task_history', UNPARTITIONED_TABLE)}")
+            statements.append(f"ALTER INDEX {index.replace('task_history', PARTITIONED_TABLE)} RENAME TO {index}")
+        statements += [
+            f'ALTER TABLE {PARTITIONED_TABLE} RENAME TO task_history',
+            f'ALTER TABLE task_history RENAME CONSTRAINT {PARTITIONED_TABLE}_project_id_fkey '
+            f'TO task_history_project_id_fkey',
+            'ALTER SEQUENCE task_history_id_seq OWNED BY task_history.id',
+        ]
+
+        try:
+            for statement in statements:
+                db.session.execute(text(statement))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise TaskHistoryPartitionServiceError(f'Swapping in partitioned task history failed: {str(e)}')
@@ -4,13 +4,12 @@ from functools import reduce
 import dateutil.parser
 import datetime
 
-from sqlalchemy import text
-
-from server import db
 from server.models.dtos.user_dto import UserDTO, UserOSMDTO, UserFilterDTO, UserSearchQuery, UserSearchDTO, \
     UserStatsDTO
 from server.models.dtos.message_dto import MessageDTO
+from server.models.postgis.contribution_time import ContributionTime
 from server.models.postgis.message import Message
+from server.models.postgis.project_history_archive import ArchivedUserStats
 from server.models.postgis.task import TaskHistory
 from server.models.postgis.user import User, UserRole, MappingLevel
 from server.models.postgis.utils import NotFound
@@ -121,32 +120,14 @@ class UserService:
             TaskHistory.action == 'STATE_CHANGE'
         ).distinct(TaskHistory.project_id).count()
 
-        stats_dto.tasks_mapped = tasks_mapped
-        stats_dto.tasks_validated = tasks_validated
-        stats_dto.projects_mapped = projects_mapped
-        stats_dto.total_time_spent = 0
-        stats_dto.time_spent_mapping = 0
-        stats_dto.time_spent_validating = 0
-
-        sql = """SELECT SUM(TO_TIMESTAMP(action_text, 'HH24:MI:SS')::TIME) FROM task_history
-                WHERE (action='LOCKED_FOR_VALIDATION' or action='AUTO_UNLOCKED_FOR_VALIDATION')
-                and user_id = :user_id;"""
-        total_validation_time = db.engine.execute(text(sql), user_id=user.id)
-        for time in total_validation_time:
-            total_validation_time = time[0]
-            if total_validation_time:
-                stats_dto.time_spent_validating = total_validation_time.total_seconds()
-                stats_dto.total_time_spent += stats_dto.time_spent_validating
-
-        sql = """SELECT SUM(TO_TIMESTAMP(action_text, 'HH24:MI:SS')::TIME) FROM task_history
-                WHERE (action='LOCKED_FOR_MAPPING' or action='AUTO_UNLOCKED_FOR_MAPPING')
-                and user_id = :user_id;"""
-        total_mapping_time = db.engine.execute(text(sql), user_id=user.id)
-        for time in total_mapping_time:
-            total_mapping_time = time[0]
-            if total_mapping_time:
-                stats_dto.time_spent_mapping = total_mapping_time.total_seconds()
-                stats_dto.total_time_spent += stats_dto.time_spent_mapping
+        # Counts on projects whose history has been archived are kept separately
+        archived_mapped, archived_validated, archived_projects = ArchivedUserStats.get_user_totals(user.id)
+
+        stats_dto.tasks_mapped = tasks_mapped + archived_mapped
+        stats_dto.tasks_validated = tasks_validated + archived_validated
+        stats_dto.projects_mapped = projects_mapped + archived_projects
+        stats_dto.time_spent_mapping, stats_dto.time_spent_validating = ContributionTime.get_time_spent(user_id=user.id)
+        stats_dto.total_time_spent = stats_dto.time_spent_mapping + stats_dto.time_spent_validating
 
         return stats_dto
 
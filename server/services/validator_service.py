@@ -1,13 +1,14 @@
 from flask import current_app
 from sqlalchemy import text
 
-from server.models.dtos.mapping_dto import TaskDTOs
+from server.models.dtos.mapping_dto import TaskDTO, TaskDTOs, LockNextTaskDTO
 from server.models.dtos.stats_dto import Pagination
 from server.models.dtos.validator_dto import LockForValidationDTO, UnlockAfterValidationDTO, MappedTasks, StopValidationDTO, InvalidatedTask, InvalidatedTasks
 from server.models.postgis.statuses import ValidatingNotAllowed
-from server.models.postgis.task import Task, TaskStatus, TaskHistory, TaskInvalidationHistory, TaskAction, TaskMappingIssue
-from server.models.postgis.utils import NotFound, UserLicenseError, timestamp
+from server.models.postgis.task import Task, TaskStatus, TaskInvalidationHistory, TaskAction, TaskMappingIssue
+from server.models.postgis.utils import NotFound, UserLicenseError, timestamp, commit_or_flush, run_after_commit
 from server.models.postgis.project_info import ProjectInfo
+from server.services.bulk_transition_service import BulkTransitionService
 from server.services.messaging.message_service import MessageService
 from server.services.project_service import ProjectService
 from server.services.stats_service import StatsService
@@ -29,24 +30,64 @@ class ValidatorService:
         Lock supplied tasks for validation
         :raises ValidatatorServiceError
         """
+        # Fetch and row lock the whole batch at once, so no task can be locked by anyone else while it's checked
+        tasks_to_lock = Task.get_tasks_for_update(validation_dto.project_id, validation_dto.task_ids)
+        found_task_ids = {task.id for task in tasks_to_lock}
+
         # Loop supplied tasks to check they can all be locked for validation
-        tasks_to_lock = []
         for task_id in validation_dto.task_ids:
-            task = Task.get(task_id, validation_dto.project_id)
-
-            if task is None:
+            if task_id not in found_task_ids:
                 raise NotFound(f'Task {task_id} not found')
 
+        for task in tasks_to_lock:
             if TaskStatus(task.task_status) not in [TaskStatus.MAPPED, TaskStatus.VALIDATED, TaskStatus.BADIMAGERY]:
-                raise ValidatatorServiceError(f'Task {task_id} is not MAPPED, BADIMAGERY or VALIDATED')
+                raise ValidatatorServiceError(f'Task {task.id} is not MAPPED, BADIMAGERY or VALIDATED')
 
             if not ValidatorService._user_can_validate_task(validation_dto.user_id, task.mapped_by):
                 raise ValidatatorServiceError(f'Tasks cannot be validated by the same user who marked task as mapped or badimagery')
 
-            tasks_to_lock.append(task)
+        ValidatorService._check_user_can_validate(validation_dto.project_id, validation_dto.user_id)
+
+        # Lock all tasks for validation
+        Task.lock_tasks_for_validating(validation_dto.project_id, tasks_to_lock, validation_dto.user_id)
+
+        # Reload the batch in one query, returning the tasks in the order they were requested
+        locked_tasks = {task.id: task for task in Task.get_tasks(validation_dto.project_id, list(found_task_ids))}
+        tasks = [locked_tasks[task_id] for task_id in dict.fromkeys(validation_dto.task_ids)]
 
-        user_can_validate, error_reason = ProjectService.is_user_permitted_to_validate(validation_dto.project_id,
-                                                                                       validation_dto.user_id)
+        task_dtos = TaskDTOs()
+        task_dtos.tasks = Task.as_dtos_with_instructions(validation_dto.project_id, tasks,
+                                                         validation_dto.preferred_locale)
+
+        return task_dtos
+
+    @staticmethod
+    def lock_next_task_for_validation(lock_next_dto: LockNextTaskDTO) -> TaskDTO:
+        """
+        Picks and locks the next available MAPPED or BADIMAGERY task on the project for validation, skipping the user's
+        own tasks unless they are a project manager, see Task.lock_next_task
+        :raises NotFound if there are no tasks available to validate
+        """
+        ValidatorService._check_user_can_validate(lock_next_dto.project_id, lock_next_dto.user_id)
+
+        exclude_mapped_by = None if UserService.is_user_a_project_manager(lock_next_dto.user_id) \
+            else lock_next_dto.user_id
+        task_id = Task.lock_next_task(lock_next_dto.project_id, lock_next_dto.user_id,
+                                      TaskAction.LOCKED_FOR_VALIDATION, lock_next_dto.lon, lock_next_dto.lat,
+                                      exclude_mapped_by)
+        if task_id is None:
+            raise NotFound('No tasks available for validation')
+
+        task = Task.get(task_id, lock_next_dto.project_id)
+        return task.as_dto_with_instructions(lock_next_dto.preferred_locale)
+
+    @staticmethod
+    def _check_user_can_validate(project_id: int, user_id: int):
+        """
+        Checks the user is permitted to lock tasks for validation on the project
+        :raises UserLicenseError, ValidatatorServiceError
+        """
+        user_can_validate, error_reason = ProjectService.is_user_permitted_to_validate(project_id, user_id)
 
         if not user_can_validate:
             if error_reason == ValidatingNotAllowed.USER_NOT_ACCEPTED_LICENSE:
@@ -54,17 +95,6 @@ class ValidatorService:
             else:
                 raise ValidatatorServiceError(f'Validation not allowed because: {error_reason.name}')
 
-        # Lock all tasks for validation
-        dtos = []
-        for task in tasks_to_lock:
-            task.lock_task_for_validating(validation_dto.user_id)
-            dtos.append(task.as_dto_with_instructions(validation_dto.preferred_locale))
-
-        task_dtos = TaskDTOs()
-        task_dtos.tasks = dtos
-
-        return task_dtos
-
     @staticmethod
     def _user_can_validate_task(user_id: int, mapped_by: int) -> bool:
         """
@@ -90,61 +120,51 @@ class ValidatorService:
         user_id = validated_dto.user_id
         tasks_to_unlock = ValidatorService.get_tasks_locked_by_user(project_id, validated_tasks, user_id)
 
-        # Unlock all tasks
-        dtos = []
+        # Unlock all tasks in one transaction, notifications are queued and only sent once it's committed
+        state_changes = []
+        mentions = []
+        validations = []
         message_sent_to = []
         for task_to_unlock in tasks_to_unlock:
             task = task_to_unlock['task']
 
             if task_to_unlock['comment']:
                 # Parses comment to see if any users have been @'d
-                MessageService.send_message_after_comment(
-                    validated_dto.user_id,
-                    task_to_unlock["comment"],
-                    task.id,
-                    validated_dto.project_id,
-                )
+                mentions.append((user_id, task_to_unlock['comment'], task.id, project_id))
             mapped_by = task.mapped_by
 
             # Update stats if user setting task to a different state from previous state
-            prev_status = TaskHistory.get_last_status(project_id, task.id)
-            if prev_status != task_to_unlock["new_state"]:
-                StatsService.update_stats_after_task_state_change(
-                    validated_dto.project_id,
-                    validated_dto.user_id,
-                    prev_status,
-                    task_to_unlock["new_state"],
-                )
-
-            task_mapping_issues = ValidatorService.get_task_mapping_issues(
-                task_to_unlock
-            )
-            task.unlock_task(
-                validated_dto.user_id,
-                task_to_unlock["new_state"],
-                task_to_unlock["comment"],
-                issues=task_mapping_issues,
-            )
-
-            if (
-                task_to_unlock["new_state"] == TaskStatus.VALIDATED
-                or task_to_unlock["new_state"] == TaskStatus.INVALIDATED
-            ):
+            prev_status = task.get_last_status()
+            if prev_status != task_to_unlock['new_state']:
+                state_changes.append((prev_status, task_to_unlock['new_state']))
+
+            task_mapping_issues = ValidatorService.get_task_mapping_issues(task_to_unlock)
+            task.apply_unlock(user_id, task_to_unlock['new_state'], task_to_unlock['comment'],
+                              issues=task_mapping_issues)
+
+            if task_to_unlock['new_state'] in [TaskStatus.VALIDATED, TaskStatus.INVALIDATED]:
                 # All mappers get a notification if their task has been validated or invalidated.
                 # Only once if multiple tasks mapped
-                if task.mapped_by not in message_sent_to:
-                    MessageService.send_message_after_validation(task_to_unlock['new_state'], validated_dto.user_id,
-                                                                 mapped_by, task.id, validated_dto.project_id)
+                if mapped_by not in message_sent_to:
+                    validations.append((task_to_unlock['new_state'], user_id, mapped_by, task.id, project_id))
                     message_sent_to.append(mapped_by)
 
                 if task_to_unlock['new_state'] == TaskStatus.VALIDATED:
                     # Set last_validation_date for the mapper to current date
                     task.mapper.last_validation_date = timestamp()
-            task.update()  # Required to get messages sent -- task.unlock_task did this previously at this location
-            dtos.append(task.as_dto_with_instructions(validated_dto.preferred_locale))
+
+        StatsService.update_stats_after_task_state_changes(project_id, user_id, state_changes)
+        Task.bump_task_versions(project_id)
+        commit_or_flush()
+
+        run_after_commit(MessageService.queue_messages_after_validation, mentions, validations)
+
+        # Reload the batch in one query, returning the tasks in the order they were requested
+        unlocked_tasks = {task.id: task for task in Task.get_tasks(project_id, [t['task'].id for t in tasks_to_unlock])}
+        tasks = [unlocked_tasks[task_to_unlock['task'].id] for task_to_unlock in tasks_to_unlock]
 
         task_dtos = TaskDTOs()
-        task_dtos.tasks = dtos
+        task_dtos.tasks = Task.as_dtos_with_instructions(project_id, tasks, validated_dto.preferred_locale)
 
         return task_dtos
 
@@ -187,10 +207,14 @@ class ValidatorService:
         :raises ValidatatorServiceError
         :raises NotFound
         """
+        # Fetch and row lock the whole batch at once
+        tasks = {task.id: task for task in
+                 Task.get_tasks_for_update(project_id, [unlock_task.task_id for unlock_task in unlock_tasks])}
+
         tasks_to_unlock = []
         # Loop supplied tasks to check they can all be unlocked
         for unlock_task in unlock_tasks:
-            task = Task.get(unlock_task.task_id, project_id)
+            task = tasks.get(unlock_task.task_id)
 
             if task is None:
                 raise NotFound(f'Task {unlock_task.task_id} not found')
@@ -258,40 +282,12 @@ class ValidatorService:
     @staticmethod
     def invalidate_all_tasks(project_id: int, user_id: int):
         """ Invalidates all mapped tasks on a project"""
-        mapped_tasks = Task.query.filter(Task.project_id == project_id,
-                                         ~Task.task_status.in_([TaskStatus.READY.value,
-                                                                TaskStatus.BADIMAGERY.value])).all()
-        for task in mapped_tasks:
-            if TaskStatus(task.task_status) not in [TaskStatus.LOCKED_FOR_MAPPING, TaskStatus.LOCKED_FOR_VALIDATION]:
-                # Only lock tasks that are not already locked to avoid double lock issue.
-                task.lock_task_for_validating(user_id)
-            task.unlock_task(user_id, new_state=TaskStatus.INVALIDATED)
-
-        # Reset counters
-        project = ProjectService.get_project_by_id(project_id)
-        project.tasks_mapped = 0
-        project.tasks_validated = 0
-        project.save()
+        BulkTransitionService.invalidate_all_tasks(project_id, user_id)
 
     @staticmethod
     def validate_all_tasks(project_id: int, user_id: int):
         """ Validates all mapped tasks on a project"""
-        tasks_to_validate = Task.query.filter(Task.project_id == project_id,
-                                              Task.task_status != TaskStatus.BADIMAGERY.value).all()
-
-        for task in tasks_to_validate:
-            task.mapped_by = task.mapped_by or user_id  # Ensure we set mapped by value
-            if TaskStatus(task.task_status) not in [TaskStatus.LOCKED_FOR_MAPPING, TaskStatus.LOCKED_FOR_VALIDATION]:
-                # Only lock tasks that are not already locked to avoid double lock issue
-                task.lock_task_for_validating(user_id)
-
-            task.unlock_task(user_id, new_state=TaskStatus.VALIDATED)
-
-        # Set counters to fully mapped and validated
-        project = ProjectService.get_project_by_id(project_id)
-        project.tasks_mapped = (project.total_tasks - project.tasks_bad_imagery)
-        project.tasks_validated = project.total_tasks
-        project.save()
+        BulkTransitionService.validate_all_tasks(project_id, user_id)
 
     @staticmethod
     def get_task_mapping_issues(task_to_unlock: dict):
@@ -0,0 +1,79 @@
+import os
+import unittest
+from sqlalchemy import text
+from server import create_app, db
+from server.models.postgis.statuses import TaskStatus
+from server.models.postgis.task import Task
+from tests.server.helpers.test_helpers import create_canned_project
+
+CHANGE_STATUS_SQL = '''UPDATE tasks SET task_status = :status, change_id = txid_current()
+                        WHERE project_id = :project_id AND id = :task_id'''
+
+
+class TestTask(unittest.TestCase):
+    skip_tests = False
+    test_project = None
+    test_user = None
+
+    @classmethod
+    def setUpClass(cls):
+        env = os.getenv('CI', 'false')
+
+        # Firewall rules mean we can't hit Postgres from CI so we have to skip them in the CI build
+        if env == 'true':
+            cls.skip_tests = True
+
+    def setUp(self):
+        """
+        Setup test context so we can connect to database
+        """
+        self.app = create_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        if self.skip_tests:
+            return
+
+        self.test_project, self.test_user = create_canned_project()
+
+    def tearDown(self):
+        if self.skip_tests:
+            return
+
+        self.test_project.delete()
+        self.test_user.delete()
+        self.ctx.pop()
+
+    def test_task_changes_held_back_behind_in_flight_transaction(self):
+        if self.skip_tests:
+            return
+
+        # Arrange
+        project_id = self.test_project.id
+        tasks, cursor = Task.get_task_changes(project_id)
+        db.session.commit()
+
+        in_flight = db.engine.connect()
+        in_flight_transaction = in_flight.begin()
+        try:
+            # Task 1 changes first but commits last, after task 2's change
+            in_flight.execute(text(CHANGE_STATUS_SQL), status=TaskStatus.BADIMAGERY.value, project_id=project_id,
+                              task_id=1)
+            with db.engine.begin() as committed:
+                committed.execute(text(CHANGE_STATUS_SQL), status=TaskStatus.MAPPED.value, project_id=project_id,
+                                  task_id=2)
+
+            # Act
+            changes_while_in_flight, cursor_while_in_flight = Task.get_task_changes(project_id, cursor)
+            db.session.commit()
+            in_flight_transaction.commit()
+            changes_after_commit, _ = Task.get_task_changes(project_id, cursor_while_in_flight)
+        finally:
+            if in_flight_transaction.is_active:
+                in_flight_transaction.rollback()
+            in_flight.close()
+
+        # Assert
+        self.assertEqual(len(tasks), 2)
+        self.assertEqual(changes_while_in_flight, [])
+        self.assertEqual(sorted(task.id for task in changes_after_commit), [1, 2])
@@ -0,0 +1,70 @@
+import os
+import unittest
+from sqlalchemy import text
+from server import create_app, db
+from server.models.postgis.task import TaskHistory, TaskAction, LAST_ACTION_SQL
+from tests.server.helpers.test_helpers import create_canned_project
+
+HISTORY_ROWS = 10000
+
+
+class TestTaskHistory(unittest.TestCase):
+    skip_tests = False
+    test_project = None
+    test_user = None
+
+    @classmethod
+    def setUpClass(cls):
+        env = os.getenv('CI', 'false')
+
+        # Firewall rules mean we can't hit Postgres from CI so we have to skip them in the CI build
+        if env == 'true':
+            cls.skip_tests = True
+
+    def setUp(self):
+        """
+        Setup test context so we can connect to database
+        """
+        self.app = create_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        if self.skip_tests:
+            return
+
+        self.test_project, self.test_user = create_canned_project()
+
+    def tearDown(self):
+        if self.skip_tests:
+            return
+
+        db.session.rollback()
+        self.test_project.delete()
+        self.test_user.delete()
+        self.ctx.pop()
+
+    def test_last_action_lookups_use_index_on_long_history(self):
+        if self.skip_tests:
+            return
+
+        # Arrange - the history is never committed, it's all rolled back in tearDown
+        db.session.execute(text('''INSERT INTO task_history (project_id, task_id, action, action_text, action_date,
+                                                             user_id)
+            SELECT :project_id, 1,
+                   (ARRAY['LOCKED_FOR_MAPPING', 'STATE_CHANGE', 'COMMENT', 'LOCKED_FOR_VALIDATION'])[n % 4 + 1],
+                   CASE WHEN n % 4 = 1 THEN 'MAPPED' ELSE '00:10:00' END,
+                   now() - make_interval(mins => :rows - n),
+                   :user_id
+              FROM generate_series(1, :rows) AS n'''),
+                           dict(project_id=self.test_project.id, user_id=self.test_user.id, rows=HISTORY_ROWS))
+        db.session.execute(text('ANALYZE task_history'))
+
+        # Act
+        plan = db.session.execute(text('EXPLAIN ' + LAST_ACTION_SQL),
+                                  dict(actions=[action.name for action in TaskAction], project_id=self.test_project.id,
+                                       task_id=1)).fetchall()
+        last_action = TaskHistory.get_last_action(self.test_project.id, 1)
+
+        # Assert
+        self.assertIn('idx_task_history_last_action', '\n'.join(row[0] for row in plan))
+        self.assertEqual(last_action.action, 'LOCKED_FOR_MAPPING')
@@ -0,0 +1,181 @@
+import os
+import unittest
+from sqlalchemy import text
+from server import create_app, db
+from server.models.postgis.task import Task, TaskAction, TaskStatus
+from server.models.postgis.utils import UnitOfWork
+from server.services.bulk_transition_service import BulkTransitionService
+from tests.server.helpers.test_helpers import create_canned_project
+
+# Lock actions only record when they were closed, the per task path records the time it took
+TASK_HISTORY_SQL = '''SELECT task_id, action,
+                             CASE WHEN action LIKE '%LOCKED%' THEN CAST(action_text IS NOT NULL AS text)
+                                  ELSE action_text END AS action_text,
+                             user_id
+                        FROM task_history
+                       WHERE project_id = :project_id
+                       ORDER BY task_id, id'''
+TASKS_SQL = '''SELECT t.id, t.task_status, t.mapped_by, t.validated_by, t.locked_by, t.locked_at, t.last_state,
+                      t.prev_state, th.action AS last_action, t.last_action_user_id
+                 FROM tasks t
+                 LEFT JOIN task_history th ON th.id = t.last_action_id
+                WHERE t.project_id = :project_id
+                ORDER BY t.id'''
+TASK_INVALIDATION_HISTORY_SQL = '''SELECT task_id, is_closed, mapper_id, invalidator_id, validator_id,
+                                          invalidation_history_id IS NOT NULL AS has_invalidation
+                                     FROM task_invalidation_history
+                                    WHERE project_id = :project_id
+                                    ORDER BY task_id, id'''
+
+
+def map_all_per_task(project_id: int, user_id: int):
+    """ How map all was applied before BulkTransitionService """
+    tasks_to_map = Task.query.filter(Task.project_id == project_id,
+                                     Task.task_status.notin_([TaskStatus.BADIMAGERY.value,
+                                                              TaskStatus.MAPPED.value,
+                                                              TaskStatus.VALIDATED.value])).all()
+
+    for task in tasks_to_map:
+        if TaskStatus(task.task_status) not in [TaskStatus.LOCKED_FOR_MAPPING, TaskStatus.LOCKED_FOR_VALIDATION]:
+            task.lock_task_for_mapping(user_id)
+
+        task.unlock_task(user_id, new_state=TaskStatus.MAPPED)
+
+
+def validate_all_per_task(project_id: int, user_id: int):
+    """ How validate all was applied before BulkTransitionService """
+    tasks_to_validate = Task.query.filter(Task.project_id == project_id,
+                                          Task.task_status != TaskStatus.BADIMAGERY.value).all()
+
+    for task in tasks_to_validate:
+        task.mapped_by = task.mapped_by or user_id
+        if TaskStatus(task.task_status) not in [TaskStatus.LOCKED_FOR_MAPPING, TaskStatus.LOCKED_FOR_VALIDATION]:
+            task.lock_task_for_validating(user_id)
+
+        task.unlock_task(user_id, new_state=TaskStatus.VALIDATED)
+
+
+def invalidate_all_per_task(project_id: int, user_id: int):
+    """ How invalidate all was applied before BulkTransitionService """
+    mapped_tasks = Task.query.filter(Task.project_id == project_id,
+                                     ~Task.task_status.in_([TaskStatus.READY.value,
+                                                            TaskStatus.BADIMAGERY.value])).all()
+    for task in mapped_tasks:
+        if TaskStatus(task.task_status) not in [TaskStatus.LOCKED_FOR_MAPPING, TaskStatus.LOCKED_FOR_VALIDATION]:
+            task.lock_task_for_validating(user_id)
+
+        task.unlock_task(user_id, new_state=TaskStatus.INVALIDATED)
+
+
+def reset_all_per_task(project_id: int, user_id: int):
+    """ How reset all was applied before BulkTransitionService """
+    for task in Task.query.filter(Task.project_id == project_id).all():
+        task.set_task_history(TaskAction.COMMENT, user_id, "Task reset", TaskStatus.READY)
+        task.reset_task(user_id)
+
+
+class TestBulkTransitionService(unittest.TestCase):
+
+    skip_tests = False
+    test_project = None
+    test_user = None
+
+    @classmethod
+    def setUpClass(cls):
+        env = os.getenv('CI', 'false')
+
+        # Firewall rules mean we can't hit Postgres from CI so we have to skip them in the CI build
+        if env == 'true':
+            cls.skip_tests = True
+
+    def setUp(self):
+        if self.skip_tests:
+            return
+
+        self.app = create_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        self.test_project, self.test_user = create_canned_project()
+
+    def tearDown(self):
+        if self.skip_tests:
+            return
+
+        self.test_project.delete()
+        self.test_user.delete()
+        self.ctx.pop()
+
+    def test_map_all_matches_per_task_path(self):
+        if self.skip_tests:
+            return
+
+        # Arrange - task 2 is locked by its mapper, task 1 is already mapped
+        Task.get(2, self.test_project.id).lock_task_for_mapping(self.test_user.id)
+
+        # Act / Assert
+        self.assert_bulk_matches_per_task(BulkTransitionService.map_all_tasks, map_all_per_task)
+
+    def test_validate_all_matches_per_task_path(self):
+        if self.skip_tests:
+            return
+
+        # Arrange - task 2 has an open invalidation, closed by the validation
+        self.transition_task(2, TaskStatus.MAPPED)
+        self.transition_task(2, TaskStatus.INVALIDATED)
+        self.transition_task(2, TaskStatus.MAPPED)
+
+        # Act / Assert
+        self.assert_bulk_matches_per_task(BulkTransitionService.validate_all_tasks, validate_all_per_task)
+
+    def test_invalidate_all_matches_per_task_path(self):
+        if self.skip_tests:
+            return
+
+        # Arrange - task 2 has mapped history to start an invalidation from, task 1 hasn't
+        self.transition_task(2, TaskStatus.MAPPED)
+
+        # Act / Assert
+        self.assert_bulk_matches_per_task(BulkTransitionService.invalidate_all_tasks, invalidate_all_per_task)
+
+    def test_reset_all_matches_per_task_path(self):
+        if self.skip_tests:
+            return
+
+        # Arrange
+        self.transition_task(2, TaskStatus.MAPPED)
+
+        # Act / Assert
+        self.assert_bulk_matches_per_task(BulkTransitionService.reset_all_tasks, reset_all_per_task)
+
+    def transition_task(self, task_id: int, new_state: TaskStatus):
+        """ Locks and unlocks the task the way mappers and validators do, committing the history it leaves """
+        task = Task.get(task_id, self.test_project.id)
+        if new_state == TaskStatus.MAPPED:
+            task.lock_task_for_mapping(self.test_user.id)
+        else:
+            task.lock_task_for_validating(self.test_user.id)
+
+        task.unlock_task(self.test_user.id, new_state=new_state)
+
+    def assert_bulk_matches_per_task(self, bulk_transition, per_task_transition):
+        """ Runs the per task path and rolls it back, then runs the bulk transition and compares the rows left """
+        project_id = self.test_project.id
+        with UnitOfWork() as unit_of_work:
+            per_task_transition(project_id, self.test_user.id)
+            per_task_rows = self.get_transition_rows()
+            unit_of_work.rollback()
+
+        bulk_transition(project_id, self.test_user.id)
+        bulk_rows = self.get_transition_rows()
+
+        self.assertEqual(bulk_rows['tasks'], per_task_rows['tasks'])
+        self.assertEqual(bulk_rows['task_history'], per_task_rows['task_history'])
+        self.assertEqual(bulk_rows['task_invalidation_history'], per_task_rows['task_invalidation_history'])
+
+    def get_transition_rows(self) -> dict:
+        params = dict(project_id=self.test_project.id)
+        return dict(tasks=[tuple(row) for row in db.session.execute(text(TASKS_SQL), params)],
+                    task_history=[tuple(row) for row in db.session.execute(text(TASK_HISTORY_SQL), params)],
+                    task_invalidation_history=[tuple(row) for row in
+                                               db.session.execute(text(TASK_INVALIDATION_HISTORY_SQL), params)])
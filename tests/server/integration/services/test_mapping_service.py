@@ -1,10 +1,13 @@
 import datetime
 import hashlib
 import os
+import threading
 import unittest
 from unittest.mock import patch
-from server import create_app
-from server.services.mapping_service import MappingService, Task
+from sqlalchemy import text
+from server import create_app, db
+from server.models.postgis.task import TaskHistory, TaskAction
+from server.services.mapping_service import MappingService, Task, TaskStatus
 from tests.server.helpers.test_helpers import create_canned_project
 
 
@@ -138,3 +141,72 @@ class TestMappingService(unittest.TestCase):
         # Assert
         for task in self.test_project.tasks:
             self.assertIsNotNone(task.mapped_by)
+
+    def test_only_one_of_many_parallel_lockers_locks_task(self):
+        if self.skip_tests:
+            return
+
+        # Arrange
+        lockers = 100
+        project_id = self.test_project.id
+        user_id = self.test_user.id
+        start = threading.Barrier(lockers)
+        results = []
+
+        def lock_task():
+            with self.app.app_context():
+                start.wait()
+                task = Task.get(2, project_id)
+                results.append(task.lock_task_for_mapping(user_id))
+
+        threads = [threading.Thread(target=lock_task) for _ in range(lockers)]
+
+        # Act
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Assert
+        locks = TaskHistory.query.filter_by(project_id=project_id, task_id=2,
+                                            action=TaskAction.LOCKED_FOR_MAPPING.name).count()
+        self.assertEqual(len(results), lockers)
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(locks, 1)
+        self.assertEqual(Task.get(2, project_id).task_status, TaskStatus.LOCKED_FOR_MAPPING.value)
+
+    def test_parallel_lock_next_callers_each_lock_a_different_task(self):
+        if self.skip_tests:
+            return
+
+        # Arrange - copies of the ready task 2, so there's a ready task for each caller and a few spare
+        callers = 8
+        project_id = self.test_project.id
+        user_id = self.test_user.id
+        db.session.execute(text('''INSERT INTO tasks (id, project_id, x, y, zoom, is_square, geometry, task_status)
+            SELECT n, project_id, x, y, zoom, is_square, geometry, task_status
+              FROM tasks, generate_series(3, :last_task_id) AS n
+             WHERE project_id = :project_id AND id = 2'''), dict(project_id=project_id, last_task_id=callers + 4))
+        db.session.commit()
+        start = threading.Barrier(callers)
+        results = []
+
+        def lock_next_task():
+            with self.app.app_context():
+                start.wait()
+                results.append(Task.lock_next_task(project_id, user_id, TaskAction.LOCKED_FOR_MAPPING))
+
+        threads = [threading.Thread(target=lock_next_task) for _ in range(callers)]
+
+        # Act
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Assert
+        locks = TaskHistory.query.filter_by(project_id=project_id, action=TaskAction.LOCKED_FOR_MAPPING.name).count()
+        self.assertEqual(len(results), callers)
+        self.assertNotIn(None, results)
+        self.assertEqual(len(set(results)), callers)
+        self.assertEqual(locks, callers)
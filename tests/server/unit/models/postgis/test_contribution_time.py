@@ -0,0 +1,39 @@
+import datetime
+import unittest
+from server import create_app
+from server.models.postgis.contribution_time import ContributionTime
+from server.models.postgis.statuses import ContributionActivity
+from unittest.mock import patch
+
+
+class TestContributionTime(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        self.ctx.pop()
+
+    def test_lock_actions_count_towards_their_activity(self):
+        # Act / Assert
+        self.assertEqual(ContributionTime.activity_for_action('LOCKED_FOR_MAPPING'), ContributionActivity.MAPPING)
+        self.assertEqual(ContributionTime.activity_for_action('AUTO_UNLOCKED_FOR_MAPPING'),
+                         ContributionActivity.MAPPING)
+        self.assertEqual(ContributionTime.activity_for_action('LOCKED_FOR_VALIDATION'),
+                         ContributionActivity.VALIDATION)
+        self.assertEqual(ContributionTime.activity_for_action('AUTO_UNLOCKED_FOR_VALIDATION'),
+                         ContributionActivity.VALIDATION)
+
+    @patch('server.models.postgis.contribution_time.db')
+    def test_time_spent_is_returned_in_seconds(self, mock_db):
+        # Arrange
+        mock_query = mock_db.session.query.return_value.filter.return_value
+        mock_query.group_by.return_value = [(ContributionActivity.MAPPING.value, datetime.timedelta(hours=25))]
+
+        # Act
+        mapping, validation = ContributionTime.get_time_spent(user_id=1)
+
+        # Assert
+        self.assertEqual(mapping, 25 * 3600)
+        self.assertEqual(validation, 0)
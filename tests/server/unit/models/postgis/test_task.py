@@ -1,8 +1,11 @@
+import datetime
 import geojson
 import unittest
-from server import create_app
-from server.models.postgis.task import InvalidGeoJson, InvalidData, Task, TaskAction, TaskHistory
-from server.models.postgis.statuses import TaskStatus
+from server import create_app, db
+from server.models.postgis.task import InvalidGeoJson, InvalidData, Task, TaskAction, TaskHistory, \
+    bump_committed_task_versions
+from server.models.postgis.contribution_time import ContributionTime
+from server.models.postgis.statuses import ContributionActivity, TaskStatus
 from unittest.mock import patch, MagicMock
 
 
@@ -70,6 +73,108 @@ class TestTask(unittest.TestCase):
         # Assert
         self.assertEqual(TaskAction.LOCKED_FOR_MAPPING.name, test_task.task_history[0].action)
 
+    @patch.object(Task, 'bump_task_versions')
+    @patch('server.models.postgis.task.commit_or_flush')
+    @patch('server.models.postgis.task.db')
+    def test_lock_task_for_mapping_sets_lock_expiry(self, mock_db, mock_commit, mock_bump):
+        # Arrange
+        test_task = Task()
+        test_task.id = 1
+        test_task.project_id = 1
+        mock_db.session.execute.return_value.scalar.return_value = 10
+
+        # Act
+        locked = test_task.lock_task_for_mapping(123454)
+
+        # Assert
+        params = mock_db.session.execute.call_args[0][1]
+        self.assertTrue(locked)
+        self.assertEqual(params['lock_expires_at'] - params['locked_at'], Task.auto_unlock_delta())
+        mock_bump.assert_called_once_with(1)
+        mock_db.session.expire.assert_called_once_with(test_task)
+
+    @patch.object(Task, 'bump_task_versions')
+    @patch('server.models.postgis.task.commit_or_flush')
+    @patch('server.models.postgis.task.db')
+    def test_lock_task_for_mapping_fails_if_task_no_longer_mappable(self, mock_db, mock_commit, mock_bump):
+        # Arrange
+        test_task = Task()
+        test_task.id = 1
+        test_task.project_id = 1
+        mock_db.session.execute.return_value.scalar.return_value = None
+
+        # Act
+        locked = test_task.lock_task_for_mapping(123454)
+
+        # Assert
+        self.assertFalse(locked)
+        mock_bump.assert_not_called()
+        mock_commit.assert_not_called()
+
+    @patch.object(Task, 'bump_task_versions')
+    @patch('server.models.postgis.task.commit_or_flush')
+    @patch('server.models.postgis.task.db')
+    def test_lock_next_task_prefers_priority_areas_then_random_task(self, mock_db, mock_commit, mock_bump):
+        # Arrange - no task is free in the priority areas
+        mock_db.session.execute.return_value.scalar.side_effect = [None, 7]
+
+        # Act
+        task_id = Task.lock_next_task(1, 123454, TaskAction.LOCKED_FOR_MAPPING)
+
+        # Assert
+        priority_sql = str(mock_db.session.execute.call_args_list[0][0][0])
+        random_sql = str(mock_db.session.execute.call_args_list[1][0][0])
+        self.assertEqual(task_id, 7)
+        self.assertEqual(mock_db.session.execute.call_count, 2)
+        self.assertIn('priority_areas', priority_sql)
+        self.assertIn('FOR UPDATE OF t SKIP LOCKED', random_sql)
+        self.assertIn('OFFSET', random_sql)
+        self.assertNotIn('random()', random_sql[random_sql.index('FOR UPDATE'):])
+        mock_bump.assert_called_once_with(1)
+
+    @patch.object(Task, 'bump_task_versions')
+    @patch('server.models.postgis.task.commit_or_flush')
+    @patch('server.models.postgis.task.db')
+    def test_lock_next_task_for_validation_picks_nearest_task_not_mapped_by_user(self, mock_db, mock_commit,
+                                                                                 mock_bump):
+        # Arrange
+        mock_db.session.execute.return_value.scalar.return_value = None
+
+        # Act
+        task_id = Task.lock_next_task(1, 123454, TaskAction.LOCKED_FOR_VALIDATION, -1.2, 52.1, 123454)
+
+        # Assert
+        sql = str(mock_db.session.execute.call_args[0][0])
+        params = mock_db.session.execute.call_args[0][1]
+        self.assertIsNone(task_id)
+        self.assertEqual(mock_db.session.execute.call_count, 2)
+        self.assertIn('ST_MakePoint(:lon, :lat)', sql)
+        self.assertIn("'LOCKED_FOR_VALIDATION'", sql)
+        self.assertEqual(params['exclude_mapped_by'], 123454)
+        mock_bump.assert_not_called()
+
+    def test_is_locked_matches_locked_tasks_index_predicate(self):
+        # Act
+        clause = str(Task.is_locked().compile(compile_kwargs={'literal_binds': True}))
+
+        # Assert
+        self.assertEqual(clause, 'tasks.task_status IN (1, 3)')
+
+    @patch.object(Task, 'update')
+    def test_clear_lock_clears_lock_expiry(self, mock_update):
+        # Arrange
+        test_task = Task()
+        test_task.last_state = TaskStatus.MAPPED.value
+        test_task.set_lock_times()
+
+        # Act
+        test_task.clear_lock()
+
+        # Assert
+        self.assertIsNone(test_task.locked_at)
+        self.assertIsNone(test_task.lock_expires_at)
+        self.assertEqual(test_task.task_status, TaskStatus.MAPPED.value)
+
     def test_cant_add_task_if_not_supplied_feature_type(self):
         # Arrange
         invalid_feature = geojson.MultiPolygon([[(2.38, 57.322), (23.194, -20.28), (-120.43, 19.15), (2.38, 10.33)]])
@@ -134,17 +239,18 @@ class TestTask(unittest.TestCase):
         # Assert
         self.assertEqual(instructions, 'Foo is replaced by bar')
 
-    @patch.object(TaskHistory, 'get_last_status')
+    @patch.object(ContributionTime, 'record')
+    @patch.object(Task, 'refresh_history_summary')
     @patch.object(TaskHistory, 'get_last_locked_action')
     @patch.object(Task, 'set_task_history')
     @patch.object(Task, 'update')
     def test_record_auto_unlock_adds_autounlocked_action(self, mock_update, mock_set_task_history,
-                                                         mock_get_last_action, mock_get_last_status):
+                                                         mock_get_last_action, mock_refresh_summary, mock_record):
         mock_history = MagicMock()
         mock_last_action = MagicMock()
         mock_last_action.action = 'LOCKED_FOR_MAPPING'
+        mock_last_action.action_date = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
         mock_get_last_action.return_value = mock_last_action
-        mock_get_last_status.return_value = TaskStatus.READY
         mock_set_task_history.return_value = mock_history
 
         test_task = Task()
@@ -154,5 +260,102 @@ class TestTask(unittest.TestCase):
 
         mock_set_task_history.assert_called_with(action=TaskAction.AUTO_UNLOCKED_FOR_MAPPING, user_id='testuser')
         self.assertEqual(mock_history.action_text, lock_duration)
+        self.assertGreaterEqual(mock_history.duration, datetime.timedelta(hours=1))
+        mock_record.assert_called_with('testuser', None, ContributionActivity.MAPPING, mock_history.duration)
         self.assertEqual(test_task.locked_by, None)
         mock_last_action.delete.assert_called()
+
+    @patch('server.models.postgis.task.db')
+    def test_streamed_tasks_are_valid_feature_collection(self, mock_db):
+        # Arrange
+        mock_row = MagicMock()
+        mock_row.id = 1
+        mock_row.x = 2
+        mock_row.y = 3
+        mock_row.zoom = 18
+        mock_row.is_square = True
+        mock_row.task_status = TaskStatus.MAPPED.value
+        mock_row.geojson = '{"type": "Point", "coordinates": [1, 2]}'
+
+        mock_connection = mock_db.engine.connect.return_value.execution_options.return_value
+        mock_connection.execute.return_value.fetchmany.side_effect = [[mock_row, mock_row], []]
+
+        # Act
+        collection = geojson.loads(''.join(Task.stream_tasks_as_geojson_feature_collection(1)))
+
+        # Assert
+        self.assertEqual(len(collection['features']), 2)
+        self.assertEqual(collection['features'][0]['geometry']['coordinates'], [1, 2])
+        self.assertEqual(collection['features'][0]['properties']['taskStatus'], 'MAPPED')
+        mock_connection.close.assert_called()
+
+    def test_geometry_resolution_follows_zoom_level(self):
+        # Act / Assert
+        self.assertEqual(Task.get_geometry_resolution(), 'full')
+        self.assertEqual(Task.get_geometry_resolution(zoom=15), 'full')
+        self.assertEqual(Task.get_geometry_resolution(zoom=11), 'medium')
+        self.assertEqual(Task.get_geometry_resolution(zoom=5), 'low')
+        self.assertEqual(Task.get_geometry_resolution('low', 15), 'low')
+
+    def test_unknown_geometry_resolution_raises_error(self):
+        # Act / Assert
+        with self.assertRaises(InvalidData):
+            Task.get_geometry_resolution('ultra')
+
+    def test_task_status_value_sql_maps_every_status_name(self):
+        # Act
+        case_sql = Task.task_status_value_sql('th.action_text')
+
+        # Assert
+        self.assertTrue(case_sql.startswith('CASE th.action_text '))
+        for status in TaskStatus:
+            self.assertIn(f"WHEN '{status.name}' THEN {status.value}", case_sql)
+
+    def test_state_change_updates_history_summary(self):
+        # Arrange
+        test_task = Task()
+
+        # Act
+        test_task.set_task_history(TaskAction.STATE_CHANGE, 1, None, TaskStatus.MAPPED)
+        test_task.set_task_history(TaskAction.STATE_CHANGE, 2, None, TaskStatus.INVALIDATED)
+
+        # Assert
+        self.assertEqual(test_task.last_state, TaskStatus.INVALIDATED.value)
+        self.assertEqual(test_task.prev_state, TaskStatus.MAPPED.value)
+        self.assertEqual(test_task.last_action_user_id, 2)
+
+    def test_last_status_for_undo_follows_history_rules(self):
+        # Arrange
+        test_task = Task()
+
+        # Act / Assert
+        self.assertEqual(test_task.get_last_status(True), TaskStatus.READY)
+
+        test_task.last_state = TaskStatus.MAPPED.value
+        test_task.prev_state = TaskStatus.INVALIDATED.value
+        self.assertEqual(test_task.get_last_status(), TaskStatus.MAPPED)
+        self.assertEqual(test_task.get_last_status(True), TaskStatus.READY)
+
+        test_task.last_state = TaskStatus.VALIDATED.value
+        test_task.prev_state = TaskStatus.MAPPED.value
+        self.assertEqual(test_task.get_last_status(True), TaskStatus.MAPPED)
+
+    def test_task_versions_bumped_once_per_project_on_commit(self):
+        # Arrange
+        Task.bump_task_versions(2)
+        Task.bump_task_versions(1, geometry=True)
+        Task.bump_task_versions(2)
+        session = MagicMock(info=db.session.info)
+
+        # Act
+        bump_committed_task_versions(session)
+
+        # Assert
+        self.assertEqual(session.execute.call_count, 2)
+        first_sql, first_params = session.execute.call_args_list[0][0]
+        second_sql, second_params = session.execute.call_args_list[1][0]
+        self.assertEqual(first_params, {'project_id': 1})
+        self.assertIn('task_geometry_version', str(first_sql))
+        self.assertEqual(second_params, {'project_id': 2})
+        self.assertNotIn('task_geometry_version', str(second_sql))
+        self.assertEqual(db.session.info, {})
@@ -0,0 +1,92 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from server import create_app
+from server.models.postgis.utils import InvalidData, tile_bounds, WEB_MERCATOR_EXTENT, UnitOfWork, commit_or_flush, \
+    run_after_commit
+
+
+class TestUtils(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        self.ctx.pop()
+
+    def test_zoom_zero_tile_covers_the_world(self):
+        # Act
+        bounds = tile_bounds(0, 0, 0)
+
+        # Assert
+        self.assertEqual(bounds, (-WEB_MERCATOR_EXTENT, -WEB_MERCATOR_EXTENT, WEB_MERCATOR_EXTENT, WEB_MERCATOR_EXTENT))
+
+    def test_tile_rows_count_down_from_the_north(self):
+        # Act
+        xmin, ymin, xmax, ymax = tile_bounds(1, 1, 0)
+
+        # Assert
+        self.assertEqual((xmin, ymin, xmax, ymax), (0, 0, WEB_MERCATOR_EXTENT, WEB_MERCATOR_EXTENT))
+
+    def test_tile_outside_grid_raises_error(self):
+        # Act / Assert
+        with self.assertRaises(InvalidData):
+            tile_bounds(1, 2, 0)
+
+    def test_tile_zoom_above_max_raises_error(self):
+        # Act / Assert
+        with self.assertRaises(InvalidData):
+            tile_bounds(100000000, 0, 0)
+
+    @patch('server.models.postgis.utils.db')
+    def test_unit_of_work_flushes_saves_and_commits_once(self, mock_db):
+        # Arrange
+        callback = MagicMock()
+
+        # Act
+        with UnitOfWork():
+            commit_or_flush()
+            commit_or_flush()
+            run_after_commit(callback, 1)
+            callback.assert_not_called()
+
+        # Assert
+        self.assertEqual(mock_db.session.flush.call_count, 2)
+        mock_db.session.commit.assert_called_once()
+        callback.assert_called_once_with(1)
+
+    @patch('server.models.postgis.utils.db')
+    def test_nested_unit_of_work_joins_outer_one(self, mock_db):
+        # Act
+        with UnitOfWork() as outer:
+            with UnitOfWork() as inner:
+                commit_or_flush()
+            mock_db.session.commit.assert_not_called()
+
+        # Assert
+        self.assertIs(inner, outer)
+        mock_db.session.commit.assert_called_once()
+
+    @patch('server.models.postgis.utils.db')
+    def test_failed_unit_of_work_rolls_back_and_skips_callbacks(self, mock_db):
+        # Arrange
+        callback = MagicMock()
+
+        # Act
+        with UnitOfWork() as work:
+            run_after_commit(callback)
+            work.rollback()
+
+        # Assert
+        mock_db.session.rollback.assert_called_once()
+        mock_db.session.commit.assert_not_called()
+        callback.assert_not_called()
+
+    @patch('server.models.postgis.utils.db')
+    def test_commit_or_flush_commits_outside_unit_of_work(self, mock_db):
+        # Act
+        commit_or_flush()
+
+        # Assert
+        mock_db.session.commit.assert_called_once()
+        mock_db.session.flush.assert_not_called()
@@ -0,0 +1,67 @@
+import unittest
+from server import create_app
+from server.models.postgis.project import Project
+from server.models.postgis.task import Task
+from server.services.bulk_transition_service import BulkTransitionService, TRANSITIONS
+from unittest.mock import patch
+
+
+class TestBulkTransitionService(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        self.ctx.pop()
+
+    def test_reset_comments_and_auto_unlocks_without_locking(self):
+        # Act
+        statements = BulkTransitionService._transition_sql(TRANSITIONS['reset_all'])
+
+        # Assert
+        self.assertIn("'Task reset'", statements[0])
+        self.assertIn('AUTO_UNLOCKED_FOR_MAPPING', statements[1])
+        self.assertFalse(any("'LOCKED_FOR_" in statement and 'INSERT INTO task_history' in statement
+                             for statement in statements))
+
+    def test_invalidate_starts_new_invalidation_after_state_change(self):
+        # Act
+        statements = BulkTransitionService._transition_sql(TRANSITIONS['invalidate_all'])
+
+        # Assert
+        self.assertIn("'LOCKED_FOR_VALIDATION'", statements[1])
+        self.assertIn("'INVALIDATED'", statements[2])
+        self.assertIn('INSERT INTO task_invalidation_history', statements[-1])
+
+    def test_reset_bad_imagery_is_one_history_insert_and_task_update(self):
+        # Act
+        statements = BulkTransitionService._transition_sql(TRANSITIONS['reset_bad_imagery'])
+
+        # Assert
+        self.assertEqual(len(statements), 1)
+        self.assertIn("'READY'", statements[0])
+        self.assertIn('UPDATE tasks', statements[0])
+
+    @patch('server.services.bulk_transition_service.CHUNK_SIZE', 2)
+    @patch.object(Task, 'bump_task_versions')
+    @patch.object(Project, 'get')
+    @patch('server.services.bulk_transition_service.db')
+    def test_map_all_transitions_in_chunks_and_commits_once(self, mock_db, mock_project, mock_bump):
+        # Arrange
+        stub_project = Project()
+        stub_project.id = 1
+        stub_project.total_tasks = 3
+        stub_project.tasks_bad_imagery = 1
+        mock_project.return_value = stub_project
+        mock_db.session.execute.return_value = [(1,), (2,), (3,)]
+        chunk_statements = len(BulkTransitionService._transition_sql(TRANSITIONS['map_all']))
+
+        # Act
+        BulkTransitionService.map_all_tasks(1, 1234)
+
+        # Assert
+        self.assertEqual(mock_db.session.execute.call_count, 1 + 2 * chunk_statements)
+        mock_db.session.commit.assert_called_once()
+        mock_bump.assert_called_once_with(1)
+        self.assertEqual(stub_project.tasks_mapped, 2)
@@ -0,0 +1,91 @@
+import gzip
+import unittest
+from cachetools import TTLCache
+from unittest.mock import MagicMock, patch
+from server.services import compression_service
+from server.services.compression_service import CompressionService, compressed_body_cache
+
+
+class TestCompressionService(unittest.TestCase):
+
+    def setUp(self):
+        compressed_body_cache.clear()
+
+    def test_body_is_only_built_and_compressed_once_per_key(self):
+        # Arrange
+        build_body = MagicMock(return_value=b'{"type": "FeatureCollection", "features": []}')
+
+        # Act
+        first = CompressionService.get_compressed_body(('tasks', 1, 1), 'gzip', build_body)
+        second = CompressionService.get_compressed_body(('tasks', 1, 1), 'gzip', build_body)
+
+        # Assert
+        self.assertEqual(build_body.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(gzip.decompress(first), build_body.return_value)
+
+    def test_new_version_is_compressed_again(self):
+        # Arrange
+        build_body = MagicMock(return_value=b'<osm/>')
+
+        # Act
+        CompressionService.get_compressed_body(('osm-xml', 1, 1), 'gzip', build_body)
+        CompressionService.get_compressed_body(('osm-xml', 1, 2), 'gzip', build_body)
+
+        # Assert
+        self.assertEqual(build_body.call_count, 2)
+
+    def test_body_too_large_to_cache_is_still_served(self):
+        # Arrange
+        build_body = MagicMock(return_value=b'<osm>' + b'<node/>' * 1000 + b'</osm>')
+
+        # Act
+        with patch.object(compression_service, 'compressed_body_cache', TTLCache(maxsize=8, ttl=60, getsizeof=len)):
+            body = CompressionService.get_compressed_body(('osm-xml', 1, 1), 'gzip', build_body)
+            CompressionService.get_compressed_body(('osm-xml', 1, 1), 'gzip', build_body)
+
+        # Assert
+        self.assertEqual(gzip.decompress(body), build_body.return_value)
+        self.assertEqual(build_body.call_count, 2)
+
+    def test_streamed_body_is_compressed_as_it_is_built_and_cached_once_sent(self):
+        # Arrange
+        chunks = [b'{"type": "FeatureCollection", "features": [', b'{"type": "Feature"},' * 5000, b'{}]}']
+        build_chunks = MagicMock(return_value=iter(chunks))
+
+        # Act
+        first = b''.join(CompressionService.stream_compressed_body(('tasks-geojson', 1, 1), 'gzip', build_chunks))
+        second = list(CompressionService.stream_compressed_body(('tasks-geojson', 1, 1), 'gzip', build_chunks))
+
+        # Assert
+        self.assertEqual(gzip.decompress(first), b''.join(chunks))
+        self.assertEqual(second, [first])
+        self.assertEqual(build_chunks.call_count, 1)
+
+    def test_streamed_body_too_large_to_cache_is_still_streamed(self):
+        # Arrange
+        chunks = [b'<osm>', bytes(range(256)) * 100, b'</osm>']
+        build_chunks = MagicMock(side_effect=lambda: iter(chunks))
+
+        # Act
+        with patch.object(compression_service, 'compressed_body_cache', TTLCache(maxsize=8, ttl=60, getsizeof=len)):
+            body = b''.join(CompressionService.stream_compressed_body(('osm-xml', 1, 1), 'gzip', build_chunks))
+            list(CompressionService.stream_compressed_body(('osm-xml', 1, 1), 'gzip', build_chunks))
+
+        # Assert
+        self.assertEqual(gzip.decompress(body), b''.join(chunks))
+        self.assertEqual(build_chunks.call_count, 2)
+
+    def test_streamed_body_is_not_cached_if_stream_abandoned(self):
+        # Arrange
+        build_chunks = MagicMock(side_effect=lambda: iter([b'{"type": "Feature"},' * 5000] * 10))
+
+        # Act
+        next(CompressionService.stream_compressed_body(('tasks-geojson', 1, 1), 'gzip', build_chunks))
+        list(CompressionService.stream_compressed_body(('tasks-geojson', 1, 1), 'gzip', build_chunks))
+
+        # Assert
+        self.assertEqual(build_chunks.call_count, 2)
+
+    def test_gzip_always_supported(self):
+        self.assertIn('gzip', CompressionService.supported_encodings())
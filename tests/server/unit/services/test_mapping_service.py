@@ -1,7 +1,7 @@
 import unittest
 from server.services.mapping_service import MappingService, Task, MappingServiceError, TaskStatus, \
      ProjectService, NotFound, StatsService, MappingNotAllowed, UserLicenseError
-from server.models.dtos.mapping_dto import MappedTaskDTO, LockTaskDTO
+from server.models.dtos.mapping_dto import MappedTaskDTO, LockTaskDTO, LockNextTaskDTO
 from server.models.postgis.task import TaskHistory, TaskAction, User
 from unittest.mock import patch, MagicMock
 from server import create_app
@@ -78,6 +78,36 @@ class TestMappingService(unittest.TestCase):
         with self.assertRaises(UserLicenseError):
             MappingService.lock_task_for_mapping(self.lock_task_dto)
 
+    @patch.object(Task, 'lock_task_for_mapping')
+    @patch.object(ProjectService, 'is_user_permitted_to_map')
+    @patch.object(MappingService, 'get_task')
+    def test_lock_task_for_mapping_raises_error_if_task_locked_by_another_user_first(self, mock_task, mock_project,
+                                                                                     mock_lock):
+        # Arrange
+        mock_task.return_value = self.task_stub
+        mock_project.return_value = True, None
+        mock_lock.return_value = False
+
+        # Act / Assert
+        with self.assertRaises(MappingServiceError):
+            MappingService.lock_task_for_mapping(self.lock_task_dto)
+
+    @patch.object(Task, 'lock_next_task')
+    @patch.object(ProjectService, 'is_user_permitted_to_map')
+    def test_lock_next_task_for_mapping_raises_not_found_if_no_task_available(self, mock_project, mock_lock):
+        # Arrange
+        mock_project.return_value = True, None
+        mock_lock.return_value = None
+        lock_next_dto = LockNextTaskDTO()
+        lock_next_dto.project_id = 1
+        lock_next_dto.user_id = 123456
+
+        # Act / Assert
+        with self.assertRaises(NotFound):
+            MappingService.lock_next_task_for_mapping(lock_next_dto)
+
+        mock_lock.assert_called_once_with(1, 123456, TaskAction.LOCKED_FOR_MAPPING, None, None)
+
     @patch.object(MappingService, 'get_task')
     def test_unlock_of_not_locked_for_mapping_raises_error(self, mock_task):
         # Arrange
@@ -113,16 +143,14 @@ class TestMappingService(unittest.TestCase):
     @patch.object(Task, 'get_per_task_instructions')
     @patch.object(StatsService, 'update_stats_after_task_state_change')
     @patch.object(Task, 'update')
-    @patch.object(TaskHistory, 'get_last_status')
     @patch.object(TaskHistory, 'update_task_locked_with_duration')
     @patch.object(MappingService, 'get_task')
     def test_unlock_with_comment_sets_history(self, mock_task, mock_history, mock_update, mock_stats,
-                                              mock_instructions, mock_state):
+                                              mock_instructions):
         # Arrange
         self.task_stub.task_status = TaskStatus.LOCKED_FOR_MAPPING.value
         self.mapped_task_dto.comment = 'Test comment'
         mock_task.return_value = self.task_stub
-        mock_state.return_value = TaskStatus.LOCKED_FOR_MAPPING
 
         # Act
         test_task = MappingService.unlock_task_after_mapping(self.mapped_task_dto)
@@ -134,15 +162,13 @@ class TestMappingService(unittest.TestCase):
     @patch.object(Task, 'get_per_task_instructions')
     @patch.object(StatsService, 'update_stats_after_task_state_change')
     @patch.object(Task, 'update')
-    @patch.object(TaskHistory, 'get_last_status')
     @patch.object(TaskHistory, 'update_task_locked_with_duration')
     @patch.object(MappingService, 'get_task')
     def test_unlock_with_status_change_sets_history(self, mock_task, mock_history, mock_update, mock_stats,
-                                                    mock_instructions, mock_state):
+                                                    mock_instructions):
         # Arrange
         self.task_stub.task_status = TaskStatus.LOCKED_FOR_MAPPING.value
         mock_task.return_value = self.task_stub
-        mock_state.return_value = TaskStatus.LOCKED_FOR_MAPPING
 
         # Act
         test_task = MappingService.unlock_task_after_mapping(self.mapped_task_dto)
@@ -152,16 +178,12 @@ class TestMappingService(unittest.TestCase):
         self.assertEqual(test_task.task_history[0].action_text, TaskStatus.MAPPED.name)
         self.assertEqual(TaskStatus.MAPPED.name, test_task.task_status)
 
-    @patch.object(TaskHistory, 'get_last_action')
-    def test_task_is_undoable_if_last_change_made_by_you(self, last_action):
+    def test_task_is_undoable_if_last_change_made_by_you(self):
         # Arrange
-        task_history = TaskHistory(1, 1, 1)
-        task_history.user_id = 1
-        last_action.return_value = task_history
-
         task = Task()
         task.task_status = TaskStatus.MAPPED.value
         task.mapped_by = 1
+        task.last_action_user_id = 1
 
         # Act
         is_undoable = MappingService._is_task_undoable(1, task)
@@ -169,19 +191,20 @@ class TestMappingService(unittest.TestCase):
         # Assert
         self.assertTrue(is_undoable)
 
-    @patch.object(TaskHistory, 'get_last_action')
-    def test_task_is_not_undoable_if_last_change_not_made_by_you(self, last_action):
+    def test_task_is_not_undoable_if_last_change_not_made_by_you(self):
         # Arrange
-        task_history = TaskHistory(1, 1, 1)
-        task_history.user_id = 2
-        last_action.return_value = task_history
-
         task = Task()
         task.task_status = TaskStatus.MAPPED.value
         task.mapped_by = 1
+        task.last_action_user_id = 2
 
         # Act
         is_undoable = MappingService._is_task_undoable(1, task)
 
         # Assert
-        self.assertFalse(is_undoable)
\ No newline at end of file
+        self.assertFalse(is_undoable)
+
+    def test_task_ids_normalised_for_cache_key(self):
+        # Act / Assert
+        self.assertEqual(MappingService._normalise_task_ids('12,3,12, 7'), '3,7,12')
+        self.assertIsNone(MappingService._normalise_task_ids(None))
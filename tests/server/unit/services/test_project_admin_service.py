@@ -4,7 +4,7 @@ from unittest.mock import MagicMock, patch
 from server.services.project_admin_service import ProjectAdminService, InvalidGeoJson, Project, \
     ProjectAdminServiceError, ProjectDTO, ProjectStatus, NotFound, LicenseService
 from server.models.dtos.project_dto import ProjectInfoDTO
-from server.models.postgis.task import Task
+from server.services.bulk_transition_service import BulkTransitionService
 from server import create_app
 
 
@@ -123,27 +123,8 @@ class TestProjectAdminService(unittest.TestCase):
         with self.assertRaises(ProjectAdminServiceError):
             ProjectAdminService._validate_imagery_licence(1)
 
-    @patch.object(ProjectAdminService, '_get_project_by_id')
-    @patch('flask_sqlalchemy._QueryProperty.__get__')
-    @patch.object(Task, 'set_task_history')
-    def test_reset_all_tasks(self, mock_set_task_history, mock_query, mock_get_project):
-        user_id = 123
-        test_project = MagicMock(spec=Project)
-        test_project.id = 456
-        test_project.tasks_mapped = 2
-        test_project.tasks_validated = 2
-        test_tasks = [MagicMock(spec=Task), MagicMock(spec=Task), MagicMock(spec=Task)]
-
-        mock_query.return_value.filter.return_value.all.return_value = test_tasks
-        mock_get_project.return_value = test_project
-
-        ProjectAdminService.reset_all_tasks(test_project.id, user_id)
-
-        for test_task in test_tasks:
-            test_task.set_task_history.assert_called()
-            test_task.reset_task.assert_called_with(user_id)
-
-        mock_get_project.assert_called_with(test_project.id)
-        self.assertEqual(test_project.tasks_mapped, 0)
-        self.assertEqual(test_project.tasks_validated, 0)
-        test_project.save.assert_called()
+    @patch.object(BulkTransitionService, 'reset_all_tasks')
+    def test_reset_all_tasks(self, mock_reset):
+        ProjectAdminService.reset_all_tasks(456, 123)
+
+        mock_reset.assert_called_with(456, 123)
@@ -0,0 +1,66 @@
+import unittest
+from server import create_app
+from server.models.postgis.project import Project, ProjectStatus
+from server.models.postgis.project_history_archive import ProjectHistoryArchive
+from server.services.project_archive_service import ProjectArchiveService, ProjectArchiveServiceError
+from unittest.mock import patch
+
+
+class TestProjectArchiveService(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        self.ctx.pop()
+
+    @patch.object(Project, 'get')
+    def test_history_of_published_project_cannot_be_archived(self, mock_project):
+        # Arrange
+        stub_project = Project()
+        stub_project.status = ProjectStatus.PUBLISHED.value
+        mock_project.return_value = stub_project
+
+        # Act / Assert
+        with self.assertRaises(ProjectArchiveServiceError):
+            ProjectArchiveService.archive_project_history(1)
+
+    @patch.object(ProjectHistoryArchive, 'is_archived')
+    @patch.object(Project, 'get')
+    def test_already_archived_history_is_not_archived_again(self, mock_project, mock_archived):
+        # Arrange
+        stub_project = Project()
+        stub_project.status = ProjectStatus.ARCHIVED.value
+        mock_project.return_value = stub_project
+        mock_archived.return_value = True
+
+        # Act
+        archived = ProjectArchiveService.archive_project_history(1)
+
+        # Assert
+        self.assertFalse(archived)
+
+    @patch.object(ProjectArchiveService, 'restore_project_history')
+    @patch.object(ProjectHistoryArchive, 'is_archived')
+    def test_archived_history_is_restored_when_viewed(self, mock_archived, mock_restore):
+        # Arrange
+        mock_archived.return_value = True
+
+        # Act
+        ProjectArchiveService.ensure_history_available(1)
+
+        # Assert
+        mock_restore.assert_called_with(1)
+
+    @patch.object(ProjectArchiveService, 'restore_project_history')
+    @patch.object(ProjectHistoryArchive, 'is_archived')
+    def test_hot_history_is_not_restored(self, mock_archived, mock_restore):
+        # Arrange
+        mock_archived.return_value = False
+
+        # Act
+        ProjectArchiveService.ensure_history_available(1)
+
+        # Assert
+        mock_restore.assert_not_called()
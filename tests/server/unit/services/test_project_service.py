@@ -1,7 +1,11 @@
+import datetime
 import unittest
-from unittest.mock import patch
+from collections import namedtuple
+from unittest.mock import patch, MagicMock
+from sqlalchemy.exc import OperationalError
+from server import create_app, db
 from server.services.project_service import ProjectService, Project, NotFound, ProjectStatus, ProjectServiceError, \
-    MappingLevel, UserService, MappingNotAllowed
+    MappingLevel, UserService, MappingNotAllowed, Task, TaskCacheService
 
 
 class TestProjectService(unittest.TestCase):
@@ -108,3 +112,131 @@ class TestProjectService(unittest.TestCase):
         # Assert
         self.assertFalse(allowed)
         self.assertEqual(reason, MappingNotAllowed.USER_NOT_ON_ALLOWED_LIST)
+
+    @patch.object(Task, 'get_task_changes')
+    @patch.object(TaskCacheService, 'get_task_versions')
+    def test_task_changes_cursor_is_latest_change(self, mock_versions, mock_changes):
+        # Arrange
+        task_change = namedtuple('TaskChange', ['id', 'task_status', 'locked_by', 'change_id'])
+        mock_versions.return_value = (7, 3)
+        mock_changes.return_value = ([task_change(1, 1, 123, 11), task_change(2, 2, None, 12)], 12)
+
+        # Act
+        changes = ProjectService.get_task_changes(1, 10)
+
+        # Assert
+        self.assertEqual(changes.cursor, 12)
+        self.assertEqual(changes.task_geometry_version, 3)
+        self.assertEqual(changes.tasks[0].task_status, 'LOCKED_FOR_MAPPING')
+
+    @patch.object(Task, 'get_task_changes')
+    @patch.object(TaskCacheService, 'get_task_versions')
+    def test_task_changes_cursor_unchanged_when_nothing_changed(self, mock_versions, mock_changes):
+        # Arrange
+        mock_versions.return_value = (7, 3)
+        mock_changes.return_value = ([], 10)
+
+        # Act
+        changes = ProjectService.get_task_changes(1, 10)
+
+        # Assert
+        self.assertEqual(changes.cursor, 10)
+        self.assertEqual(len(changes.tasks), 0)
+
+    @patch.object(Project, 'get_change_markers')
+    def test_project_etag_changes_with_task_status_version(self, mock_markers):
+        # Arrange
+        last_updated = datetime.datetime(2019, 10, 1)
+        mock_markers.side_effect = [(last_updated, 1, 1), (last_updated, 2, 1)]
+
+        # Act
+        first_etag = ProjectService.get_project_etag(1, 'tasks')
+        second_etag = ProjectService.get_project_etag(1, 'tasks')
+
+        # Assert
+        self.assertNotEqual(first_etag, second_etag)
+
+    @patch.object(Project, 'get_change_markers')
+    def test_project_etag_without_tasks_ignores_task_versions(self, mock_markers):
+        # Arrange
+        last_updated = datetime.datetime(2019, 10, 1)
+        mock_markers.side_effect = [(last_updated, 1, 1), (last_updated, 2, 2)]
+
+        # Act
+        first_etag = ProjectService.get_project_etag(1, 'aoi', include_tasks=False)
+        second_etag = ProjectService.get_project_etag(1, 'aoi', include_tasks=False)
+
+        # Assert
+        self.assertEqual(first_etag, second_etag)
+
+    @patch.object(Project, 'get_change_markers')
+    def test_project_etag_raises_error_if_project_not_found(self, mock_markers):
+        mock_markers.return_value = None
+
+        with self.assertRaises(NotFound):
+            ProjectService.get_project_etag(123)
+
+    @patch.object(Task, 'auto_unlock_tasks')
+    @patch.object(Task, 'get_projects_with_expired_locks')
+    def test_auto_unlock_sweep_continues_past_failing_project(self, mock_projects, mock_unlock):
+        # Arrange
+        mock_projects.return_value = [1, 2]
+        mock_unlock.side_effect = [Exception('Lock row missing'), None]
+
+        # Act
+        with create_app().app_context():
+            projects_unlocked = ProjectService.auto_unlock_all_tasks()
+
+        # Assert
+        self.assertEqual(projects_unlocked, 2)
+        mock_unlock.assert_called_with(2)
+
+    @patch('server.services.project_service.time.sleep')
+    @patch.object(ProjectService, 'auto_unlock_all_tasks')
+    @patch.object(ProjectService, '_holds_auto_unlock_lock')
+    @patch.object(ProjectService, '_try_auto_unlock_lock')
+    def test_auto_unlock_worker_stops_sweeping_and_reconnects_when_lock_lost(self, mock_try_lock, mock_holds_lock,
+                                                                             mock_sweep, mock_sleep):
+        # Arrange
+        mock_try_lock.return_value = True
+        mock_holds_lock.side_effect = [True, False, True]
+        mock_sweep.return_value = 0
+        # Sleeping after the sweep on the second connection stops the otherwise endless worker
+        mock_sleep.side_effect = [None, StopIteration]
+        first_connection, second_connection = MagicMock(), MagicMock()
+
+        # Act
+        with create_app().app_context():
+            with patch.object(db.engine, 'connect', side_effect=[first_connection, second_connection]):
+                with self.assertRaises(StopIteration):
+                    ProjectService.run_auto_unlock_sweeps(60)
+
+        # Assert
+        self.assertEqual(mock_sweep.call_count, 2)
+        first_connection.invalidate.assert_called_once()
+        mock_try_lock.assert_called_with(second_connection)
+
+    @patch('server.services.project_service.time.sleep')
+    @patch.object(ProjectService, 'auto_unlock_all_tasks')
+    @patch.object(ProjectService, '_holds_auto_unlock_lock')
+    @patch.object(ProjectService, '_try_auto_unlock_lock')
+    def test_auto_unlock_worker_keeps_reconnecting_while_database_unreachable(self, mock_try_lock, mock_holds_lock,
+                                                                              mock_sweep, mock_sleep):
+        # Arrange
+        mock_try_lock.return_value = True
+        mock_holds_lock.return_value = True
+        mock_sweep.return_value = 0
+        # Sleeping after the first sweep stops the otherwise endless worker
+        mock_sleep.side_effect = [None, None, StopIteration]
+        connection = MagicMock()
+        unreachable = OperationalError('connect', {}, Exception('could not connect to server'))
+
+        # Act
+        with create_app().app_context():
+            with patch.object(db.engine, 'connect', side_effect=[unreachable, unreachable, connection]):
+                with self.assertRaises(StopIteration):
+                    ProjectService.run_auto_unlock_sweeps(60)
+
+        # Assert
+        mock_sweep.assert_called_once()
+        mock_try_lock.assert_called_once_with(connection)
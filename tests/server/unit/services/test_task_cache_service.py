@@ -0,0 +1,94 @@
+import json
+import struct
+import unittest
+from collections import namedtuple
+from unittest.mock import patch
+from server.services.task_cache_service import TaskCacheService, Project, Task, NotFound, task_geometry_cache, \
+    task_status_cache, MAX_CACHED_PROJECT_TASKS
+
+
+class TestTaskCacheService(unittest.TestCase):
+
+    def setUp(self):
+        task_geometry_cache.clear()
+        task_status_cache.clear()
+
+    @patch.object(Project, 'get_task_versions')
+    def test_task_cache_raises_error_if_project_not_found(self, mock_versions):
+        mock_versions.return_value = None
+
+        with self.assertRaises(NotFound):
+            TaskCacheService.get_tasks_geojson_stream(123)
+
+    @patch.object(Task, 'get_task_statuses')
+    @patch.object(Task, 'get_task_feature_prefixes')
+    @patch.object(Task, 'get_task_count')
+    @patch.object(Project, 'get_task_versions')
+    def test_status_change_only_reloads_status_layer(self, mock_versions, mock_count, mock_prefixes, mock_statuses):
+        # Arrange
+        mock_count.return_value = 1
+        mock_prefixes.return_value = [(1, '{"type": "Feature", "geometry": null, "properties": {"taskId": 1, '
+                                          '"taskStatus": ')]
+        mock_statuses.side_effect = [{1: 'READY'}, {1: 'MAPPED'}]
+        mock_versions.side_effect = [(1, 1), (2, 1)]
+
+        # Act
+        first = json.loads(''.join(TaskCacheService.get_tasks_geojson_stream(1)))
+        second = json.loads(''.join(TaskCacheService.get_tasks_geojson_stream(1)))
+
+        # Assert
+        self.assertEqual(first['features'][0]['properties']['taskStatus'], 'READY')
+        self.assertEqual(second['features'][0]['properties']['taskStatus'], 'MAPPED')
+        self.assertEqual(mock_prefixes.call_count, 1)
+        self.assertEqual(mock_statuses.call_count, 2)
+
+    @patch.object(Task, 'stream_tasks_as_geojson_feature_collection')
+    @patch.object(Task, 'get_task_feature_prefixes')
+    @patch.object(Task, 'get_task_count')
+    @patch.object(Project, 'get_task_versions')
+    def test_project_too_large_to_cache_is_streamed_from_db(self, mock_versions, mock_count, mock_prefixes,
+                                                            mock_stream):
+        # Arrange
+        mock_versions.return_value = (1, 1)
+        mock_count.return_value = MAX_CACHED_PROJECT_TASKS + 1
+        mock_stream.return_value = iter(['{"type": "FeatureCollection", "features": []}'])
+
+        # Act
+        TaskCacheService.get_tasks_geojson_stream(1)
+
+        # Assert
+        mock_prefixes.assert_not_called()
+        mock_stream.assert_called_once_with(1, chunk_size=500, resolution='full')
+
+    def test_feature_collection_is_valid_across_chunks(self):
+        # Arrange
+        feature_prefixes = [(task_id, '{"type": "Feature", "geometry": null, "properties": {"taskStatus": ')
+                            for task_id in range(1, 6)]
+        task_statuses = {task_id: 'READY' for task_id in range(2, 6)}
+
+        # Act
+        stream = TaskCacheService._stream_feature_collection(feature_prefixes, task_statuses, 2)
+        collection = json.loads(''.join(stream))
+
+        # Assert
+        self.assertEqual(len(collection['features']), 4)
+
+    @patch.object(Task, 'get_task_status_values')
+    @patch.object(Project, 'get_task_versions')
+    def test_task_status_snapshot_packs_ids_and_statuses(self, mock_versions, mock_tasks):
+        # Arrange
+        task_status = namedtuple('TaskStatusValue', ['id', 'task_status'])
+        mock_versions.return_value = (1, 1)
+        mock_tasks.return_value = [task_status(1, 0), task_status(2, 2), task_status(70000, 4)]
+
+        # Act
+        snapshot = TaskCacheService.get_task_status_snapshot(99)
+
+        # Assert
+        task_count = struct.unpack_from('<I', snapshot)[0]
+        task_ids = struct.unpack_from(f'<{task_count}I', snapshot, 4)
+        task_statuses = struct.unpack_from(f'<{task_count}B', snapshot, 4 + 4 * task_count)
+        self.assertEqual(task_count, 3)
+        self.assertEqual(task_ids, (1, 2, 70000))
+        self.assertEqual(task_statuses, (0, 2, 4))
+        self.assertEqual(len(snapshot), 4 + 5 * task_count)
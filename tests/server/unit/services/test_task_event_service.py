@@ -0,0 +1,45 @@
+import json
+import unittest
+from collections import namedtuple
+from server.services.task_event_service import TaskEventService, TaskEventSubscriber
+
+
+class TestTaskEventService(unittest.TestCase):
+
+    def test_task_change_formatted_as_sse_message_with_cursor_id(self):
+        # Act
+        message = TaskEventService._format_event(dict(projectId=1, taskId=2, taskStatus=1, lockedBy=123, changeId=42))
+
+        # Assert
+        lines = message.split('\n')
+        self.assertEqual(lines[0], 'id: 42')
+        self.assertEqual(lines[1], 'event: task-changed')
+        self.assertEqual(json.loads(lines[2][len('data: '):]),
+                         dict(taskId=2, taskStatus='LOCKED_FOR_MAPPING', lockedBy=123))
+        self.assertTrue(message.endswith('\n\n'))
+
+    def test_only_last_change_carries_cursor_id(self):
+        # Arrange
+        task_change = namedtuple('TaskChange', ['id', 'task_status', 'locked_by', 'change_id'])
+        changes = [task_change(1, 1, 123, 40), task_change(2, 2, None, 41)]
+
+        # Act
+        messages = TaskEventService._format_changes(changes, 41)
+
+        # Assert
+        self.assertTrue(messages[0].startswith('event: task-changed\n'))
+        self.assertTrue(messages[1].startswith('id: 41\n'))
+
+    def test_subscriber_notifications_coalesce_to_latest_change(self):
+        # Arrange
+        subscriber = TaskEventSubscriber(1)
+
+        # Act
+        subscriber.notify(12)
+        subscriber.notify(10, resync=True)
+        subscriber.notify(11)
+
+        # Assert
+        self.assertEqual(subscriber.latest_change_id, 12)
+        self.assertTrue(subscriber.resync)
+        self.assertTrue(subscriber.woken.is_set())
@@ -0,0 +1,41 @@
+import unittest
+from server import create_app
+from server.services.task_history_partition_service import TaskHistoryPartitionService, \
+    TaskHistoryPartitionServiceError
+from unittest.mock import patch
+
+
+class TestTaskHistoryPartitionService(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        self.ctx.pop()
+
+    @patch('server.services.task_history_partition_service.db')
+    def test_partitioning_requires_postgres_12(self, mock_db):
+        # Arrange
+        mock_db.session.execute.return_value.scalar.return_value = '90624'
+
+        # Act / Assert
+        with self.assertRaises(TaskHistoryPartitionServiceError):
+            TaskHistoryPartitionService.partition_task_history()
+
+    @patch.object(TaskHistoryPartitionService, '_swap_tables')
+    @patch.object(TaskHistoryPartitionService, '_copy_batch')
+    @patch.object(TaskHistoryPartitionService, '_install_mirror_trigger')
+    @patch.object(TaskHistoryPartitionService, '_check_can_partition')
+    def test_history_is_copied_in_batches_before_swap(self, mock_check, mock_trigger, mock_copy, mock_swap):
+        # Arrange
+        mock_copy.side_effect = [(100, 120), (50, 175), (0, None)]
+
+        # Act
+        rows_copied = TaskHistoryPartitionService.partition_task_history(100)
+
+        # Assert
+        self.assertEqual(rows_copied, 150)
+        mock_copy.assert_called_with(175, 100)
+        mock_trigger.assert_called()
+        mock_swap.assert_called()
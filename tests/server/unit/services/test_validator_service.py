@@ -2,7 +2,11 @@ import unittest
 from unittest.mock import patch
 
 from server import create_app
+from server.models.dtos.mapping_dto import LockNextTaskDTO
 from server.models.dtos.validator_dto import ValidatedTask
+from server.models.postgis.task import TaskAction
+from server.services.messaging.message_service import MessageService
+from server.services.stats_service import StatsService
 from server.services.users.user_service import UserService
 from server.services.validator_service import ValidatorService, Task, NotFound, LockForValidationDTO, TaskStatus, \
     ValidatatorServiceError, UnlockAfterValidationDTO, ProjectService, ValidatingNotAllowed, UserLicenseError
@@ -17,16 +21,17 @@ class TestValidatorService(unittest.TestCase):
         self.ctx.push()
 
         self.unlock_task_stub = Task()
+        self.unlock_task_stub.id = 1
         self.unlock_task_stub.task_status = TaskStatus.MAPPED.value
         self.unlock_task_stub.lock_holder_id = 123456
 
     def tearDown(self):
         self.ctx.pop()
 
-    @patch.object(Task, 'get')
+    @patch.object(Task, 'get_tasks_for_update')
     def test_lock_tasks_for_validation_raises_error_if_task_not_found(self, mock_task):
         # Arrange
-        mock_task.return_value = None
+        mock_task.return_value = []
 
         lock_dto = LockForValidationDTO()
         lock_dto.project_id = 1
@@ -36,63 +41,117 @@ class TestValidatorService(unittest.TestCase):
         with self.assertRaises(NotFound):
             ValidatorService.lock_tasks_for_validation(lock_dto)
 
-    @patch.object(Task, 'get')
+    @patch.object(Task, 'get_tasks_for_update')
     def test_lock_tasks_for_validation_raises_error_if_task_not_mapped(self, mock_task):
         # Arrange
         task_stub = Task()
+        task_stub.id = 1
         task_stub.task_status = TaskStatus.READY.value
-        mock_task.return_value = task_stub
+        mock_task.return_value = [task_stub]
 
         lock_dto = LockForValidationDTO()
         lock_dto.project_id = 1
-        lock_dto.task_ids = [1, 2]
+        lock_dto.task_ids = [1]
 
         # Act / Assert
         with self.assertRaises(ValidatatorServiceError):
             ValidatorService.lock_tasks_for_validation(lock_dto)
 
     @patch.object(UserService, 'is_user_a_project_manager')
-    @patch.object(Task, 'get')
+    @patch.object(Task, 'get_tasks_for_update')
     @patch.object(ProjectService, 'is_user_permitted_to_validate')
     def test_lock_tasks_raises_error_if_project_validator_only_and_user_not_validator(self, mock_project, mock_task, mock_user):
         # Arrange
         task_stub = Task()
+        task_stub.id = 1
         task_stub.task_status = TaskStatus.MAPPED.value
-        mock_task.return_value = task_stub
+        mock_task.return_value = [task_stub]
         mock_project.return_value = False, ValidatingNotAllowed.USER_NOT_VALIDATOR
         mock_user.return_value = True
 
         lock_dto = LockForValidationDTO()
         lock_dto.project_id = 1
-        lock_dto.task_ids = [1, 2]
+        lock_dto.task_ids = [1]
         lock_dto.user_id = 1234
 
         with self.assertRaises(ValidatatorServiceError):
             ValidatorService.lock_tasks_for_validation(lock_dto)
 
     @patch.object(UserService, 'is_user_a_project_manager')
-    @patch.object(Task, 'get')
+    @patch.object(Task, 'get_tasks_for_update')
     @patch.object(ProjectService, 'is_user_permitted_to_validate')
     def test_lock_tasks_raises_error_if_user_has_not_accepted_license(self, mock_project, mock_task, mock_user):
         # Arrange
         task_stub = Task()
+        task_stub.id = 1
         task_stub.task_status = TaskStatus.MAPPED.value
-        mock_task.return_value = task_stub
+        mock_task.return_value = [task_stub]
 
         mock_project.return_value = False, ValidatingNotAllowed.USER_NOT_ACCEPTED_LICENSE
         mock_user.return_value = True
 
         lock_dto = LockForValidationDTO()
         lock_dto.project_id = 1
-        lock_dto.task_ids = [1, 2]
+        lock_dto.task_ids = [1]
 
         with self.assertRaises(UserLicenseError):
             ValidatorService.lock_tasks_for_validation(lock_dto)
 
-    @patch.object(Task, 'get')
+    @patch.object(Task, 'as_dtos_with_instructions')
+    @patch.object(Task, 'get_tasks')
+    @patch.object(Task, 'lock_tasks_for_validating')
+    @patch.object(UserService, 'is_user_a_project_manager')
+    @patch.object(Task, 'get_tasks_for_update')
+    @patch.object(ProjectService, 'is_user_permitted_to_validate')
+    def test_lock_tasks_locks_whole_batch_at_once(self, mock_project, mock_task, mock_user, mock_lock, mock_get,
+                                                  mock_dtos):
+        # Arrange
+        task_stubs = []
+        for task_id in [1, 2]:
+            task_stub = Task()
+            task_stub.id = task_id
+            task_stub.task_status = TaskStatus.MAPPED.value
+            task_stubs.append(task_stub)
+
+        mock_task.return_value = task_stubs
+        mock_get.return_value = task_stubs
+        mock_project.return_value = True, None
+        mock_user.return_value = True
+
+        lock_dto = LockForValidationDTO()
+        lock_dto.project_id = 1
+        lock_dto.task_ids = [2, 1]
+        lock_dto.user_id = 1234
+
+        # Act
+        ValidatorService.lock_tasks_for_validation(lock_dto)
+
+        # Assert
+        mock_lock.assert_called_once_with(1, task_stubs, 1234)
+        mock_dtos.assert_called_once_with(1, [task_stubs[1], task_stubs[0]], lock_dto.preferred_locale)
+
+    @patch.object(Task, 'lock_next_task')
+    @patch.object(UserService, 'is_user_a_project_manager')
+    @patch.object(ProjectService, 'is_user_permitted_to_validate')
+    def test_lock_next_task_for_validation_skips_users_own_tasks(self, mock_project, mock_user, mock_lock):
+        # Arrange
+        mock_project.return_value = True, None
+        mock_user.return_value = False
+        mock_lock.return_value = None
+        lock_next_dto = LockNextTaskDTO()
+        lock_next_dto.project_id = 1
+        lock_next_dto.user_id = 1234
+
+        # Act / Assert
+        with self.assertRaises(NotFound):
+            ValidatorService.lock_next_task_for_validation(lock_next_dto)
+
+        mock_lock.assert_called_once_with(1, 1234, TaskAction.LOCKED_FOR_VALIDATION, None, None, 1234)
+
+    @patch.object(Task, 'get_tasks_for_update')
     def test_unlock_tasks_for_validation_raises_error_if_task_not_found(self, mock_task):
         # Arrange
-        mock_task.return_value = None
+        mock_task.return_value = []
 
         validated_task = ValidatedTask()
         validated_task.task_id = 1
@@ -106,11 +165,11 @@ class TestValidatorService(unittest.TestCase):
         with self.assertRaises(NotFound):
             ValidatorService.unlock_tasks_after_validation(unlock_dto)
 
-    @patch.object(Task, 'get')
+    @patch.object(Task, 'get_tasks_for_update')
     def test_unlock_tasks_for_validation_raises_error_if_task_not_done_or_validated(self, mock_task):
         # Arrange
         self.unlock_task_stub.task_status = TaskStatus.READY.value
-        mock_task.return_value = self.unlock_task_stub
+        mock_task.return_value = [self.unlock_task_stub]
 
         validated_task = ValidatedTask()
         validated_task.task_id = 1
@@ -124,11 +183,11 @@ class TestValidatorService(unittest.TestCase):
         with self.assertRaises(ValidatatorServiceError):
             ValidatorService.unlock_tasks_after_validation(unlock_dto)
 
-    @patch.object(Task, 'get')
+    @patch.object(Task, 'get_tasks_for_update')
     def test_unlock_tasks_for_validation_raises_error_if_task_not_locked(self, mock_task):
         # Arrange
         self.unlock_task_stub.task_locked = False
-        mock_task.return_value = self.unlock_task_stub
+        mock_task.return_value = [self.unlock_task_stub]
 
         validated_task = ValidatedTask()
         validated_task.task_id = 1
@@ -142,9 +201,9 @@ class TestValidatorService(unittest.TestCase):
         with self.assertRaises(ValidatatorServiceError):
             ValidatorService.unlock_tasks_after_validation(unlock_dto)
 
-    @patch.object(Task, 'get')
+    @patch.object(Task, 'get_tasks_for_update')
     def test_unlock_tasks_for_validation_raises_error_if_user_doesnt_own_the_lock(self, mock_task):
-        mock_task.return_value = self.unlock_task_stub
+        mock_task.return_value = [self.unlock_task_stub]
 
         validated_task = ValidatedTask()
         validated_task.task_id = 1
@@ -159,6 +218,41 @@ class TestValidatorService(unittest.TestCase):
         with self.assertRaises(ValidatatorServiceError):
             ValidatorService.unlock_tasks_after_validation(unlock_dto)
 
+    @patch.object(Task, 'as_dtos_with_instructions')
+    @patch.object(Task, 'get_tasks')
+    @patch.object(MessageService, 'queue_messages_after_validation')
+    @patch.object(StatsService, 'update_stats_after_task_state_changes')
+    @patch.object(Task, 'bump_task_versions')
+    @patch.object(Task, 'apply_unlock')
+    @patch.object(ValidatorService, 'get_tasks_locked_by_user')
+    @patch('server.services.validator_service.commit_or_flush')
+    def test_unlock_tasks_commits_once_and_queues_one_message_per_mapper(self, mock_commit, mock_locked, mock_unlock,
+                                                                         mock_bump, mock_stats, mock_queue, mock_get,
+                                                                         mock_dtos):
+        # Arrange
+        tasks_to_unlock = []
+        for task_id in [1, 2]:
+            task_stub = Task()
+            task_stub.id = task_id
+            task_stub.mapped_by = 777
+            tasks_to_unlock.append(dict(task=task_stub, new_state=TaskStatus.INVALIDATED, comment=None, issues=None))
+
+        mock_locked.return_value = tasks_to_unlock
+        mock_get.return_value = [t['task'] for t in tasks_to_unlock]
+
+        unlock_dto = UnlockAfterValidationDTO()
+        unlock_dto.project_id = 1
+        unlock_dto.user_id = 1234
+
+        # Act
+        ValidatorService.unlock_tasks_after_validation(unlock_dto)
+
+        # Assert
+        self.assertEqual(mock_unlock.call_count, 2)
+        mock_commit.assert_called_once()
+        mock_stats.assert_called_once_with(1, 1234, [(TaskStatus.READY, TaskStatus.INVALIDATED)] * 2)
+        mock_queue.assert_called_once_with([], [(TaskStatus.INVALIDATED, 1234, 777, 1, 1)])
+
     @patch.object(UserService, 'is_user_a_project_manager')
     def test_user_can_validate_task_returns_false_when_user_not_a_pm_and_validating_own_task(self, mock_user):
         # Arrange